@@ -0,0 +1,299 @@
+import multiprocessing
+
+import numpy as np
+
+from distance_field import MOVES, NO_MOVE
+from loader import BLOCKS_PLAYER, passability_mask
+from simulation import MOVE_INTERVAL, SHOOT_INTERVAL
+from turret_hazard import HazardMap
+
+SPAWN = -2
+GOAL = -1
+CHECKPOINT = 6
+
+# action + 1 -> (dx, dy), NO_MOVE stands still
+_ACTION_DX = np.array([0] + [dx for dx, _ in MOVES], dtype=np.int32)
+_ACTION_DY = np.array([0] + [dy for _, dy in MOVES], dtype=np.int32)
+
+
+def _last_cell(flat_grids, code):
+    # flat index of the last cell with code in each grid, -1 where there is none
+    found = flat_grids == code
+    last = flat_grids.shape[1] - 1 - np.argmax(found[:, ::-1], axis=1)
+    return np.where(found.any(axis=1), last, -1)
+
+
+class BatchSimulation:
+    """
+    Many games of the same layout size advanced together, one array operation per rule.
+
+    The rules are the ones of simulation.Simulation. Turrets of every game
+    fire on the same ticks, so the live volleys are shared and the bullets
+    of a game are fully described by its layout: each cell holds a bitmask
+    of the volley ages at which a bullet crosses it, and a player is hit
+    when that mask meets the ages of the live volleys. A step costs the
+    same however many bullets are in flight.
+
+    Games are indexed 0..n-1, cells are (x, y) with x the column.
+    """
+
+    def __init__(self, grids, move_interval=MOVE_INTERVAL, shoot_interval=SHOOT_INTERVAL, checkpoint_goal=False):
+        """
+        Args:
+            grids: (n, h, w) array or list of equal shape grids of
+                loader.PALETTE cell codes, each with a spawn.
+            move_interval (int): ticks between bullet moves.
+            shoot_interval (int): ticks between volleys.
+            checkpoint_goal (bool): a reached checkpoint also becomes the
+                goal, as in maze_processing.
+
+        Raises:
+            RuntimeError: if the grids differ in shape or a grid has no spawn.
+        """
+        if len({np.shape(grid) for grid in grids}) != 1:
+            raise RuntimeError("all grids of a batch must have the same shape")
+        self.grids = np.asarray(grids, dtype=np.int8)
+        self.n, self.height, self.width = self.grids.shape
+        self.move_interval = move_interval
+        self.shoot_interval = shoot_interval
+        self.checkpoint_goal = checkpoint_goal
+
+        # game g, cell (x, y) is blocked[g * pad_size + (y + 1) * pitch + x + 1]
+        self.pitch = self.width + 2
+        self.pad_size = (self.height + 2) * self.pitch
+        # game g, cell (x, y) is cells[g * size + y * width + x]
+        self.size = self.height * self.width
+        self._games = np.arange(self.n) * self.pad_size
+        # (n, 2) player cells, x and y are its columns
+        self.position = np.empty((self.n, 2), dtype=np.int64)
+        self.x, self.y = self.position[:, 0], self.position[:, 1]
+        self.respawn_x, self.respawn_y = np.empty(self.n, dtype=np.int64), np.empty(self.n, dtype=np.int64)
+        self.target_x, self.target_y = np.empty(self.n, dtype=np.int64), np.empty(self.n, dtype=np.int64)
+        self.active_checkpoint = np.empty(self.n, dtype=np.int32)
+        self.done = np.empty(self.n, dtype=bool)
+        self.load(self.grids)
+
+    def load(self, grids):
+        """
+        Start every game over on new layouts of the batch's shape.
+
+        grids, position and active_checkpoint are updated in place, so
+        views of them stay valid.
+
+        Raises:
+            RuntimeError: if the grids have another shape or a grid has no spawn.
+        """
+        grids = np.asarray(grids, dtype=np.int8)
+        if grids.shape != self.grids.shape:
+            raise RuntimeError(f"expected grids of shape {self.grids.shape}, got {grids.shape}")
+        flat = grids.reshape(self.n, -1)
+        spawns = _last_cell(flat, SPAWN)
+        if (spawns < 0).any():
+            raise RuntimeError(f"grids without a spawn: {np.flatnonzero(spawns < 0).tolist()}")
+        self.grids[:] = grids
+
+        goals = _last_cell(flat, GOAL)
+        self.spawn_x, self.spawn_y = spawns % self.width, spawns // self.width
+        self.goal_x = np.where(goals >= 0, goals % self.width, -1)
+        self.goal_y = np.where(goals >= 0, goals // self.width, -1)
+        self.blocked = passability_mask(self.grids).ravel()
+
+        # checkpoint indices count per game in row-major order, as layout.checkpoints
+        self.checkpoint_id = np.full(self.n * self.size, -1, dtype=np.int32)
+        cells = np.flatnonzero(flat == CHECKPOINT)
+        first = np.searchsorted(cells, np.arange(self.n) * self.size)
+        self.checkpoint_id[cells] = np.arange(len(cells)) - first[cells // self.size]
+
+        self._build_hazards()
+        self.reset()
+
+    def _build_hazards(self):
+        # one HazardMap over the grids stacked with a wall row between games,
+        # which stops vertical rays at the edge of their game
+        stacked = np.ones((self.n, self.height + 1, self.width), dtype=np.int8)
+        stacked[:, :self.height] = self.grids
+        self.hazards = HazardMap(stacked.reshape(-1, self.width)[:-1])
+        self.max_age = int(self.hazards.lengths.max(initial=0))
+
+        # records are sorted by stacked cell, each cell repeated once per record
+        stacked_cells = np.repeat(np.arange(self.hazards.height * self.width), self.hazards.coverage.ravel())
+        rows, cols = np.divmod(stacked_cells, self.width)
+        cells = (rows // (self.height + 1)) * self.size + (rows % (self.height + 1)) * self.width + cols
+
+        # one bit per volley age, in as few bytes as the longest ray needs
+        self.words = max(1, -(-self.max_age // 64))
+        dtype = next(t for t in (np.uint8, np.uint16, np.uint32, np.uint64)
+                     if self.max_age <= np.iinfo(t).bits) if self.words == 1 else np.uint64
+        self.age_bits = np.zeros((self.n * self.size, self.words), dtype=dtype)
+        bits = np.iinfo(dtype).bits
+        for age in range(self.max_age):
+            at = cells[self.hazards.tick == age]
+            self.age_bits[at, age // bits] |= dtype(1) << dtype(age % bits)
+        self._live_bits = np.zeros(self.words, dtype=dtype)
+
+    def reset(self, games=None):
+        """
+        Put players back on their spawn.
+
+        Args:
+            games: optional bool mask or indices of the games to restart,
+                the others carry on. By default every game restarts and
+                the clock starts over from tick 0.
+        """
+        if games is None:
+            games = slice(None)
+            self.tick = 0
+            self.bullet_steps = 0
+            # bullet steps at which the live volleys were fired
+            self.volleys = []
+        # arrays are updated in place, so views of them stay valid
+        self.x[games] = self.spawn_x[games]
+        self.y[games] = self.spawn_y[games]
+        self.respawn_x[games] = self.spawn_x[games]
+        self.respawn_y[games] = self.spawn_y[games]
+        self.target_x[games] = self.goal_x[games]
+        self.target_y[games] = self.goal_y[games]
+        self.active_checkpoint[games] = -1
+        self.done[games] = False
+
+    def _update_live_bits(self):
+        self.volleys = [fired for fired in self.volleys if self.bullet_steps - fired < self.max_age]
+        bits = np.iinfo(self._live_bits.dtype).bits
+        self._live_bits[:] = 0
+        for fired in self.volleys:
+            age = self.bullet_steps - fired
+            self._live_bits[age // bits] |= self._live_bits.dtype.type(1) << self._live_bits.dtype.type(age % bits)
+
+    def step(self, actions):
+        """
+        Advance every game one tick.
+
+        Args:
+            actions (np.ndarray): (n,) int indices into MOVES or NO_MOVE.
+                Games that are done ignore their action.
+
+        Returns:
+            dict of (n,) arrays:
+                x, y: player cells, the simulator's own arrays.
+                hit: a bullet sent the player back to its spawn.
+                checkpoint: index of the checkpoint reached this tick, -1
+                    where none was.
+                won: the player is on its goal, the game is done from
+                    then on.
+        """
+        self.tick += 1
+        actions = np.where(self.done, NO_MOVE, actions) + 1
+        dx, dy = _ACTION_DX[actions], _ACTION_DY[actions]
+        target = self._games + (self.y + dy + 1) * self.pitch + self.x + dx + 1
+        moved = (actions != NO_MOVE + 1) & ((self.blocked[target] & BLOCKS_PLAYER) == 0)
+        self.x += np.where(moved, dx, 0)
+        self.y += np.where(moved, dy, 0)
+
+        cells = np.arange(self.n) * self.size + self.y * self.width + self.x
+        checkpoint = np.where(moved, self.checkpoint_id[cells], -1)
+        reached = checkpoint >= 0
+        if reached.any():
+            self.respawn_x[reached] = self.x[reached]
+            self.respawn_y[reached] = self.y[reached]
+            self.active_checkpoint[reached] = checkpoint[reached]
+            if self.checkpoint_goal:
+                self.target_x[reached] = self.x[reached]
+                self.target_y[reached] = self.y[reached]
+
+        changed = False
+        if self.tick % self.move_interval == 0:
+            self.bullet_steps += 1
+            changed = True
+        if self.tick % self.shoot_interval == 0 and self.max_age:
+            self.volleys.append(self.bullet_steps)
+            changed = True
+        if changed:
+            self._update_live_bits()
+
+        check = moved | changed
+        hit = np.zeros(self.n, dtype=bool)
+        if self.volleys and check.any():
+            hit = check & (self.age_bits[cells] & self._live_bits).any(axis=1)
+            self.x[hit] = self.respawn_x[hit]
+            self.y[hit] = self.respawn_y[hit]
+
+        won = (self.x == self.target_x) & (self.y == self.target_y)
+        self.done |= won
+        return {"x": self.x, "y": self.y, "hit": hit, "checkpoint": checkpoint, "won": won}
+
+    def run(self, actions):
+        """
+        Step through a (ticks, n) array of actions.
+
+        Returns:
+            dict of (n,) arrays: x, y final player cells, hits and
+                checkpoints counts, won_at the first tick the game was won,
+                -1 if it wasn't.
+        """
+        hits = np.zeros(self.n, dtype=np.int32)
+        checkpoints = np.zeros(self.n, dtype=np.int32)
+        won_at = np.full(self.n, -1, dtype=np.int64)
+        for tick_actions in actions:
+            state = self.step(tick_actions)
+            hits += state["hit"]
+            checkpoints += state["checkpoint"] >= 0
+            won_at[state["won"] & (won_at < 0)] = self.tick
+        return {"x": self.x.copy(), "y": self.y.copy(), "hits": hits, "checkpoints": checkpoints, "won_at": won_at}
+
+    def occupancy(self, out=None):
+        """
+        Which cells of every game hold a bullet, one array operation over all games.
+
+        Args:
+            out (np.ndarray): optional (n, h, w) bool array to fill in place.
+
+        Returns:
+            np.ndarray: (n, h, w) bool array.
+        """
+        if out is None:
+            out = np.empty((self.n, self.height, self.width), dtype=bool)
+        np.any(self.age_bits & self._live_bits, axis=1, out=out.reshape(-1))
+        return out
+
+    def bullet_positions(self, game):
+        """(n, 2) int array of the (x, y) cell of every bullet of one game."""
+        positions = []
+        for fired in self.volleys:
+            rows, cols = self.hazards.bullets(self.bullet_steps - fired)
+            mine = rows // (self.height + 1) == game
+            positions.append(np.stack([cols[mine], rows[mine] % (self.height + 1)], axis=1))
+        if not positions:
+            return np.zeros((0, 2), dtype=np.intp)
+        return np.concatenate(positions)
+
+
+def _run_job(job):
+    grids, actions, options = job
+    return BatchSimulation(grids, **options).run(actions)
+
+
+def simulate(grids, actions, workers=None, **options):
+    """
+    Run a batch of games split across a process pool, one BatchSimulation per worker.
+
+    Args:
+        grids: (n, h, w) equal shape grids.
+        actions (np.ndarray): (ticks, n) actions.
+        workers (int): pool size, defaults to os.cpu_count(). With 1 the
+            batch runs in this process.
+        **options: passed on to BatchSimulation.
+
+    Returns:
+        dict: the BatchSimulation.run summary of all n games, in order.
+    """
+    grids = np.asarray(grids, dtype=np.int8)
+    actions = np.asarray(actions)
+    workers = workers or multiprocessing.cpu_count()
+    if workers == 1:
+        return BatchSimulation(grids, **options).run(actions)
+
+    splits = np.array_split(np.arange(len(grids)), workers)
+    jobs = [(grids[games], actions[:, games], options) for games in splits if len(games)]
+    with multiprocessing.Pool(len(jobs)) as pool:
+        results = pool.map(_run_job, jobs)
+    return {key: np.concatenate([result[key] for result in results]) for key in results[0]}
@@ -0,0 +1,212 @@
+import argparse
+import contextlib
+import functools
+import io
+import json
+import os
+import sys
+import tempfile
+import timeit
+
+# draws into offscreen surfaces, no display needed
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+import pygame
+
+import maze_processing
+from generate import generate_solvable_binary_maze
+from layout_cache import CompiledLayout
+from loader import get_maze, save_maze_image
+from maze_format import PALETTE_BINARY, to_game_codes
+from simulation import Simulation
+
+OUTPUT = "bench_output.txt"
+BASELINE = "bench_baseline.txt"
+
+SIZES = (25, 128, 512, 1024, 2048)
+# share of the cells that are turrets
+DENSITIES = (0.0, 0.001, 0.01)
+BULLET_MODES = ("analytic", "pool")
+
+# a result this many times slower than its baseline is reported as a regression
+REGRESSION_RATIO = 1.5
+
+BULLET_MOVES = 10
+STEP_CALLS = 10000
+
+
+def suite_layout(size, density, seed=0):
+    """
+    A generated size x size game layout with round(density * size ** 2) of
+    its walls made turrets, the spawn on its first path cell and the goal
+    on its last one in row-major order.
+    """
+    grid = to_game_codes(generate_solvable_binary_maze(size, seed=seed), PALETTE_BINARY).astype(np.int8)
+    walls = np.flatnonzero(grid.ravel() == 1)
+    count = min(round(density * grid.size), len(walls))
+    grid.ravel()[np.random.default_rng(seed).choice(walls, count, replace=False)] = 2
+    paths = np.flatnonzero(grid.ravel() == 0)
+    grid.ravel()[paths[0]] = -2
+    grid.ravel()[paths[-1]] = -1
+    return grid
+
+
+def best_time(fn, *args, repeat=3):
+    """Return the best wall time in seconds of one fn(*args) call over repeat runs."""
+    return min(timeit.repeat(functools.partial(fn, *args), number=1, repeat=repeat))
+
+
+def _new_maze(layout):
+    cell_size = maze_processing.cell_size_for(layout.grid)
+    player = maze_processing.Player((cell_size, cell_size), maze_processing.PLAYER1_COLOR, None, cell_size)
+    return maze_processing.Maze(layout, player)
+
+
+def bench_layout(grid, modes, out_dir):
+    """
+    Time the game's layout, simulation and drawing paths on one layout.
+
+    Returns:
+        list: (benchmark, mode, seconds) tuples, mode None for the ones that
+            don't depend on the bullet mode.
+    """
+    path = os.path.join(out_dir, "suite.png")
+    save_maze_image(grid, path)
+    results = [("get_maze", None, best_time(get_maze, path))]
+
+    layout = CompiledLayout.of(grid)
+    actions = np.random.default_rng(0).integers(4, size=STEP_CALLS).tolist()
+    screen = pygame.Surface((maze_processing.SCREEN_WIDTH, maze_processing.SCREEN_HEIGHT))
+
+    results.append(("maze_init", None, best_time(_new_maze, layout)))
+    maze = _new_maze(layout)
+    results.append(("swap_maze", None, best_time(maze.swap_maze, layout)))
+    # Maze.draw prints on every call
+    with contextlib.redirect_stdout(io.StringIO()):
+        results.append(("draw", None, best_time(maze.draw, screen, repeat=1 if grid.size > 512 ** 2 else 3)))
+
+    for mode in modes:
+        results.append(("sim_init", mode, best_time(Simulation, layout, mode)))
+        # bullets move on every tick
+        sim = Simulation(layout, mode, move_interval=1)
+        results.append(("sim_load", mode, best_time(sim.load, layout)))
+
+        # each shot adds a volley, the moves then carry repeat volleys
+        results.append(("shoot", mode, best_time(sim.bullets.shoot)))
+
+        def move_bullets():
+            for _ in range(BULLET_MOVES):
+                sim.bullets.step()
+
+        results.append(("move_bullets", mode, best_time(move_bullets, repeat=1) / BULLET_MOVES))
+
+        def step():
+            for action in actions:
+                sim.step(action)
+
+        results.append(("step", mode, best_time(step) / STEP_CALLS))
+    return results
+
+
+def run_suite(sizes=SIZES, densities=DENSITIES, modes=BULLET_MODES):
+    """
+    Time every benchmark of the suite.
+
+    Returns:
+        list: one dict per result with benchmark, size, density, turrets,
+            mode and seconds keys.
+    """
+    records = []
+
+    def record(benchmark, size, density, turrets, mode, seconds):
+        records.append({"benchmark": benchmark, "size": size, "density": density, "turrets": turrets,
+                        "mode": mode, "seconds": seconds})
+        label = benchmark if mode is None else f"{benchmark} {mode}"
+        elapsed = f"{seconds * 1000:.2f} ms" if seconds >= 1e-3 else f"{seconds * 1e6:.2f} us"
+        print(f"{label} {size}x{size} {turrets} turrets: {elapsed}", flush=True)
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        for size in sizes:
+            record("generate", size, None, 0, None, best_time(generate_solvable_binary_maze, size, 0, repeat=1))
+            for density in densities:
+                grid = suite_layout(size, density)
+                turrets = int((grid == 2).sum())
+                for benchmark, mode, seconds in bench_layout(grid, modes, out_dir):
+                    record(benchmark, size, density, turrets, mode, seconds)
+    return records
+
+
+def _key(record):
+    return record["benchmark"], record["size"], record["density"], record["mode"]
+
+
+def load_results(path):
+    """Read the records of a results file written by save_results."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_results(records, path):
+    """Write records as JSON lines, one result per line."""
+    with open(path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def compare(records, baseline):
+    """
+    Add baseline seconds and the ratio to them to every record that has a
+    baseline result with the same benchmark, size, density and mode.
+
+    Returns:
+        list: the records at least REGRESSION_RATIO times slower than
+            their baseline.
+    """
+    previous = {_key(record): record["seconds"] for record in baseline}
+    regressions = []
+    for record in records:
+        seconds = previous.get(_key(record))
+        if seconds is None:
+            continue
+        record["baseline"] = seconds
+        record["ratio"] = record["seconds"] / seconds if seconds else None
+        if record["ratio"] is not None and record["ratio"] >= REGRESSION_RATIO:
+            regressions.append(record)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=f"Time the game's load, build, simulate and render paths over a sweep of layout sizes "
+                    f"and turret densities, write the results to {OUTPUT} and compare them to a baseline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--densities", type=float, nargs="+", default=DENSITIES)
+    parser.add_argument("--modes", nargs="+", default=BULLET_MODES, choices=BULLET_MODES)
+    parser.add_argument("--output", default=OUTPUT)
+    parser.add_argument("--baseline", default=BASELINE, help="results file to compare against, if it exists")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 if a result regressed")
+    args = parser.parse_args()
+
+    records = run_suite(args.sizes, args.densities, args.modes)
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        regressions = compare(records, load_results(args.baseline))
+        compared = sum("baseline" in record for record in records)
+        print(f"{compared} of {len(records)} results compared to {args.baseline}, "
+              f"{len(regressions)} at least {REGRESSION_RATIO}x slower")
+        for record in regressions:
+            print(f"  {record['benchmark']} {record['mode'] or ''} {record['size']}x{record['size']} "
+                  f"density {record['density']}: {record['ratio']:.2f}x")
+    save_results(records, args.output)
+    if args.save_baseline:
+        save_results(records, args.baseline)
+        print(f"baseline stored in {args.baseline}")
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,529 @@
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+LAYOUT = 'maze_hard_v1.png'
+
+
+def timeit(fn, *args, repeat=3):
+    """Return the best wall time in seconds of fn(*args) over repeat runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def tiled_layout(size, out_dir):
+    """Tile LAYOUT up to a size x size PNG and return its path."""
+    from PIL import Image
+
+    with Image.open(LAYOUT) as image:
+        rgba = np.asarray(image.convert("RGBA"))
+    reps = (-(-size // rgba.shape[0]), -(-size // rgba.shape[1]), 1)
+    tiled = np.tile(rgba, reps)[:size, :size]
+    path = os.path.join(out_dir, f"layout_{size}.png")
+    Image.fromarray(tiled).save(path)
+    return path
+
+
+def bench_get_maze(sizes=(25, 250, 1000)):
+    from loader import get_maze, get_maze_pixelwise
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        for size in sizes:
+            path = tiled_layout(size, out_dir)
+            assert get_maze(path) == get_maze_pixelwise(path)
+            slow = timeit(get_maze_pixelwise, path, repeat=1)
+            fast = timeit(get_maze, path)
+            print(f"get_maze {size}x{size}: pixelwise {slow * 1000:.1f} ms, "
+                  f"vectorized {fast * 1000:.1f} ms ({slow / fast:.0f}x)")
+
+
+def bench_layout_cache(sizes=(25, 1000)):
+    import layout_cache
+
+    cache_dir = layout_cache.CACHE_DIR
+    with tempfile.TemporaryDirectory() as out_dir:
+        layout_cache.CACHE_DIR = os.path.join(out_dir, "cache")
+        try:
+            for size in sizes:
+                path = tiled_layout(size, out_dir)
+                layout_cache.clear_cache()
+                cold = timeit(layout_cache.load_layout, path, repeat=1)
+                layout_cache.clear_cache()
+                disk = timeit(layout_cache.load_layout, path, repeat=1)
+                warm = timeit(layout_cache.load_layout, path)
+                print(f"load_layout {size}x{size}: compile {cold * 1000:.2f} ms, "
+                      f"mmap {disk * 1000:.2f} ms, lru {warm * 1000:.3f} ms")
+        finally:
+            # the entries mapped from the temporary directory go with it
+            layout_cache.clear_cache()
+            layout_cache.CACHE_DIR = cache_dir
+
+
+# best of 7 runs of each snippet at d2d7edd, before imports stopped doing
+# pygame.init() and a full get_maze, on a 1 CPU Linux box; the ratio is
+# only meaningful on similar hardware
+STARTUP_BASELINE_MS = {
+    "import maze_2player": 316.9,
+    "spawn child importing maze_2player": 539.6,
+}
+
+STARTUP_SNIPPETS = {
+    "import maze_2player": "import maze_2player",
+    "spawn child importing maze_2player": "import importlib, multiprocessing; "
+                                          "child = multiprocessing.get_context('spawn').Process("
+                                          "target=importlib.import_module, args=('maze_2player',)); "
+                                          "child.start(); child.join()",
+}
+
+
+def _run_python(snippet):
+    code = f"import time; t = time.perf_counter(); {snippet}; print(time.perf_counter() - t)"
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", PYGAME_HIDE_SUPPORT_PROMPT="1")
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return float(out.stdout.split()[-1])
+
+
+def bench_startup(repeat=5):
+    for name, snippet in STARTUP_SNIPPETS.items():
+        before = STARTUP_BASELINE_MS[name] / 1000
+        after = min(_run_python(snippet) for _ in range(repeat))
+        print(f"startup {name}: {before * 1000:.1f} ms recorded at d2d7edd, {after * 1000:.1f} ms now "
+              f"({before / after:.1f}x)")
+
+
+def bench_generate(sizes=(256, 1024, 4096)):
+    from generate import generate_solvable_binary_maze
+
+    for size in sizes:
+        start = time.perf_counter()
+        maze = generate_solvable_binary_maze(size, seed=0)
+        elapsed = time.perf_counter() - start
+        carved = int(np.count_nonzero(maze))
+        print(f"generate {size}x{size}: {elapsed * 1000:.0f} ms, {carved / elapsed / 1e6:.2f} M cells carved/s")
+
+
+def bench_pack(count=64, size=255):
+    from maze_pack import build_pack
+
+    workers = 1
+    with tempfile.TemporaryDirectory() as out_dir:
+        while workers <= (os.cpu_count() or 1):
+            elapsed = timeit(build_pack, os.path.join(out_dir, "mazes.pack"), range(count), size, workers, repeat=1)
+            print(f"pack {count} x {size}x{size}, {workers} worker(s): {count / elapsed:.1f} mazes/s")
+            workers *= 2
+
+
+def bench_stream(width=1001, height=10001):
+    from maze_stream import stream_maze
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        for name in ("tall.mzb", "tall.png"):
+            path = os.path.join(out_dir, name)
+            elapsed = timeit(stream_maze, path, width, height, 0, repeat=1)
+            print(f"stream {width}x{height} -> {name}: {elapsed * 1000:.0f} ms, "
+                  f"{width * height / elapsed / 1e6:.2f} M cells/s, {os.path.getsize(path)} bytes")
+
+
+def _export_rgba(maze, path):
+    from generate import binary_maze_to_image
+    from loader import PATH_COLOR, WALL_COLOR
+
+    binary_maze_to_image(maze, PATH_COLOR, WALL_COLOR, path)
+
+
+def _export_palette(maze, path):
+    from generate import binary_maze_to_image
+    from loader import PATH_COLOR, WALL_COLOR
+
+    binary_maze_to_image(maze, PATH_COLOR, WALL_COLOR, path, mode="P")
+
+
+def _export_codes(maze, path):
+    from loader import save_maze_image
+    from maze_format import PALETTE_BINARY, to_game_codes
+
+    save_maze_image(to_game_codes(maze, PALETTE_BINARY), path)
+
+
+def bench_export(sizes=(25, 1024, 4096), batch=32):
+    from generate import generate_solvable_binary_maze
+    from loader import get_maze_array
+    from maze_format import PALETTE_BINARY, to_game_codes
+    from maze_pack import build_pack, export_pack_images
+
+    exporters = {"rgba": _export_rgba, "palette": _export_palette, "codes": _export_codes}
+    results = []
+    # binary_maze_to_image prints a line per file
+    with tempfile.TemporaryDirectory() as out_dir, contextlib.redirect_stdout(io.StringIO()):
+        for size in sizes:
+            maze = generate_solvable_binary_maze(size, seed=0)
+            for name, export in exporters.items():
+                path = os.path.join(out_dir, f"{name}_{size}.png")
+                elapsed = timeit(export, maze, path)
+                assert (get_maze_array(path) == to_game_codes(maze, PALETTE_BINARY)).all()
+                results.append(f"export {size}x{size} {name}: {elapsed * 1000:.1f} ms, {os.path.getsize(path)} bytes")
+
+        pack = os.path.join(out_dir, "mazes.pack")
+        build_pack(pack, range(batch), 255, 1)
+        elapsed = timeit(export_pack_images, pack, os.path.join(out_dir, "images"), repeat=1)
+        results.append(f"export batch of {batch} 255x255: {elapsed * 1000:.1f} ms")
+    print("\n".join(results))
+
+
+def bench_verify(sizes=(1001, 2001)):
+    from generate import generate_solvable_binary_maze
+    from loader import get_maze_array
+    from maze_verify import connectivity_report, path_connected
+
+    grid = get_maze_array(LAYOUT)
+    elapsed = timeit(connectivity_report, grid, repeat=20)
+    print(f"verify {grid.shape[0]}x{grid.shape[1]} layout: {elapsed * 1000:.3f} ms")
+    for size in sizes:
+        passable = generate_solvable_binary_maze(size, seed=0) == 1
+        elapsed = timeit(path_connected, passable, (0, 0), (size - 1, size - 1))
+        print(f"verify {size}x{size} maze: {elapsed * 1000:.1f} ms")
+
+
+def bench_distance_field(sizes=(1001, 2001)):
+    from distance_field import DistanceField
+    from generate import generate_solvable_binary_maze
+    from loader import get_maze_array
+    from maze_format import PALETTE_BINARY, to_game_codes
+
+    grid = get_maze_array(LAYOUT)
+    # argwhere gives (row, col), DistanceField takes (x, y)
+    goal = tuple(np.argwhere(grid == -1)[0][::-1].tolist())
+    elapsed = timeit(DistanceField, grid, goal, repeat=20)
+    print(f"distance field {grid.shape[0]}x{grid.shape[1]} layout: {elapsed * 1000:.3f} ms")
+    for size in sizes:
+        grid = to_game_codes(generate_solvable_binary_maze(size, seed=0), PALETTE_BINARY)
+        elapsed = timeit(DistanceField, grid, (size - 1, size - 1), repeat=1)
+        print(f"distance field {size}x{size} maze: {elapsed * 1000:.0f} ms")
+
+
+def bench_pathfinding(size=2048):
+    from generate import generate_solvable_binary_maze
+    from loader import get_maze_array
+    from maze_format import PALETTE_BINARY, to_game_codes
+    from pathfinding import GridGraph, astar, find_paths, jump_point_search, turret_weights
+
+    rooms = np.zeros((size, size), dtype=np.int8)
+    rooms[::64] = 1
+    rooms[:, ::64] = 1
+    rooms[32::64] = 0
+    rooms[:, 32::64] = 0
+    maze = to_game_codes(generate_solvable_binary_maze(size - 1, seed=0), PALETTE_BINARY)
+    for name, grid, start in (("open", np.zeros((size, size), dtype=np.int8), (0, 0)),
+                              ("rooms", rooms, (1, 1)), ("maze", maze, (0, 0))):
+        graph = GridGraph(grid)
+        tables = timeit(graph.jump_tables, repeat=1)
+        goal = (size - 2, size - 2)
+        for search in (astar, jump_point_search):
+            elapsed = timeit(search, graph, start, goal, repeat=1)
+            print(f"path {name} {size}x{size} {search.__name__}: {elapsed * 1000:.1f} ms")
+        print(f"path {name} {size}x{size} jump tables: {tables * 1000:.0f} ms")
+
+    grid = get_maze_array(LAYOUT)
+    free = [(int(x), int(y)) for y, x in np.argwhere(grid == 0)]
+    goal = tuple(int(v) for v in np.argwhere(grid == -1)[0][::-1])
+    pairs = [(cell, goal) for cell in free]
+    elapsed = timeit(find_paths, grid, pairs, repeat=1)
+    print(f"path batch of {len(pairs)} to one goal: {elapsed * 1000:.1f} ms")
+    elapsed = timeit(find_paths, grid, pairs, turret_weights(grid), repeat=1)
+    print(f"path batch of {len(pairs)} to one goal, turret weighted: {elapsed * 1000:.1f} ms")
+
+
+def bench_hazard(sizes=(1024, 2048), densities=(0.001, 0.01)):
+    from generate import generate_solvable_binary_maze
+    from loader import get_maze_array
+    from maze_format import PALETTE_BINARY, to_game_codes
+    from turret_hazard import HazardMap
+
+    grid = get_maze_array(LAYOUT)
+    elapsed = timeit(HazardMap, grid, repeat=20)
+    print(f"hazard map {grid.shape[0]}x{grid.shape[1]} layout: {elapsed * 1000:.3f} ms")
+    rng = np.random.default_rng(0)
+    for size in sizes:
+        maze = to_game_codes(generate_solvable_binary_maze(size, seed=0), PALETTE_BINARY)
+        for density in densities:
+            grid = np.where((maze == 1) & (rng.random(maze.shape) < density), 2, maze).astype(np.int8)
+            elapsed = timeit(HazardMap, grid, repeat=1)
+            hazards = HazardMap(grid)
+            mask = timeit(hazards.danger_mask, 3)
+            print(f"hazard map {size}x{size} with {len(hazards.turrets)} turrets: {elapsed * 1000:.0f} ms, "
+                  f"{len(hazards.tick)} records, danger mask {mask * 1000:.2f} ms")
+
+
+def turret_field(size, spacing):
+    """An open size x size layout walled at the border with a turret every spacing cells."""
+    grid = np.zeros((size, size), dtype=np.int8)
+    grid[[0, -1]] = 1
+    grid[:, [0, -1]] = 1
+    grid[spacing::spacing, spacing::spacing] = 2
+    grid[1, 1] = -2
+    grid[-2, -2] = -1
+    return grid
+
+
+def bench_bullets(size=256, spacings=(32, 8), ticks=100, interval=10):
+    from bullet_model import BulletPool
+    from distance_field import NO_MOVE
+    from simulation import Simulation
+
+    for spacing in spacings:
+        grid = turret_field(size, spacing)
+        for mode in ("analytic", "pool"):
+            sim = Simulation(grid, mode, move_interval=1, shoot_interval=interval)
+
+            def run():
+                for _ in range(ticks):
+                    sim.step(NO_MOVE)
+
+            elapsed = timeit(run, repeat=1)
+            print(f"bullets {size}x{size} {len(sim.layout.turrets)} turrets {mode}: "
+                  f"{elapsed / ticks * 1000:.2f} ms/tick, {len(sim.bullets)} live bullets")
+
+    # the pool on its own with over 100k live bullets
+    pool = BulletPool(turret_field(1024, 8))
+    for tick in range(20):
+        if tick % interval == 0:
+            pool.shoot()
+        pool.step()
+    elapsed = timeit(pool.step, repeat=1)
+    occupancy = timeit(pool.occupancy, repeat=1)
+    hit = timeit(pool.bullet_at, 512, 512, repeat=5)
+    print(f"bullet pool step with {len(pool)} live bullets: {elapsed * 1000:.2f} ms, "
+          f"occupancy {occupancy * 1000:.2f} ms, hit test {hit * 1e6:.1f} us")
+
+
+def bench_swap(sizes=(50, 1000)):
+    import maze_processing
+    from loader import get_maze_array
+    from simulation import Simulation
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            layout = get_maze_array(tiled_layout(size, tmp))
+            cell_size = maze_processing.cell_size_for(layout)
+            player = maze_processing.Player((cell_size, cell_size), None, None, cell_size)
+            maze = maze_processing.Maze(layout, player)
+            sim = Simulation(layout)
+            shown = timeit(maze.swap_maze, layout)
+            loaded = timeit(sim.load, layout)
+            print(f"swap {size}x{size} {len(maze.turret_cells)} turrets: Maze.swap_maze {shown * 1000:.2f} ms, "
+                  f"Simulation.load {loaded * 1000:.2f} ms")
+
+
+def bench_checkpoints(size=400, counts=(3, 5000), frames=100000):
+    from simulation import Simulation
+
+    rng = np.random.default_rng(0)
+    for count in counts:
+        grid = turret_field(size, size)
+        cells = rng.choice((size - 2) ** 2, count, replace=False)
+        grid[1 + cells // (size - 2), 1 + cells % (size - 2)] = 6
+        grid[1, 1] = -2
+        sim = Simulation(grid)
+        # back and forth along the top row, a new cell every frame
+        lap = [2] * (size - 3) + [3] * (size - 3)
+        actions = (lap * (frames // len(lap) + 1))[:frames]
+
+        def run():
+            sim.restart()
+            for action in actions:
+                sim.step(action)
+
+        elapsed = timeit(run, repeat=1)
+        print(f"checkpoints {count} checkpoints, new cell every frame: {elapsed / frames * 1e6:.2f} us/frame")
+
+
+def movable_rect(player, dx, dy, maze):
+    # the old Player.movable, a moved Rect and two nested lookups, kept for comparison
+    new_rect = player.rect.move(dx * maze.cell_size, dy * maze.cell_size)
+    i, j = new_rect.y // maze.cell_size, new_rect.x // maze.cell_size
+    return maze.maze[i][j] != 1 and maze.maze[i][j] != 2
+
+
+def bench_moves(moves=200000):
+    import maze_processing
+    from distance_field import MOVES
+    from simulation import Simulation
+
+    layout = maze_processing.MAZE_LAYOUTS[0].compiled()
+    cell_size = maze_processing.cell_size_for(layout.grid)
+    rng = np.random.default_rng(0)
+    actions = rng.integers(4, size=moves).tolist()
+    steps = [MOVES[action] for action in actions]
+    player = maze_processing.Player((cell_size, cell_size), None, None, cell_size)
+    maze = maze_processing.Maze(layout, player)
+
+    def run_rect():
+        for dx, dy in steps:
+            if movable_rect(player, dx, dy, maze):
+                player.rect.x += dx * cell_size
+                player.rect.y += dy * cell_size
+
+    # the whole tick, with the turrets' clock and the hit check
+    sim = Simulation(layout)
+
+    def run_simulation():
+        for action in actions:
+            sim.step(action)
+
+    for name, run in (("rect + nested lookup", run_rect), ("Simulation.step", run_simulation)):
+        elapsed = timeit(run, repeat=1)
+        print(f"moves {name}: {moves / elapsed / 1e6:.2f} M moves/s")
+
+
+def bench_simulation(sizes=(25, 50), ticks=200000):
+    from generate import generate_game_layout
+    from simulation import Simulation
+
+    rng = np.random.default_rng(0)
+    actions = rng.integers(-1, 4, ticks).tolist()
+    for size in sizes:
+        grid = generate_game_layout(size)
+        for mode in ("analytic", "pool"):
+            sim = Simulation(grid, mode)
+            elapsed = timeit(sim.run, actions, repeat=1)
+            print(f"simulation {size}x{size} {mode}: {ticks / elapsed:,.0f} ticks/s")
+
+
+def bench_batch(games=10000, size=25, ticks=300):
+    from batch_simulation import BatchSimulation, simulate
+    from generate import generate_game_layout
+
+    grids = np.stack([generate_game_layout(size, seed=seed % 64) for seed in range(games)])
+    actions = np.random.default_rng(0).integers(-1, 4, (ticks, games))
+    build = timeit(BatchSimulation, grids, repeat=1)
+    sim = BatchSimulation(grids)
+    elapsed = timeit(sim.run, actions, repeat=1)
+    print(f"batch of {games} {size}x{size} games: build {build:.2f} s, {ticks / elapsed:,.0f} ticks/s, "
+          f"{ticks * games / elapsed / 1e6:.1f} M game-ticks/s")
+    workers = os.cpu_count()
+    elapsed = timeit(simulate, grids, actions, workers, repeat=1)
+    print(f"batch of {games} games on {workers} worker(s), build included: "
+          f"{ticks * games / elapsed / 1e6:.1f} M game-ticks/s")
+
+
+def bench_env(size=25, steps=100000, games=1000, vector_steps=300):
+    from generate import generate_game_layout
+    from maze_env import MazeEnv, VectorMazeEnv
+    from simulation import Simulation
+
+    actions = np.random.default_rng(0).integers(-1, 4, steps).tolist()
+    grid = generate_game_layout(size)
+    sim = Simulation(grid)
+    bare = timeit(sim.run, actions, repeat=1)
+    env = MazeEnv([grid], max_steps=steps + 1)
+    env.reset(seed=0)
+    elapsed = timeit(lambda: [env.step(action) for action in actions], repeat=1)
+    print(f"env {size}x{size}: {elapsed / steps * 1e6:.2f} us/step, "
+          f"{(elapsed - bare) / steps * 1e6:.2f} us over the bare simulation")
+
+    layouts = [generate_game_layout(size, seed=seed) for seed in range(64)]
+    actions = np.random.default_rng(0).integers(-1, 4, (vector_steps, games))
+    for bullets in (True, False):
+        env = VectorMazeEnv(games, layouts, bullets=bullets)
+        env.reset(seed=0)
+        elapsed = timeit(lambda: [env.step(tick_actions) for tick_actions in actions], repeat=1)
+        print(f"vector env of {games} games, bullets observed {bullets}: {elapsed / vector_steps * 1e3:.2f} ms/step, "
+              f"{elapsed / vector_steps / games * 1e9:.0f} ns per game step")
+
+
+def bench_replay(hours=1, fps=30):
+    from distance_field import NO_MOVE
+    from layout_cache import LayoutRegistry
+    from replay import Recording, SessionRecorder, replay
+    from simulation import Simulation
+
+    grid = LayoutRegistry([LAYOUT])[0].load()
+    ticks = hours * 3600 * fps
+    rng = np.random.default_rng(0)
+    # a key press every 6 frames on average
+    actions = np.where(rng.random(ticks) < 1 / 6, rng.integers(0, 4, ticks), NO_MOVE).tolist()
+    recorder = SessionRecorder(Simulation(grid, checkpoint_goal=True))
+    record = timeit(lambda: [recorder.step(action) for action in actions], repeat=1)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "session.mzr")
+        recorder.save(path)
+        size = os.path.getsize(path)
+        elapsed = timeit(lambda: replay(Recording.load(path), grid), repeat=1)
+    print(f"replay of {hours} h ({ticks} ticks, {len(recorder.actions)} inputs, {size / 1024:.1f} KiB): "
+          f"recorded in {record:.2f} s, replayed and checked in {elapsed:.3f} s")
+
+
+def bench_cadence(counts=(16129, 262144), period=None, ticks=600, size=512, spacing=4):
+    from bullet_model import BulletPool
+    from simulation import SHOOT_INTERVAL, staggered_fire
+    from tick_scheduler import TurretCadence
+
+    period = period or SHOOT_INTERVAL
+    # the scheduler against a scan of every turret's period and phase each tick
+    for count in counts:
+        rng = np.random.default_rng(0)
+        periods = rng.integers(period // 2, 2 * period, count)
+        phases = rng.integers(0, period, count) % periods
+        cadence = TurretCadence(periods, phases)
+        wheel = timeit(lambda: [cadence.advance() for _ in range(ticks)], repeat=1)
+        scan = timeit(lambda: [np.flatnonzero(tick % periods == phases) for tick in range(1, ticks + 1)], repeat=1)
+        print(f"turret cadence, {count} turrets with their own periods: timer wheel {wheel / ticks * 1e6:.0f} us/tick, "
+              f"scan of all turrets {scan / ticks * 1e6:.0f} us/tick")
+
+    # the fire spike: every turret at once against phases staggered over the period
+    grid = turret_field(size, spacing)
+    pool = BulletPool(grid)
+    volley = timeit(pool.shoot, repeat=1)
+    pool = BulletPool(grid)
+    cadence = TurretCadence(*staggered_fire(pool.turrets, period))
+    worst = total = 0.0
+    for _ in range(period):
+        start = time.perf_counter()
+        pool.shoot(cadence.advance())
+        elapsed = time.perf_counter() - start
+        worst, total = max(worst, elapsed), total + elapsed
+    print(f"firing {len(pool.turrets)} turrets every {period} ticks: one volley {volley * 1e3:.2f} ms on one tick, "
+          f"staggered {total / period * 1e3:.3f} ms/tick, {worst * 1e3:.3f} ms worst tick")
+
+
+BENCHMARKS = {
+    "get_maze": bench_get_maze,
+    "layout_cache": bench_layout_cache,
+    "startup": bench_startup,
+    "generate": bench_generate,
+    "pack": bench_pack,
+    "stream": bench_stream,
+    "export": bench_export,
+    "verify": bench_verify,
+    "distance_field": bench_distance_field,
+    "pathfinding": bench_pathfinding,
+    "hazard": bench_hazard,
+    "bullets": bench_bullets,
+    "swap": bench_swap,
+    "checkpoints": bench_checkpoints,
+    "moves": bench_moves,
+    "simulation": bench_simulation,
+    "batch": bench_batch,
+    "env": bench_env,
+    "replay": bench_replay,
+    "cadence": bench_cadence,
+}
+
+
+def main(names):
+    for name in names or BENCHMARKS:
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
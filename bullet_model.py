@@ -0,0 +1,293 @@
+from collections import deque
+
+import numpy as np
+
+from distance_field import MOVES
+from loader import BLOCKS_BULLET, BLOCKS_PLAYER, passability_mask
+from turret_hazard import TURRET, concat_ranges
+
+# grids up to this many cells are recounted whole rather than per bullet
+DENSE_CELLS = 1 << 16
+
+
+class OccupancyGrid:
+    """
+    Number of bullets on every cell of a layout, rebuilt once per tick.
+
+    A hit test is one lookup at the player's cell however many bullets
+    there are, so any number of players can be checked per tick. Cells
+    with more than one bullet answer bullet-vs-bullet queries.
+    Coordinates follow the game, x is the column and y the row.
+    """
+
+    def __init__(self, height, width):
+        self.height, self.width = height, width
+        self.counts = np.zeros(height * width, dtype=np.int32)
+        # occupied flat cells, sorted, so the next update only clears those
+        self.cells = np.zeros(0, dtype=np.intp)
+
+    def update(self, x, y):
+        """Replace the contents with bullets at the in-grid cells x, y."""
+        self.update_cells(np.asarray(y, dtype=np.intp) * self.width + x)
+
+    def update_cells(self, cells):
+        """Replace the contents with bullets at the flat cells y * width + x."""
+        if len(self.counts) <= max(DENSE_CELLS, 32 * len(cells)):
+            # a count over the whole grid is cheaper than sorting the bullets
+            self.counts[:] = np.bincount(cells, minlength=len(self.counts))
+            self.cells = np.flatnonzero(self.counts)
+            return
+        self.counts[self.cells] = 0
+        cells = np.sort(cells)
+        first = np.flatnonzero(np.diff(cells, prepend=-1))
+        self.cells = cells[first]
+        self.counts[self.cells] = np.diff(np.append(first, len(cells)))
+
+    def count(self, x, y):
+        """Number of bullets on cell (x, y), 0 outside the grid."""
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return 0
+        return int(self.counts[y * self.width + x])
+
+    def hit(self, x, y):
+        return self.count(x, y) > 0
+
+    def hits(self, x, y):
+        """Bool array, for each cell of the equal length arrays x, y, whether a bullet is on it."""
+        x, y = np.asarray(x), np.asarray(y)
+        inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        hit = np.zeros(x.shape, dtype=bool)
+        hit[inside] = self.counts[y[inside] * self.width + x[inside]] > 0
+        return hit
+
+    def collisions(self):
+        """(n, 2) int array of the (x, y) cells holding more than one bullet."""
+        cells = self.cells[self.counts[self.cells] > 1]
+        return np.stack([cells % self.width, cells // self.width], axis=1)
+
+    @property
+    def grid(self):
+        """The counts as a (height, width) view."""
+        return self.counts.reshape(self.height, self.width)
+
+
+def _fired(turrets, turret):
+    # which of the turret indices belong to a volley's bool mask or index array
+    if turrets.dtype == bool:
+        return turrets[turret]
+    return np.isin(turret, turrets)
+
+
+class VolleyBullets:
+    """
+    Turret bullets kept as volley fire ticks instead of one object per bullet.
+
+    Every bullet of a volley is on a known ray of the HazardMap, age cells
+    from its turret, so the model only stores when each volley was fired.
+    Answers match a list of bullets per turret fired and moved in the same
+    order as shoot and step, and the cost of a tick or of a cell query
+    depends on the number of volleys in flight, not on the number of
+    bullets. Coordinates follow the game, x is the column and y the row.
+    """
+
+    def __init__(self, hazards):
+        self.hazards = hazards
+        self.tick = 0
+        # bumped by every shoot and step, the occupancy is rebuilt when it changes
+        self._version = 0
+        self._occupancy = OccupancyGrid(hazards.height, hazards.width)
+        self._occupied = None
+        # (fire tick, mask or indices of the turrets that fired or None for all, tick its last bullet is gone)
+        self.volleys = deque()
+        self._range = hazards.lengths.max(axis=1) if len(hazards.lengths) else np.zeros(0, dtype=np.int32)
+
+    def shoot(self, turrets=None):
+        """
+        Fire a volley at the current tick.
+
+        Args:
+            turrets (np.ndarray): optional bool mask over hazards.turrets or
+                int indices into it of the turrets that fire, all of them
+                by default. Indices cost what the turrets that fire cost.
+        """
+        self._version += 1
+        reach = self._range if turrets is None else self._range[turrets]
+        if len(reach) and reach.max() > 0:
+            self.volleys.append((self.tick, turrets, self.tick + int(reach.max())))
+
+    def clear(self):
+        """Drop every volley and start over from tick 0."""
+        self.tick = 0
+        self._version += 1
+        self.volleys.clear()
+
+    def step(self, ticks=1):
+        """Move every bullet ticks cells along its ray."""
+        self.tick += ticks
+        self._version += 1
+        # volleys are in fire order, the ones behind an expired volley are dropped on later ticks
+        while self.volleys and self.volleys[0][2] <= self.tick:
+            self.volleys.popleft()
+
+    def bullet_at(self, x, y):
+        """True if a bullet is on cell (x, y) at the current tick."""
+        turret, tick = self.hazards.records(x, y)
+        if not len(tick):
+            return False
+        for fired, turrets, _ in self.volleys:
+            hit = tick == self.tick - fired
+            if turrets is not None:
+                hit &= _fired(turrets, turret)
+            if hit.any():
+                return True
+        return False
+
+    def occupancy(self):
+        """OccupancyGrid of the bullets at the current tick, rebuilt on the first call after a change."""
+        if self._occupied != self._version:
+            self._occupancy.update_cells(self._cells())
+            self._occupied = self._version
+        return self._occupancy
+
+    def _cells(self):
+        cells = [self.hazards.bullet_cells(self.tick - fired, turrets) for fired, turrets, _ in self.volleys]
+        if len(cells) == 1:
+            return cells[0]
+        return np.concatenate(cells) if cells else np.zeros(0, dtype=np.intp)
+
+    def positions(self):
+        """(n, 2) int array of the (x, y) cell of every bullet in flight."""
+        rows, cols = np.divmod(self._cells(), self.hazards.width)
+        return np.stack([cols, rows], axis=1)
+
+    def __len__(self):
+        count = 0
+        for fired, turrets, _ in self.volleys:
+            lengths = self.hazards.lengths if turrets is None else self.hazards.lengths[turrets]
+            count += int(np.count_nonzero(lengths > self.tick - fired))
+        return count
+
+
+class BulletPool:
+    """
+    Bullets as a struct of preallocated arrays, one slot per live bullet.
+
+    x, y, dx, dy and owner hold the cell, the move per tick and the index
+    of the turret that fired, alive whether the bullet survived the last
+    step, for the first len(pool) slots. step moves
+    every bullet, drops the ones that hit a wall or left the grid and
+    compacts the survivors to the front, each as one array operation.
+    Rules are the ones of turret_hazard.HazardMap, coordinates
+    follow the game, x is the column and y the row.
+    """
+
+    FIELDS = (("x", np.int32), ("y", np.int32), ("dx", np.int8), ("dy", np.int8),
+              ("owner", np.int32), ("alive", bool))
+
+    def __init__(self, grid, capacity=1024):
+        grid = np.asarray(grid)
+        self.height, self.width = grid.shape
+        # padded by one cell so a bullet that just left the grid still indexes it
+        mask = passability_mask(grid)
+        self.wall = (mask & BLOCKS_BULLET).astype(bool)
+        self.turrets = np.argwhere(grid == TURRET)
+
+        # the (turret, direction) pairs a volley fires, fixed by the layout
+        blocked = (mask & BLOCKS_PLAYER).astype(bool)
+        moves = np.array(MOVES)
+        fires = ~blocked[self.turrets[:, :1] + 1 + moves[:, 1], self.turrets[:, 1:] + 1 + moves[:, 0]]
+        self._owner, direction = np.nonzero(fires)
+        self._dx, self._dy = moves[direction, 0], moves[direction, 1]
+        self._x = self.turrets[self._owner, 1] + self._dx
+        self._y = self.turrets[self._owner, 0] + self._dy
+        # pairs are in turret order, those of turret t are _pairs[t]:_pairs[t + 1]
+        self._pairs = np.searchsorted(self._owner, np.arange(len(self.turrets) + 1))
+
+        self.count = 0
+        self._allocate(capacity)
+        # bumped by every spawn and step, the occupancy is rebuilt when it changes
+        self._version = 0
+        self._occupancy = OccupancyGrid(self.height, self.width)
+        self._occupied = None
+
+    def _allocate(self, capacity):
+        for name, dtype in self.FIELDS:
+            array = np.empty(capacity, dtype=dtype)
+            if self.count:
+                array[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, array)
+
+    def __len__(self):
+        return self.count
+
+    def spawn(self, x, y, dx, dy, owner):
+        """Append bullets from equal length arrays, the pool grows by doubling when full."""
+        self._version += 1
+        n = len(x)
+        if self.count + n > len(self.x):
+            self._allocate(max(2 * len(self.x), self.count + n))
+        end = self.count + n
+        self.x[self.count:end] = x
+        self.y[self.count:end] = y
+        self.dx[self.count:end] = dx
+        self.dy[self.count:end] = dy
+        self.owner[self.count:end] = owner
+        self.alive[self.count:end] = True
+        self.count = end
+
+    def shoot(self, turrets=None):
+        """
+        Fire a volley.
+
+        Args:
+            turrets (np.ndarray): optional bool mask over self.turrets or
+                int indices into it of the turrets that fire, all of them
+                by default. Indices cost what the turrets that fire cost.
+        """
+        if turrets is None:
+            self.spawn(self._x, self._y, self._dx, self._dy, self._owner)
+            return
+        if turrets.dtype == bool:
+            fire = turrets[self._owner]
+        else:
+            fire = concat_ranges(self._pairs[turrets], self._pairs[turrets + 1])
+        self.spawn(self._x[fire], self._y[fire], self._dx[fire], self._dy[fire], self._owner[fire])
+
+    def clear(self):
+        """Drop every bullet, the capacity is kept."""
+        self._version += 1
+        self.count = 0
+
+    def step(self):
+        """Move every bullet one cell and drop the ones that hit a wall."""
+        self._version += 1
+        n = self.count
+        x, y = self.x[:n], self.y[:n]
+        x += self.dx[:n]
+        y += self.dy[:n]
+        alive = self.alive[:n]
+        np.logical_not(self.wall[y + 1, x + 1], out=alive)
+        if alive.all():
+            return
+        keep = np.flatnonzero(alive)
+        self.count = len(keep)
+        for array in (self.x, self.y, self.dx, self.dy, self.owner):
+            array[:self.count] = array[keep]
+        # the survivors are the compacted slots, alive holds for exactly those
+        self.alive[:self.count] = True
+        self.alive[self.count:n] = False
+
+    def occupancy(self):
+        """OccupancyGrid of the bullets, rebuilt on the first call after a change."""
+        if self._occupied != self._version:
+            self._occupancy.update(self.x[:self.count], self.y[:self.count])
+            self._occupied = self._version
+        return self._occupancy
+
+    def bullet_at(self, x, y):
+        """True if a bullet is on cell (x, y), one lookup in the occupancy."""
+        return self.occupancy().hit(x, y)
+
+    def positions(self):
+        """(n, 2) int array of the (x, y) cell of every bullet."""
+        return np.stack([self.x[:self.count], self.y[:self.count]], axis=1)
@@ -0,0 +1,95 @@
+import numpy as np
+
+from loader import BLOCKING_CODES
+
+# (dx, dy) of a move, in the order the game's turrets fire in: down, up, right, left
+MOVES = ((0, 1), (0, -1), (1, 0), (-1, 0))
+NO_MOVE = -1
+
+
+def build_distance_field(passable, goal):
+    """
+    Breadth-first search outwards from the goal over a boolean grid.
+
+    The grid is padded with a blocked border and searched on flat indices,
+    so the inner loop has no bounds checks.
+
+    Args:
+        passable (np.ndarray): 2D bool array, False where a player can't go.
+        goal (tuple): (row, col) of the goal cell.
+
+    Returns:
+        tuple: (distance, step) arrays with the shape of passable.
+            distance is the int32 number of moves to the goal, -1 where it
+            can't be reached. step is the int8 index into MOVES of the best
+            next move towards the goal, NO_MOVE at the goal and where it
+            can't be reached.
+    """
+    passable = np.asarray(passable, dtype=bool)
+    height, width = passable.shape
+    distance = np.full((height, width), -1, dtype=np.int32)
+    step = np.full((height, width), NO_MOVE, dtype=np.int8)
+
+    row, col = goal
+    if not (0 <= row < height and 0 <= col < width and passable[row, col]):
+        return distance, step
+
+    pitch = width + 2
+    open_cells = bytearray(np.pad(passable, 1).astype(np.uint8).tobytes())
+    dist = [-1] * len(open_cells)
+    moves = bytearray(b"\xff") * len(open_cells)
+    # neighbour offset, and the move that takes the neighbour back to the current cell
+    neighbours = ((pitch, 1), (-pitch, 0), (1, 3), (-1, 2))
+
+    start = (row + 1) * pitch + col + 1
+    dist[start] = 0
+    queue = [start]
+    for cell in queue:
+        d = dist[cell] + 1
+        for offset, move in neighbours:
+            nxt = cell + offset
+            if open_cells[nxt] and dist[nxt] < 0:
+                dist[nxt] = d
+                moves[nxt] = move
+                queue.append(nxt)
+
+    distance[:] = np.array(dist, dtype=np.int32).reshape(height + 2, pitch)[1:-1, 1:-1]
+    step[:] = np.frombuffer(moves, dtype=np.int8).reshape(height + 2, pitch)[1:-1, 1:-1]
+    return distance, step
+
+
+class DistanceField:
+    """
+    Distance to a goal cell and the best next move from every cell of a layout.
+
+    Built once, after that every query is an array lookup. Coordinates
+    follow the game, x is the column and y the row, the goal included;
+    the distance and step arrays are indexed [y, x].
+    """
+
+    def __init__(self, grid, goal):
+        """
+        Args:
+            grid: 2D grid of cell codes.
+            goal (tuple): (x, y) of the goal cell.
+        """
+        self.goal = goal
+        x, y = goal
+        self.distance, self.step = build_distance_field(~np.isin(np.asarray(grid), BLOCKING_CODES), (y, x))
+
+    def _inside(self, x, y):
+        height, width = self.distance.shape
+        return 0 <= x < width and 0 <= y < height
+
+    def distance_from(self, x, y):
+        """Moves from (x, y) to the goal, -1 if it can't be reached."""
+        if not self._inside(x, y):
+            return -1
+        return int(self.distance[y, x])
+
+    def next_move(self, x, y):
+        """(dx, dy) of the best move from (x, y) towards the goal, None at the goal or if unreachable."""
+        if not self._inside(x, y):
+            return None
+        move = self.step[y, x]
+        return None if move == NO_MOVE else MOVES[move]
@@ -1,64 +1,158 @@
-import random
+import itertools
+
 import numpy as np
 from PIL import Image
 
+from maze_format import PALETTE_BINARY, is_maze_file, load_text_maze, open_maze, to_game_codes, write_maze
+from maze_verify import verify_maze
+
 def load_binary_maze(file_path):
     """
-    Load a binary maze from a text file into a NumPy array.
+    Load a binary maze from a binary maze file or a text file.
+
+    Binary maze files (see maze_format) are memory-mapped, so even very
+    large mazes open instantly and are paged in as they are read. Text
+    files are parsed, one line is read as a square maze of any size.
 
     Args:
-        file_path (str): Path to the text file containing the binary maze.
+        file_path (str): Path to the binary maze file or text file.
 
     Returns:
         np.ndarray: 2D binary array representing the maze.
     """
-    # Load the text file into a NumPy array
-    binary_maze = np.loadtxt(file_path, dtype=int).reshape((25, 25))
-    return binary_maze
+    if is_maze_file(file_path):
+        binary_maze, _ = open_maze(file_path)
+        return binary_maze
+    return load_text_maze(file_path)
+
+
+# every ordering of the 4 lattice directions, a node picks one up front
+DIRECTION_ORDERS = tuple(itertools.permutations(range(4)))
+# Directions: Right, Down, Left, Up as (row, col) steps between lattice nodes
+LATTICE_STEPS = np.array([(0, 1), (1, 0), (0, -1), (-1, 0)])
+
+
+def carve_lattice(rows, cols, seed=None):
+    """
+    Randomized depth-first search over a rows x cols lattice of nodes.
+
+    The lattice is padded with a ring of already visited nodes so no bounds
+    checks are needed, every node draws its direction order once from the
+    seeded generator and keeps a cursor into it, so each step of the search
+    does constant work. The stack is preallocated to the node count.
 
+    Args:
+        rows (int): lattice height.
+        cols (int): lattice width.
+        seed (int): seed for np.random.default_rng, equal seeds give equal mazes.
+
+    Returns:
+        np.ndarray: (rows, cols) uint8 array, the direction index into
+            LATTICE_STEPS each node was entered from, 255 for the root (0, 0).
+    """
+    width = cols + 2
+    n = (rows + 2) * width
+    offsets = [1, width, -1, -width]
+
+    visited = bytearray(n)
+    visited[:width] = b"\1" * width
+    visited[-width:] = b"\1" * width
+    visited[::width] = b"\1" * (rows + 2)
+    visited[width - 1::width] = b"\1" * (rows + 2)
+
+    rng = np.random.default_rng(seed)
+    order = rng.integers(0, len(DIRECTION_ORDERS), n, dtype=np.uint8).tolist()
+    cursor = bytearray(n)
+    entered = bytearray(b"\xff") * n
+    stack = [0] * (rows * cols)
+
+    root = width + 1
+    visited[root] = 1
+    stack[0] = root
+    top = 0
+    while top >= 0:
+        node = stack[top]
+        directions = DIRECTION_ORDERS[order[node]]
+        k = cursor[node]
+        while k < 4:
+            d = directions[k]
+            k += 1
+            nxt = node + offsets[d]
+            if not visited[nxt]:
+                visited[nxt] = 1
+                entered[nxt] = d
+                cursor[node] = k
+                top += 1
+                stack[top] = nxt
+                break
+        else:
+            top -= 1  # Backtrack
+
+    return np.frombuffer(entered, dtype=np.uint8).reshape(rows + 2, width)[1:-1, 1:-1].copy()
+
+
+def generate_solvable_binary_maze(size, seed=None):
+    """
+    Generate a size x size perfect maze, 1 is a path and 0 is a wall.
+
+    Paths run between the even coordinates, (0, 0) is the start and
+    (size - 1, size - 1) the end, every path cell is reachable from the start.
+
+    Args:
+        size (int): side length of the maze.
+        seed (int): seed for the generator, equal seeds give equal mazes.
 
-def generate_solvable_binary_maze(size):
+    Returns:
+        np.ndarray: (size, size) uint8 maze.
+    """
     # Initialize grid with walls (0s)
     maze = np.zeros((size, size), dtype=np.uint8)
+    rows = cols = (size + 1) // 2
+    entered = carve_lattice(rows, cols, seed)
 
-    # Start and end points
-    start = (0, 0)
-    end = (size - 1, size - 1)
+    # Every lattice node is a path, plus the cell between a node and the one it was entered from
+    maze[::2, ::2] = 1
+    for d, (dy, dx) in enumerate(LATTICE_STEPS):
+        r, c = np.nonzero(entered == d)
+        maze[2 * r - dy, 2 * c - dx] = 1
 
-    # Create a stack for iterative DFS
-    stack = [start]
-    maze[start] = 1  # Mark the starting point as path (1)
+    # Ensure start and end are connected when the end is off the lattice
+    if size % 2 == 0:
+        maze[size - 2, size - 1] = 1
+        maze[size - 1, size - 1] = 1
 
-    # Directions: Right, Down, Left, Up
-    directions = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+    return maze
 
-    while stack:
-        x, y = stack[-1]
-        random.shuffle(directions)  # Randomize direction order
-        carved = False
 
-        for dx, dy in directions:
-            nx, ny = x + dx, y + dy
-            # Check bounds and ensure the cell is not already visited
-            if 0 <= nx < size and 0 <= ny < size and maze[nx, ny] == 0:
-                # Ensure we're not creating isolated walls
-                if np.sum(maze[max(nx - 1, 0):nx + 2, max(ny - 1, 0):ny + 2]) <= 2:
-                    maze[nx, ny] = 1  # Mark as path
-                    stack.append((nx, ny))
-                    carved = True
-                    break
+def generate_game_layout(size, seed=None, turret_every=6):
+    """
+    Generate a playable size x size layout in game cell codes.
 
-        if not carved:
-            stack.pop()  # Backtrack
+    The maze of generate_solvable_binary_maze with the spawn on its start,
+    the goal on its end and every turret_every-th wall, in row-major order,
+    turned into a turret.
 
-    # Ensure start and end are connected
-    maze[start] = 1
-    maze[end] = 1
+    Args:
+        size (int): side length of the layout.
+        seed (int): seed for the generator, equal seeds give equal layouts.
+        turret_every (int): one turret per that many walls.
 
-    return maze
+    Returns:
+        np.ndarray: (size, size) int8 grid of loader.PALETTE cell codes.
+
+    Raises:
+        RuntimeError: if the layout is not solvable, see maze_verify.verify_maze.
+    """
+    grid = to_game_codes(generate_solvable_binary_maze(size, seed=seed), PALETTE_BINARY)
+    walls = np.argwhere(grid == 1)
+    grid[tuple(walls[::turret_every].T)] = 2
+    grid[0, 0] = -2
+    grid[-1, -1] = -1
+    verify_maze(grid)
+    return grid
 
 
-def binary_maze_to_image(binary_maze, path_color, wall_color, output_path):
+def binary_maze_to_image(binary_maze, path_color, wall_color, output_path, mode="RGBA"):
     """
     Convert a binary maze (1s and 0s) into a PNG image with specified colors.
 
@@ -67,10 +161,22 @@ def binary_maze_to_image(binary_maze, path_color, wall_color, output_path):
         path_color (tuple): RGBA color for paths (1s).
         wall_color (tuple): RGBA color for walls (0s).
         output_path (str): Path to save the resulting PNG file.
+        mode (str): "RGBA" for a 32-bit PNG, "P" for a 1-bit palette PNG with
+            the two colors as its palette. With loader.PATH_COLOR and
+            loader.WALL_COLOR either one reads back through get_maze.
 
     Returns:
         None
     """
+    if mode == "P":
+        # palette index 0 is the path, 1 the wall
+        img = Image.fromarray((binary_maze != 1).astype(np.uint8), mode="P")
+        palette = np.array([path_color, wall_color], dtype=np.uint8)
+        img.putpalette(palette[:, :3].tobytes())
+        img.save(output_path, bits=1, transparency=palette[:, 3].tobytes())
+        print(f"Maze saved as PNG at: {output_path}")
+        return
+
     # Get the dimensions of the maze
     height, width = binary_maze.shape
 
@@ -88,48 +194,63 @@ def binary_maze_to_image(binary_maze, path_color, wall_color, output_path):
     img.save(output_path)
     print(f"Maze saved as PNG at: {output_path}")
 
-# Generate a 500x500 solvable binary maze
-maze_size = 50
-# binary_maze = generate_solvable_binary_maze(maze_size)
-# binary_maze = load_binary_maze('maze_hard_v2.txt')
-binary_maze = np.array([
-    [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
-    [1, 0, 0, 0, 1, 0, 1, 1, 0, 1, 1, 1, 1, 1, 0, 1, 0, 1, 1, 1, 1, 0, 1, 0, 1],
-    [1, 1, 1, 0, 1, 0, 1, 0, 0, 0, 1, 1, 1, 0, 0, 1, 0, 1, 0, 1, 1, 0, 1, 0, 1],
-    [1, 0, 1, 0, 1, 0, 0, 1, 1, 0, 1, 0, 0, 1, 1, 0, 1, 0, 1, 0, 0, 0, 1, 1, 1],
-    [1, 0, 1, 0, 1, 0, 0, 1, 1, 0, 1, 1, 0, 0, 1, 1, 0, 1, 1, 0, 1, 1, 0, 1, 1],
-    [1, 0, 1, 0, 1, 0, 0, 1, 1, 0, 1, 1, 1, 0, 1, 0, 1, 1, 1, 0, 0, 1, 1, 1, 1],
-    [1, 0, 1, 0, 1, 0, 0, 1, 1, 0, 1, 0, 1, 0, 1, 0, 1, 0, 1, 0, 1, 1, 0, 1, 1],
-    [1, 0, 1, 0, 1, 0, 0, 1, 1, 0, 1, 0, 1, 0, 1, 1, 1, 1, 0, 1, 0, 1, 0, 1, 1],
-    [1, 0, 1, 0, 1, 1, 1, 1, 1, 0, 0, 1, 0, 1, 0, 1, 1, 1, 1, 0, 1, 1, 1, 0, 1],
-    [1, 0, 1, 1, 0, 1, 1, 1, 0, 0, 0, 1, 1, 0, 1, 1, 0, 0, 1, 0, 1, 1, 0, 0, 1],
-    [1, 0, 0, 1, 1, 0, 0, 1, 1, 1, 1, 0, 0, 1, 1, 0, 1, 0, 1, 0, 1, 0, 0, 1, 1],
-    [1, 1, 1, 0, 1, 1, 0, 1, 1, 0, 1, 1, 1, 0, 1, 1, 1, 0, 1, 1, 1, 0, 1, 0, 1],
-    [1, 0, 0, 1, 1, 1, 1, 0, 0, 1, 0, 1, 1, 1, 0, 0, 0, 1, 1, 1, 1, 1, 1, 0, 1],
-    [1, 0, 1, 1, 1, 0, 1, 1, 1, 0, 1, 1, 1, 1, 1, 0, 1, 1, 1, 0, 0, 0, 1, 0, 1],
-    [1, 1, 1, 1, 0, 0, 1, 0, 1, 1, 1, 0, 1, 0, 1, 1, 0, 1, 0, 1, 0, 0, 1, 1, 0],
-    [1, 1, 0, 0, 1, 1, 1, 0, 0, 1, 1, 1, 0, 1, 0, 0, 1, 1, 1, 1, 1, 0, 1, 1, 1],
-    [1, 1, 1, 0, 1, 0, 1, 1, 1, 1, 1, 1, 0, 1, 0, 1, 0, 1, 1, 1, 0, 1, 1, 0, 1],
-    [1, 1, 0, 0, 1, 1, 0, 1, 0, 1, 0, 0, 1, 0, 0, 1, 1, 1, 1, 0, 1, 1, 1, 0, 1],
-    [1, 0, 1, 1, 0, 0, 1, 1, 1, 1, 0, 0, 1, 0, 1, 0, 1, 0, 1, 1, 1, 1, 1, 0, 1],
-    [1, 1, 0, 0, 1, 0, 1, 1, 0, 0, 1, 1, 1, 1, 0, 1, 0, 1, 0, 0, 0, 1, 1, 0, 1],
-    [1, 1, 1, 1, 1, 1, 1, 1, 0, 1, 0, 1, 1, 0, 0, 1, 1, 0, 0, 1, 0, 0, 1, 1, 0],
-    [1, 0, 0, 0, 1, 1, 1, 1, 1, 1, 0, 1, 1, 0, 1, 1, 1, 0, 0, 0, 1, 0, 1, 1, 1],
-    [1, 1, 1, 0, 1, 1, 0, 1, 1, 1, 1, 0, 1, 1, 1, 1, 0, 1, 0, 1, 1, 0, 0, 1, 1],
-    [1, 1, 1, 0, 0, 1, 1, 1, 1, 1, 1, 0, 1, 1, 0, 1, 1, 0, 1, 1, 1, 1, 0, 0, 1],
-    [1, 0, 1, 1, 0, 0, 0, 1, 1, 1, 0, 1, 0, 1, 1, 1, 1, 1, 0, 0, 1, 0, 1, 1, 1],
-    [1, 1, 1, 1, 1, 0, 0, 1, 1, 1, 1, 0, 0, 1, 1, 0, 1, 1, 0, 1, 1, 1, 1, 0, 0],
-    [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 1, 0, 0, 1, 1, 1, 0, 0, 1]
-])
-print(binary_maze.shape)
-
-# Define colors
-gray_color = (70, 70, 70, 255)  # RGBA for paths (1s)
-black_color = (0, 0, 0, 255)    # RGBA for walls (0s)
-
-# Output file path
-output_file_path = "maze_image.png"
-
-# Convert the binary maze to an image and save it
-binary_maze_to_image(binary_maze, gray_color, black_color, output_file_path)
 
+def binary_maze_to_file(binary_maze, output_path):
+    """
+    Save a binary maze (1s and 0s) as a binary maze file.
+
+    Args:
+        binary_maze (np.ndarray): 2D array where 1 represents paths and 0 represents walls.
+        output_path (str): Path to save the maze file, read it back with load_binary_maze.
+
+    Returns:
+        None
+    """
+    write_maze(output_path, np.asarray(binary_maze, dtype=np.uint8), PALETTE_BINARY)
+
+
+if __name__ == "__main__":
+    # Generate a 500x500 solvable binary maze
+    maze_size = 50
+    # binary_maze = generate_solvable_binary_maze(maze_size)
+    # binary_maze = load_binary_maze('maze_hard_v2.txt')
+    binary_maze = np.array([
+        [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
+        [1, 0, 0, 0, 1, 0, 1, 1, 0, 1, 1, 1, 1, 1, 0, 1, 0, 1, 1, 1, 1, 0, 1, 0, 1],
+        [1, 1, 1, 0, 1, 0, 1, 0, 0, 0, 1, 1, 1, 0, 0, 1, 0, 1, 0, 1, 1, 0, 1, 0, 1],
+        [1, 0, 1, 0, 1, 0, 0, 1, 1, 0, 1, 0, 0, 1, 1, 0, 1, 0, 1, 0, 0, 0, 1, 1, 1],
+        [1, 0, 1, 0, 1, 0, 0, 1, 1, 0, 1, 1, 0, 0, 1, 1, 0, 1, 1, 0, 1, 1, 0, 1, 1],
+        [1, 0, 1, 0, 1, 0, 0, 1, 1, 0, 1, 1, 1, 0, 1, 0, 1, 1, 1, 0, 0, 1, 1, 1, 1],
+        [1, 0, 1, 0, 1, 0, 0, 1, 1, 0, 1, 0, 1, 0, 1, 0, 1, 0, 1, 0, 1, 1, 0, 1, 1],
+        [1, 0, 1, 0, 1, 0, 0, 1, 1, 0, 1, 0, 1, 0, 1, 1, 1, 1, 0, 1, 0, 1, 0, 1, 1],
+        [1, 0, 1, 0, 1, 1, 1, 1, 1, 0, 0, 1, 0, 1, 0, 1, 1, 1, 1, 0, 1, 1, 1, 0, 1],
+        [1, 0, 1, 1, 0, 1, 1, 1, 0, 0, 0, 1, 1, 0, 1, 1, 0, 0, 1, 0, 1, 1, 0, 0, 1],
+        [1, 0, 0, 1, 1, 0, 0, 1, 1, 1, 1, 0, 0, 1, 1, 0, 1, 0, 1, 0, 1, 0, 0, 1, 1],
+        [1, 1, 1, 0, 1, 1, 0, 1, 1, 0, 1, 1, 1, 0, 1, 1, 1, 0, 1, 1, 1, 0, 1, 0, 1],
+        [1, 0, 0, 1, 1, 1, 1, 0, 0, 1, 0, 1, 1, 1, 0, 0, 0, 1, 1, 1, 1, 1, 1, 0, 1],
+        [1, 0, 1, 1, 1, 0, 1, 1, 1, 0, 1, 1, 1, 1, 1, 0, 1, 1, 1, 0, 0, 0, 1, 0, 1],
+        [1, 1, 1, 1, 0, 0, 1, 0, 1, 1, 1, 0, 1, 0, 1, 1, 0, 1, 0, 1, 0, 0, 1, 1, 0],
+        [1, 1, 0, 0, 1, 1, 1, 0, 0, 1, 1, 1, 0, 1, 0, 0, 1, 1, 1, 1, 1, 0, 1, 1, 1],
+        [1, 1, 1, 0, 1, 0, 1, 1, 1, 1, 1, 1, 0, 1, 0, 1, 0, 1, 1, 1, 0, 1, 1, 0, 1],
+        [1, 1, 0, 0, 1, 1, 0, 1, 0, 1, 0, 0, 1, 0, 0, 1, 1, 1, 1, 0, 1, 1, 1, 0, 1],
+        [1, 0, 1, 1, 0, 0, 1, 1, 1, 1, 0, 0, 1, 0, 1, 0, 1, 0, 1, 1, 1, 1, 1, 0, 1],
+        [1, 1, 0, 0, 1, 0, 1, 1, 0, 0, 1, 1, 1, 1, 0, 1, 0, 1, 0, 0, 0, 1, 1, 0, 1],
+        [1, 1, 1, 1, 1, 1, 1, 1, 0, 1, 0, 1, 1, 0, 0, 1, 1, 0, 0, 1, 0, 0, 1, 1, 0],
+        [1, 0, 0, 0, 1, 1, 1, 1, 1, 1, 0, 1, 1, 0, 1, 1, 1, 0, 0, 0, 1, 0, 1, 1, 1],
+        [1, 1, 1, 0, 1, 1, 0, 1, 1, 1, 1, 0, 1, 1, 1, 1, 0, 1, 0, 1, 1, 0, 0, 1, 1],
+        [1, 1, 1, 0, 0, 1, 1, 1, 1, 1, 1, 0, 1, 1, 0, 1, 1, 0, 1, 1, 1, 1, 0, 0, 1],
+        [1, 0, 1, 1, 0, 0, 0, 1, 1, 1, 0, 1, 0, 1, 1, 1, 1, 1, 0, 0, 1, 0, 1, 1, 1],
+        [1, 1, 1, 1, 1, 0, 0, 1, 1, 1, 1, 0, 0, 1, 1, 0, 1, 1, 0, 1, 1, 1, 1, 0, 0],
+        [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 1, 0, 0, 1, 1, 1, 0, 0, 1]
+    ])
+    print(binary_maze.shape)
+
+    # Define colors
+    gray_color = (70, 70, 70, 255)  # RGBA for paths (1s)
+    black_color = (0, 0, 0, 255)    # RGBA for walls (0s)
+
+    # Output file path
+    output_file_path = "maze_image.png"
+
+    # Convert the binary maze to an image and save it
+    binary_maze_to_image(binary_maze, gray_color, black_color, output_file_path)
@@ -0,0 +1,211 @@
+import functools
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+from loader import BLOCKING_CODES, BLOCKS_BULLET, BLOCKS_PLAYER, get_maze_array, passability_mask
+
+CACHE_DIR = os.environ.get("MAZE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".maze_cache"))
+CACHE_SIZE = 32
+
+MAGIC = b"MZC1"
+# bump when the file layout or what compile_layout stores changes
+FORMAT_VERSION = 2
+HEADER = np.dtype([("magic", "S4"), ("version", "<u4"), ("height", "<u4"), ("width", "<u4"),
+                   ("n_entities", "<u4")])
+
+# cell codes that are kept in the entity table
+ENTITY_CODES = (2, -1, -2, 6, 4, 5)
+
+# everything a compiled file depends on besides the image, part of every
+# key so entries compiled under other codes or flags are never opened
+SCHEMA = f"v{FORMAT_VERSION}:{ENTITY_CODES}:{BLOCKING_CODES}:{BLOCKS_PLAYER}:{BLOCKS_BULLET}"
+
+
+class CompiledLayout:
+    """
+    A decoded layout backed by a read-only memory map.
+
+    Attributes:
+        key (str): content hash of the source PNG plus the transform.
+        grid (np.ndarray): (h, w) int8 cell codes.
+        blocked (np.ndarray): (h + 2, w + 2) uint8 blocking flags, the
+            loader.passability_mask of grid.
+        entities (np.ndarray): (n, 3) int32 rows of (code, row, col) in
+            row-major order.
+    """
+
+    def __init__(self, key, grid, blocked, entities):
+        self.key = key
+        self.grid = grid
+        self.blocked = blocked
+        self.entities = entities
+
+    @classmethod
+    def of(cls, layout):
+        """Return layout if it is already compiled, else compile its grid of cell codes without caching it."""
+        if isinstance(layout, cls):
+            return layout
+        grid = np.asarray(layout)
+        return cls(None, grid, *compile_layout(grid))
+
+    @property
+    def passable(self):
+        """(h, w) bool, False on walls and turrets."""
+        return (self.blocked[1:-1, 1:-1] & BLOCKS_PLAYER) == 0
+
+    def positions(self, code):
+        """Return the (row, col) positions of every cell with the given code."""
+        return self.entities[self.entities[:, 0] == code, 1:]
+
+    @property
+    def turrets(self):
+        return self.positions(2)
+
+    @property
+    def checkpoints(self):
+        return self.positions(6)
+
+    @property
+    def spawns(self):
+        return self.positions(-2)
+
+    @property
+    def end_points(self):
+        return self.positions(-1)
+
+    @property
+    def gates(self):
+        return self.entities[np.isin(self.entities[:, 0], (4, 5))]
+
+
+def layout_key(path, reflect=False):
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    schema = hashlib.sha256(SCHEMA.encode()).hexdigest()[:8]
+    return f"{digest}-{'reflect' if reflect else 'identity'}-{schema}"
+
+
+def compile_layout(grid):
+    """Build the (blocked, entities) tables for a grid of cell codes."""
+    grid = np.asarray(grid, dtype=np.int8)
+    blocked = passability_mask(grid)
+    cells = np.argwhere(np.isin(grid, ENTITY_CODES))
+    entities = np.empty((len(cells), 3), dtype=np.int32)
+    entities[:, 0] = grid[cells[:, 0], cells[:, 1]]
+    entities[:, 1:] = cells
+    return blocked, entities
+
+
+def _offsets(height, width):
+    grid_at = HEADER.itemsize
+    blocked_at = grid_at + height * width
+    entities_at = -(-(blocked_at + (height + 2) * (width + 2)) // 4) * 4
+    return grid_at, blocked_at, entities_at
+
+
+def write_compiled(path, grid):
+    grid = np.ascontiguousarray(grid, dtype=np.int8)
+    blocked, entities = compile_layout(grid)
+    height, width = grid.shape
+    grid_at, blocked_at, entities_at = _offsets(height, width)
+
+    header = np.array([(MAGIC, FORMAT_VERSION, height, width, len(entities))], dtype=HEADER)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(header.tobytes())
+        f.write(grid.tobytes())
+        f.write(blocked.tobytes())
+        f.write(b"\0" * (entities_at - blocked_at - blocked.size))
+        f.write(entities.astype("<i4").tobytes())
+    # rename last so a concurrent reader never sees a half written file
+    os.replace(tmp, path)
+
+
+def read_compiled(path, key=None):
+    raw = np.memmap(path, dtype=np.uint8, mode="r")
+    header = raw[:HEADER.itemsize].view(HEADER)[0]
+    if header["magic"] != MAGIC:
+        raise RuntimeError(f"not a compiled layout: {path}")
+    if header["version"] != FORMAT_VERSION:
+        raise RuntimeError(f"compiled layout {path} has format version {header['version']}, "
+                           f"expected {FORMAT_VERSION}")
+
+    height, width, n = int(header["height"]), int(header["width"]), int(header["n_entities"])
+    grid_at, blocked_at, entities_at = _offsets(height, width)
+    grid = raw[grid_at:blocked_at].view(np.int8).reshape(height, width)
+    blocked = raw[blocked_at:blocked_at + (height + 2) * (width + 2)].reshape(height + 2, width + 2)
+    entities = raw[entities_at:entities_at + n * 12].view("<i4").reshape(n, 3)
+    return CompiledLayout(key, grid, blocked, entities)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _load_compiled(key, path, reflect):
+    cached = os.path.join(CACHE_DIR, key + ".mzc")
+    if not os.path.exists(cached):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        write_compiled(cached, get_maze_array(path, reflect))
+    return read_compiled(cached, key)
+
+
+def load_layout(path, reflect=False):
+    """
+    Return the CompiledLayout for a layout image.
+
+    Layouts are keyed by a hash of the PNG bytes plus the transform and
+    SCHEMA, so an edited image or a change to the stored tables gets a new
+    entry. A warm disk cache costs one mmap and an
+    in-process LRU skips even that.
+    """
+    return _load_compiled(layout_key(path, reflect), path, reflect)
+
+
+def get_cached_maze(path, reflect=False):
+    """Drop-in for loader.get_maze that goes through the layout cache."""
+    return load_layout(path, reflect).grid
+
+
+def clear_cache():
+    _load_compiled.cache_clear()
+
+
+class LayoutEntry:
+    """A layout image that is only decoded the first time it is used."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self, reflect=False):
+        return get_cached_maze(self.path, reflect)
+
+    def compiled(self, reflect=False):
+        """The CompiledLayout, for Maze and Simulation to reuse its tables instead of compiling the grid."""
+        return load_layout(self.path, reflect)
+
+    @property
+    def grid(self):
+        return self.load()
+
+    def __repr__(self):
+        return f"LayoutEntry({self.path!r})"
+
+
+class LayoutRegistry:
+    """
+    Ordered list of layout images. Building it does no I/O, entries are
+    resolved through the layout cache when a game asks for them.
+    """
+
+    def __init__(self, paths):
+        self.entries = [LayoutEntry(path) for path in paths]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, index):
+        return self.entries[index]
+
+    def __iter__(self):
+        return iter(self.entries)
@@ -12,7 +12,155 @@ TURRET_COLOR = (111, 49, 152, 255) # 2
 PATH_COLOR = (0, 0, 0, 0) # 0
 CHECK_POINT_COLOR = (34, 177, 76, 255) # 3
 
-def get_maze(path, reflect=False):
+# cell codes a player can't step on: walls and turrets
+BLOCKING_CODES = (1, 2)
+# flags of passability_mask: players are stopped by walls and turrets, bullets only by walls
+BLOCKS_PLAYER = 1
+BLOCKS_BULLET = 2
+
+# color -> cell code, same mapping as the per-pixel loop below
+PALETTE = {
+    PATH_COLOR: 0,
+    WALL_COLOR: 1,
+    TURRET_COLOR: 2,
+    CHECK_POINT_COLOR: 6,
+    P1_GATE: 4,
+    P2_GATE: 5,
+    P1_SPAWN: -1,
+    P2_SPAWN: -2,
+}
+
+
+def _pack_rgba(rgba):
+    # view each RGBA quadruple as one uint32 so a color compares as a scalar
+    return np.ascontiguousarray(rgba, dtype=np.uint8).view(np.uint32)[..., 0]
+
+
+_PALETTE_KEYS = _pack_rgba(np.array(list(PALETTE), dtype=np.uint8)[:, None, :])[:, 0]
+_SORT = np.argsort(_PALETTE_KEYS)
+_PALETTE_KEYS = _PALETTE_KEYS[_SORT]
+_PALETTE_CODES = np.array(list(PALETTE.values()), dtype=np.int8)[_SORT]
+
+
+def decode_maze(rgba):
+    """
+    Map an (h, w, 4) RGBA array to a grid of cell codes.
+
+    Args:
+        rgba (np.ndarray): uint8 image array, as returned by np.asarray(image).
+
+    Returns:
+        np.ndarray: (h, w) int8 grid of cell codes.
+
+    Raises:
+        RuntimeError: if any pixel is not in PALETTE. The message lists the
+            (x, y) coordinate and color of every offending pixel.
+    """
+    packed = _pack_rgba(rgba)
+    idx = np.searchsorted(_PALETTE_KEYS, packed)
+    idx[idx == len(_PALETTE_KEYS)] = 0
+    known = _PALETTE_KEYS[idx] == packed
+
+    if not known.all():
+        bad = np.argwhere(~known)
+        details = ", ".join(f"({x}, {y}): {tuple(int(c) for c in rgba[y, x])}" for y, x in bad)
+        raise RuntimeError(f"PIXEL_COLOR: {len(bad)} unknown pixel(s) at {details}")
+
+    return _PALETTE_CODES[idx]
+
+
+# cell code + 2 -> RGBA, the inverse of PALETTE
+CODE_COLORS = np.zeros((9, 4), dtype=np.uint8)
+for _color, _code in PALETTE.items():
+    CODE_COLORS[_code + 2] = _color
+
+
+def encode_maze(grid):
+    """Map a grid of cell codes back to an (h, w, 4) uint8 RGBA array."""
+    return CODE_COLORS[np.asarray(grid, dtype=np.intp) + 2]
+
+
+def maze_to_image(grid):
+    """
+    Build an indexed ('P' mode) image of a grid of cell codes.
+
+    Only the codes that occur get a palette entry, in PALETTE colors, so a
+    two code maze needs a 1-bit palette.
+
+    Returns:
+        tuple: (PIL.Image, bits) where bits is the smallest PNG bit depth
+            that holds the palette.
+    """
+    slots = np.asarray(grid, dtype=np.intp) + 2
+    used = np.flatnonzero(np.bincount(slots.ravel(), minlength=len(CODE_COLORS)))
+    remap = np.zeros(len(CODE_COLORS), dtype=np.uint8)
+    remap[used] = np.arange(len(used))
+
+    image = Image.fromarray(remap[slots], mode="P")
+    image.putpalette(CODE_COLORS[used, :3].tobytes())
+    image.info["transparency"] = CODE_COLORS[used, 3].tobytes()
+    bits = next(b for b in (1, 2, 4, 8) if len(used) <= 1 << b)
+    return image, bits
+
+
+def save_maze_image(grid, path):
+    """Save a grid of cell codes as an indexed PNG that get_maze reads back."""
+    image, bits = maze_to_image(grid)
+    image.save(path, bits=bits, transparency=image.info["transparency"])
+
+
+def passability_mask(grid):
+    """
+    Blocking flags of every cell, padded with a one cell border of walls.
+
+    Cell (x, y) of the grid is mask[y + 1, x + 1], so a lookup one step
+    off the grid hits the border instead of wrapping around or raising.
+    A stack of grids, shape (..., h, w), pads every grid of the stack.
+
+    Returns:
+        np.ndarray: (..., h + 2, w + 2) uint8 array of BLOCKS_PLAYER and
+            BLOCKS_BULLET flags.
+    """
+    grid = np.asarray(grid)
+    shape = grid.shape[:-2] + (grid.shape[-2] + 2, grid.shape[-1] + 2)
+    mask = np.full(shape, BLOCKS_PLAYER | BLOCKS_BULLET, dtype=np.uint8)
+    mask[..., 1:-1, 1:-1] = np.where(grid == 1, BLOCKS_PLAYER | BLOCKS_BULLET, np.where(grid == 2, BLOCKS_PLAYER, 0))
+    return mask
+
+
+def get_maze_array(path, reflect=False, verify=False):
+    """
+    Load a maze layout image into an int8 grid of cell codes.
+
+    The whole image is converted to RGBA in one call and decoded with a
+    single palette lookup, see decode_maze. Any image mode is converted,
+    so the indexed PNGs of save_maze_image load too, and an RGB image
+    decodes where its opaque pixels are PALETTE colors; the transparent
+    path color never matches one. With verify=True a layout whose spawn
+    can't reach the goal raises RuntimeError, see maze_verify.
+    """
+    with Image.open(path) as image:
+        rgba = np.asarray(image.convert("RGBA"))
+
+    grid = decode_maze(rgba)
+    if verify:
+        from maze_verify import verify_maze
+        verify_maze(grid)
+    if reflect:
+        return np.ascontiguousarray(np.fliplr(np.rot90(grid)))
+    return grid
+
+
+def get_maze(path, reflect=False, verify=False):
+    grid = get_maze_array(path, reflect, verify)
+    if reflect:
+        # the default int array of the per-pixel decoder, callers do arithmetic on it
+        return grid.astype(int)
+    return grid.tolist()
+
+
+def get_maze_pixelwise(path, reflect=False):
+    # reference decoder, one getpixel call per cell; kept for benchmark.py
     image = Image.open(path)
 
     width, height = image.size
@@ -21,8 +169,8 @@ def get_maze(path, reflect=False):
     for y in range(height):
         for x in range(width):
             pixel = image.getpixel((x, y))
-            
-            if pixel == PATH_COLOR: 
+
+            if pixel == PATH_COLOR:
                 res[y][x] = 0
             elif pixel == WALL_COLOR:
                 res[y][x] = 1
@@ -39,9 +187,9 @@ def get_maze(path, reflect=False):
             elif pixel == P2_SPAWN:
                 res[y][x] = -2
             else:
-                raise RuntimeError("PIXEL_COLOR: {pixel}")
+                raise RuntimeError(f"PIXEL_COLOR: {pixel}")
     image.close()
 
-    if reflect: 
+    if reflect:
         return np.fliplr(np.rot90(np.array(res)))
     return res
@@ -1,16 +1,24 @@
 import pygame
 import sys
-from loader import get_maze
+from layout_cache import CompiledLayout, LayoutRegistry
+from distance_field import NO_MOVE, DistanceField
+from turret_hazard import HazardMap
+from replay import SessionRecorder
+from simulation import Simulation, volley_fire
+from tick_scheduler import TICK_RATE, FixedTimestep, TickScheduler
 import numpy as np
 import multiprocessing
 
-pygame.init()
-
 P1_START = -1
 P2_START = -2
 
 FPS = 30
-SHOOT_INTERVAL = 1000
+# "analytic": volley fire ticks on precomputed rays, "pool": NumPy arrays of
+# bullets, see bullet_model; the bullets of the simulation.Simulation the game runs on
+BULLET_MODE = "analytic"
+# (periods, phases) of each turret's shots from the turret cells, run on a
+# tick_scheduler.TurretCadence; simulation.staggered_fire spreads them out
+FIRE_CADENCE = volley_fire
 
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
@@ -40,149 +48,72 @@ P2_WALL = LIGHT_BLUE
 PLAYER1_COLOR = BLUE
 END_POINT_COLOR = RED
 
-image_path = 'maze_hard_v1.png'
-MAZE_LAYOUTS = ['maze_hard_v1.png']
-NUM_LAYOUTS = 1
-MAZE = get_maze(image_path)
-
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 800
 
-CELL_SIZE = SCREEN_WIDTH // len(MAZE[0])
-
-class Bullet:
-    def __init__(self, x, y, direction):
-        self.rect = pygame.Rect(x, y, CELL_SIZE - 10, CELL_SIZE - 10) 
-        self.direction = direction
-        self.speed = CELL_SIZE
-
-    def move(self):
-        if self.direction == 'up':
-            self.rect.y -= self.speed
-        elif self.direction == 'down':
-            self.rect.y += self.speed
-        elif self.direction == 'left':
-            self.rect.x -= self.speed
-        elif self.direction == 'right':
-            self.rect.x += self.speed
-
-    def draw(self, screen):
-        pygame.draw.rect(screen, YELLOW, self.rect)
-
-    def collide(self, maze):
-        grid_x = self.rect.x // CELL_SIZE
-        grid_y = self.rect.y // CELL_SIZE
-        
-        if grid_x < 0 or grid_x >= len(maze.maze[0]) or grid_y < 0 or grid_y >= len(maze.maze):
-            return True 
-        if maze.maze[grid_y][grid_x] == 1:
-            return True
-        return False
-
-DIRECTIONS = [("down",0,1),("up",0,-1),("right",1,0),("left",-1,0)]
-class Turret:
-    def __init__(self, x, y):
-        self.pos_x = x
-        self.pos_y = y
-        self.rect = pygame.Rect(x, y, CELL_SIZE, CELL_SIZE)
-        self.bullets = []
-
-    def shoot(self, maze):
-        h = len(maze.maze)
-        w = len(maze.maze[0])
-        grid_x = self.pos_x // CELL_SIZE
-        grid_y = self.pos_y // CELL_SIZE
-        
-        for dir, d_x, d_y in DIRECTIONS:
-            new_x = grid_x + d_x
-            new_y = grid_y + d_y
-
-            if 0 <= new_x < w and 0 <= new_y < h:
-                if maze.maze[new_y][new_x] != 1 and maze.maze[new_y][new_x] != 2:
-                    bullet = Bullet(new_x*CELL_SIZE, new_y*CELL_SIZE, dir)
-                    self.bullets.append(bullet)
-
-    def update_bullets(self, maze):
-        for bullet in self.bullets[:]:
-            bullet.move()
-            if bullet.collide(maze):
-                self.bullets.remove(bullet)
-
-        if self.check_player_collision(maze.p1):
-            maze.p1.move_specific(maze.p1_spawn[0], maze.p1_spawn[1])
-
-    def check_player_collision(self, player):
-        for bullet in self.bullets[:]:
-            if bullet.rect.colliderect(player.rect):
-                return True
+image_path = 'maze_hard_v1.png'
+MAZE_LAYOUTS = LayoutRegistry([image_path])
+NUM_LAYOUTS = len(MAZE_LAYOUTS)
 
-    def draw(self, screen):
-        pygame.draw.rect(screen, TURRET_COLOR, self.rect)
-        for bullet in self.bullets:
-            bullet.draw(screen)
+def cell_size_for(maze):
+    # layouts wider than the screen get one pixel per cell, the rest is clipped
+    return max(1, SCREEN_WIDTH // len(maze[0]))
 
 class Player:
-    def __init__(self, start, color, controls):
+    def __init__(self, start, color, controls, cell_size):
         x,y = start
         self.start_x = x
         self.start_y = y
-        self.rect = pygame.Rect(x, y, CELL_SIZE - 2, CELL_SIZE - 2)
+        self.rect = pygame.Rect(x, y, cell_size - 2, cell_size - 2)
         self.color = color
         self.controls = controls
-    
-    def react_keys(self, event, maze):
-        up, down, right, left = self.controls
-        if event == left:
-            self.move(-1, 0, maze)
-        elif event == right:
-            self.move(1, 0, maze)
-        elif event == up:
-            self.move(0, -1, maze)
-        elif event == down:
-            self.move(0, 1, maze)
-
-
-    def move(self, dx, dy, maze):
-        if self.movable(dx, dy, maze):
-            self.rect.x += dx * CELL_SIZE
-            self.rect.y += dy * CELL_SIZE
 
     def move_specific(self, x, y):
         self.rect.x = x
         self.rect.y = y
 
-    def movable(self, dx, dy, maze):
-        new_rect = self.rect.move(dx * CELL_SIZE, dy * CELL_SIZE)
-        i, j = new_rect.y // CELL_SIZE, new_rect.x // CELL_SIZE
-
-        return maze.maze[i][j] != 1 and maze.maze[i][j] != 2
+    def resize(self, cell_size):
+        self.rect.size = (cell_size - 2, cell_size - 2)
 
     def draw(self, screen):
         pygame.draw.rect(screen, self.color, self.rect)
 
 
 class Maze:
+    # what the views draw; the rules, moves, bullets, hits and checkpoints,
+    # are simulation.Simulation's, the Maze is only shown where they led
     def __init__(self, maze, p1):
         self.p1 = p1
+        self.checkpoint_listeners = []
 
-        self.maze = maze
-        self.turrets = []
-        self.checkpoints = []
+        # a CompiledLayout from the layout cache is used as it is, a grid is compiled here
+        maze = CompiledLayout.of(maze)
+        self.maze = maze.grid
+        self.cell_size = cell_size_for(self.maze)
+        self.p1.resize(self.cell_size)
         self.last_check_point = None
+        self.distances = None
+        self.hazards = None
 
         # self.lock = multiprocessing.Lock()
 
-        for i in range(len(maze)):
-            for j in range(len(maze[0])):
-                if maze[i][j] == 2:
-                    self.turrets.append(Turret(j*CELL_SIZE,i*CELL_SIZE))
-                elif maze[i][j] == -1:
-                    self.end_point = pygame.Rect(j*CELL_SIZE,i*CELL_SIZE, CELL_SIZE, CELL_SIZE)
-                elif maze[i][j] == -2:
-                    self.p1_spawn = (j*CELL_SIZE,i*CELL_SIZE)
-                    self.p1.move_specific(j*CELL_SIZE, i*CELL_SIZE)
-                elif maze[i][j] == 6:
-                    self.checkpoints.append(pygame.Rect(j*CELL_SIZE,i*CELL_SIZE, CELL_SIZE, CELL_SIZE))
+        self._load_entities(maze)
+
+    def _load_entities(self, maze):
+        # the tables of the compiled layout, shared by __init__ and swap_maze
+        self.entities = maze
+        cs = self.cell_size
+        self.turret_cells = self.entities.turrets
+        self.checkpoints = [pygame.Rect(x * cs, y * cs, cs, cs) for y, x in self.entities.checkpoints.tolist()]
+
+        # the last goal and spawn in row-major order win, as in Simulation
+        if len(self.entities.end_points):
+            y, x = self.entities.end_points[-1].tolist()
+            self.end_point = pygame.Rect(x * cs, y * cs, cs, cs)
+        if len(self.entities.spawns):
+            y, x = self.entities.spawns[-1].tolist()
+            self.p1_spawn = (x * cs, y * cs)
+            self.p1.move_specific(x * cs, y * cs)
 
     def swap_maze(self, maze):
         # with self.lock:
@@ -194,46 +125,40 @@ class Maze:
         # for i in range(len(maze)):
         #     for j in range(len(maze[0])):
         #         if maze[i][j] == 2:
-        #             self.turrets.append(Turret(j*CELL_SIZE,i*CELL_SIZE))
+        #             self.turrets.append(Turret(j*self.cell_size,i*self.cell_size, self.cell_size))
         #         elif maze[i][j] == -1:
-        #             self.end_point = pygame.Rect(j*CELL_SIZE,i*CELL_SIZE, CELL_SIZE, CELL_SIZE)
+        #             self.end_point = pygame.Rect(j*self.cell_size,i*self.cell_size, self.cell_size, self.cell_size)
         #         elif maze[i][j] == -2:
-        #             self.p1_spawn = (j*CELL_SIZE,i*CELL_SIZE)
-        #             self.p1.move_specific(j*CELL_SIZE, i*CELL_SIZE)
+        #             self.p1_spawn = (j*self.cell_size,i*self.cell_size)
+        #             self.p1.move_specific(j*self.cell_size, i*self.cell_size)
         #         elif maze[i][j] == 6:
-        #             self.checkpoints.append(pygame.Rect(j*CELL_SIZE,i*CELL_SIZE, CELL_SIZE, CELL_SIZE))
-        self.end_point = pygame.Rect(CELL_SIZE*CELL_SIZE, CELL_SIZE*CELL_SIZE, CELL_SIZE, CELL_SIZE)
-
-    def update_state(self, event):
-        self.p1.react_keys(event, self)
-
-        # check for hitting bullet
-        for t in self.turrets:
-            if t.check_player_collision(self.p1):
-                self.p1.move_specific(self.p1_spawn[0], self.p1_spawn[1])
-        
-    def update_checkpoints(self, player_position):
-        # with self.lock: 
-        for checkpoint in self.checkpoints:
-            if pygame.Rect(*player_position, CELL_SIZE, CELL_SIZE).colliderect(checkpoint):
-                self.p1_spawn = (checkpoint.x, checkpoint.y)  # Update the reset point
-                self.last_check_point = checkpoint
-
-        print(self.last_check_point)
-
-    def move_bullets(self):
-        for t in self.turrets:
-            t.update_bullets(self)
-
-    def shoot_turrets(self):
-        for t in self.turrets:
-            t.shoot(self)
-
-    def draw_checkpoints(self, screen):
+        #             self.checkpoints.append(pygame.Rect(j*self.cell_size,i*self.cell_size, self.cell_size, self.cell_size))
+        self.end_point = pygame.Rect(self.cell_size*self.cell_size, self.cell_size*self.cell_size, self.cell_size, self.cell_size)
+
+    def show_player(self, position, checkpoint=None):
+        # the game's player moves in its Simulation, the Maze mirrors it to
+        # draw it and tells the views about the checkpoint it reached, an
+        # index into the layout's checkpoints
+        self.p1.move_specific(*position)
+        if checkpoint is None:
+            return
+        index, checkpoint = checkpoint, self.checkpoints[checkpoint]
+        self.p1_spawn = (checkpoint.x, checkpoint.y)  # Update the reset point
+        self.last_check_point = checkpoint
+        for queue in self.checkpoint_listeners:
+            queue.put((index, checkpoint.x, checkpoint.y))
+
+    def subscribe_checkpoints(self, queue):
+        # every checkpoint reached is put on the queue as (index, x, y)
+        self.checkpoint_listeners.append(queue)
+
+    def draw_checkpoints(self, screen, active=None):
         # print(f"draw check_points {self.last_check_point}")
         # with self.lock:
+        if active is None:
+            active = self.last_check_point
         for c in self.checkpoints:
-            if c == self.last_check_point:
+            if c == active:
                 pygame.draw.rect(screen, ACTIVE_CHECKPOINT_COLOR, c)
             else:
                 pygame.draw.rect(screen, CHECKPOINT_COLOR, c)
@@ -241,6 +166,28 @@ class Maze:
     def get_end_point(self):
         return self.end_point
     
+    def get_cell_size(self):
+        return self.cell_size
+
+    def get_distance_field(self):
+        # rebuilt on the first query after the layout or the goal changes
+        goal = (self.end_point.x // self.cell_size, self.end_point.y // self.cell_size)
+        if self.distances is None or self.distances.goal != goal:
+            self.distances = DistanceField(self.maze, goal)
+        return self.distances
+
+    def get_distance(self, x, y):
+        return self.get_distance_field().distance_from(x, y)
+
+    def get_next_move(self, x, y):
+        return self.get_distance_field().next_move(x, y)
+
+    def get_hazard_map(self):
+        # built on the first query after the layout changes
+        if self.hazards is None:
+            self.hazards = HazardMap(self.maze)
+        return self.hazards
+
     def get_p1(self):
         return self.p1
     
@@ -250,9 +197,6 @@ class Maze:
     def get_pos_y(self):
         return self.p1.rect.y
     
-    def get_turrets(self):
-        return self.turrets
-    
     def get_p1_spawn(self):
         return self.p1_spawn
 
@@ -264,14 +208,15 @@ class Maze:
         print('lock acquired')
         for i, row in enumerate(self.maze):
             for j, cell in enumerate(row):
-                if cell == 0:
-                    color = PATH_COLOR
-                elif cell == 1:
+                # spawns, goals, checkpoints and turrets are floor under what is drawn on them
+                if cell == 1:
                     color = WALL_COLOR
-                pygame.draw.rect(screen, color, pygame.Rect(j * CELL_SIZE, i * CELL_SIZE, CELL_SIZE, CELL_SIZE))
+                else:
+                    color = PATH_COLOR
+                pygame.draw.rect(screen, color, pygame.Rect(j * self.cell_size, i * self.cell_size, self.cell_size, self.cell_size))
 
-        for t in self.turrets:
-            t.draw(screen)
+        for y, x in self.turret_cells.tolist():
+            pygame.draw.rect(screen, TURRET_COLOR, pygame.Rect(x * self.cell_size, y * self.cell_size, self.cell_size, self.cell_size))
         
         # self.draw_checkpoints(screen)
         pygame.draw.rect(screen, END_POINT_COLOR, self.end_point)
@@ -279,17 +224,16 @@ class Maze:
         self.p1.draw(screen)
 
 P1_CONTROLS= (pygame.K_w, pygame.K_s, pygame.K_d, pygame.K_a)
+# P1_CONTROLS (up, down, right, left) -> index into distance_field.MOVES (down, up, right, left)
+KEY_ACTIONS = dict(zip(P1_CONTROLS, (1, 0, 2, 3)))
 P2_CONTROLS = (pygame.K_UP, pygame.K_DOWN, pygame.K_RIGHT, pygame.K_LEFT)
 
-def check_win_condition(maze):
-    return maze.get_p1().rect.colliderect(maze.get_end_point())
-
-
-def player_view(maze, player_position, event_queue, bullet_positions, role_switch):
+def player_view(maze, player_position, event_queue, bullet_positions, role_switch, checkpoint_events):
     pygame.init()
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
     pygame.display.set_caption('Player 1 View')
     clock = pygame.time.Clock()
+    active_checkpoint = None
 
     while True:
         for event in pygame.event.get():
@@ -299,11 +243,16 @@ def player_view(maze, player_position, event_queue, bullet_positions, role_switc
             if event.type == pygame.KEYDOWN:
                 event_queue.put(event.key)
 
+        cell_size = maze.get_cell_size()
+        while not checkpoint_events.empty():
+            _, x, y = checkpoint_events.get()
+            active_checkpoint = pygame.Rect(x, y, cell_size, cell_size)
+
         if role_switch.value == 0:  # Player view is controller
             screen.fill(WHITE)
-            for x in range(0, SCREEN_WIDTH, CELL_SIZE):
+            for x in range(0, SCREEN_WIDTH, cell_size):
                 pygame.draw.line(screen, BLACK, (x, 0), (x, SCREEN_HEIGHT))  # Vertical lines
-            for y in range(0, SCREEN_HEIGHT, CELL_SIZE):
+            for y in range(0, SCREEN_HEIGHT, cell_size):
                 pygame.draw.line(screen, BLACK, (0, y), (SCREEN_WIDTH, y))  # Horizontal lines
             
         else:  # Player view becomes the full map
@@ -312,20 +261,21 @@ def player_view(maze, player_position, event_queue, bullet_positions, role_switc
             maze.draw(screen)
 
             for bullet in bullet_positions:
-                pygame.draw.rect(screen, YELLOW, pygame.Rect(bullet[0], bullet[1], CELL_SIZE - 10, CELL_SIZE - 10))
+                pygame.draw.rect(screen, YELLOW, pygame.Rect(bullet[0], bullet[1], cell_size - 10, cell_size - 10))
         
         # Draw the player
-        maze.draw_checkpoints(screen)
-        pygame.draw.rect(screen, PLAYER1_COLOR, pygame.Rect(player_position[0], player_position[1], CELL_SIZE - 2, CELL_SIZE - 2))
+        maze.draw_checkpoints(screen, active_checkpoint)
+        pygame.draw.rect(screen, PLAYER1_COLOR, pygame.Rect(player_position[0], player_position[1], cell_size - 2, cell_size - 2))
         pygame.display.flip()
         clock.tick(FPS)
 
 
-def map_view(maze, player_position, event_queue, bullet_positions, role_switch):
+def map_view(maze, player_position, event_queue, bullet_positions, role_switch, checkpoint_events):
     pygame.init()
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
     pygame.display.set_caption('Player 2 View')
     clock = pygame.time.Clock()
+    active_checkpoint = None
 
     while True:
         for event in pygame.event.get():
@@ -335,27 +285,32 @@ def map_view(maze, player_position, event_queue, bullet_positions, role_switch):
             if event.type == pygame.KEYDOWN:
                 event_queue.put(event.key)
 
+        cell_size = maze.get_cell_size()
+        while not checkpoint_events.empty():
+            _, x, y = checkpoint_events.get()
+            active_checkpoint = pygame.Rect(x, y, cell_size, cell_size)
+
         if role_switch.value == 0:  # Map view shows the full map
             # Draw the full map
             screen.fill(BLACK)
             maze.draw(screen)
 
             for bullet in bullet_positions:
-                pygame.draw.rect(screen, YELLOW, pygame.Rect(bullet[0], bullet[1], CELL_SIZE - 10, CELL_SIZE - 10))
+                pygame.draw.rect(screen, YELLOW, pygame.Rect(bullet[0], bullet[1], cell_size - 10, cell_size - 10))
 
         else:  # Map view becomes the controller
             # Draw player view: Only the player rectangle and bullets are visible
             screen.fill(WHITE)
             
             # Draw grid
-            for x in range(0, SCREEN_WIDTH, CELL_SIZE):
+            for x in range(0, SCREEN_WIDTH, cell_size):
                 pygame.draw.line(screen, BLACK, (x, 0), (x, SCREEN_HEIGHT))  # Vertical lines
-            for y in range(0, SCREEN_HEIGHT, CELL_SIZE):
+            for y in range(0, SCREEN_HEIGHT, cell_size):
                 pygame.draw.line(screen, BLACK, (0, y), (SCREEN_WIDTH, y))  # Horizontal lines
             
         # Draw the player
-        maze.draw_checkpoints(screen)
-        pygame.draw.rect(screen, PLAYER1_COLOR, pygame.Rect(player_position[0], player_position[1], CELL_SIZE - 2, CELL_SIZE - 2))
+        maze.draw_checkpoints(screen, active_checkpoint)
+        pygame.draw.rect(screen, PLAYER1_COLOR, pygame.Rect(player_position[0], player_position[1], cell_size - 2, cell_size - 2))
         pygame.display.flip()
         clock.tick(FPS)
 
@@ -364,67 +319,100 @@ class MyManager(SyncManager):
     pass # Pass is really enough. Nothing needs to be done here.
 
 
-def main():
+def main(record=None):
+    """
+    Run the game, the simulation here and the two views in their own processes.
+
+    Args:
+        record (str): optional path prefix, the inputs up to the first win
+            are saved to <record>-0.mzr for replay.py.
+    """
+    pygame.init()
     manager = multiprocessing.Manager()
-    player_position = manager.list([CELL_SIZE, CELL_SIZE])  # Shared player position
+    cell_size = cell_size_for(MAZE_LAYOUTS[0].compiled().grid)
+    player_position = manager.list([cell_size, cell_size])  # Shared player position
     bullet_positions = manager.list()  # Shared list of bullets (x, y)
     event_queue = manager.Queue()  # Queue to handle player events
     role_switch = manager.Value('i', 0)  # 0 = default roles, 1 = switched roles
 
-    maze_layout_1 = get_maze(image_path)
-    maze_layout_2 = get_maze(image_path, reflect=True)
+    # compiled once and mapped from the layout cache, shared by the Maze and the Simulation
+    maze_layout_1 = MAZE_LAYOUTS[0].compiled()
+    maze_layout_2 = MAZE_LAYOUTS[0].compiled(reflect=True)
 
-    player = Player((CELL_SIZE, CELL_SIZE), PLAYER1_COLOR, P1_CONTROLS)
+    player = Player((cell_size, cell_size), PLAYER1_COLOR, P1_CONTROLS, cell_size)
     maze = Maze(maze_layout_1, player)
 
+    # one queue of reached checkpoints per view
+    checkpoint_events = [manager.Queue(), manager.Queue()]
+    for queue in checkpoint_events:
+        maze.subscribe_checkpoints(queue)
+
     # Create two processes for the views
-    player_p1 = multiprocessing.Process(target=player_view, args=(maze, player_position, event_queue, bullet_positions, role_switch))
-    player_p2 = multiprocessing.Process(target=map_view, args=(maze, player_position, event_queue, bullet_positions, role_switch))
+    player_p1 = multiprocessing.Process(target=player_view, args=(maze, player_position, event_queue, bullet_positions, role_switch, checkpoint_events[0]))
+    player_p2 = multiprocessing.Process(target=map_view, args=(maze, player_position, event_queue, bullet_positions, role_switch, checkpoint_events[1]))
     
     player_p1.start()
     player_p2.start()
 
-    clock = pygame.time.Clock()
-
-    SHOOT_EVENT = pygame.USEREVENT + 1
-    MOVE_EVENT = pygame.USEREVENT + 2
-    pygame.time.set_timer(MOVE_EVENT, 500)
-    pygame.time.set_timer(SHOOT_EVENT, 5000)
-
-    while True:
-        # Read player input from the queue
+    # the rules are simulation.Simulation's, stepped once per fixed tick
+    # whatever the frame rate; the Maze only holds what the views draw
+    sim = Simulation(maze_layout_1, BULLET_MODE, checkpoint_goal=False, fire_cadence=FIRE_CADENCE)
+    recorder = SessionRecorder(sim) if record else None
+    scheduler = TickScheduler()
+    shown_player = None
+    shown_bullets = []
+
+    def tick():
+        nonlocal shown_player, shown_bullets, recorder
+        # one key per tick, the others wait in the queue
+        action = NO_MOVE
         if not event_queue.empty():
-            keys = event_queue.get()
-            maze.p1.react_keys(keys, maze)
-
-        # Update the shared player position
-        player_position[0] = maze.p1.rect.x
-        player_position[1] = maze.p1.rect.y
-        maze.update_checkpoints(player_position)
-
-        # Handle turret shooting
-        for event in pygame.event.get():
-            if event.type == SHOOT_EVENT:
-                maze.shoot_turrets()
-            if event.type == MOVE_EVENT:
-                maze.move_bullets()
-                bullet_positions[:] = [(b.rect.x, b.rect.y) for t in maze.turrets for b in t.bullets]
-
-        # Check for collisions with bullets
-        for t in maze.turrets:
-            if t.check_player_collision(maze.p1):
-                maze.p1.move_specific(maze.p1_spawn[0], maze.p1_spawn[1])
+            action = KEY_ACTIONS.get(event_queue.get(), NO_MOVE)
+        state = recorder.step(action) if recorder else sim.step(action)
+
+        # share what changed with the views, in pixels
+        position = (sim.x * cell_size, sim.y * cell_size)
+        if position != shown_player or state["checkpoint"] is not None:
+            shown_player = position
+            player_position[0] = position[0]
+            player_position[1] = position[1]
+            maze.show_player(position, state["checkpoint"])
+        bullets = [(x * cell_size, y * cell_size) for x, y in sim.bullet_positions().tolist()]
+        if bullets != shown_bullets:
+            shown_bullets = bullets
+            bullet_positions[:] = bullets
 
         # Check win condition
-        if check_win_condition(maze):
+        if state["won"]:
             role_switch.value = 1  # Trigger role switch
             maze.swap_maze(maze_layout_2)
+            # swap_maze keeps the layout and only moves the end point
+            end_point = maze.get_end_point()
+            sim.goal = (end_point.x // cell_size, end_point.y // cell_size)
+            # a goal moved outside the rules can't be replayed, the recording ends here
+            if recorder:
+                recorder.save(f"{record}-0.mzr")
+                recorder = None
+
+    def views_closed():
+        # the session is over once both windows are closed
+        if not (player_p1.is_alive() or player_p2.is_alive()):
+            scheduler.stop()
+
+    scheduler.every(1, tick)
+    scheduler.every(TICK_RATE, views_closed)
+
+    clock = pygame.time.Clock()
+    timestep = FixedTimestep(TICK_RATE)
+    clock.tick()
+    while not scheduler.stopped:
+        scheduler.run(timestep.advance(clock.tick(FPS)))
+    if recorder:
+        recorder.save(f"{record}-0.mzr")
 
-        clock.tick(FPS)
-    
     player_p1.join()
     player_p2.join()
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
 
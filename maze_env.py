@@ -0,0 +1,250 @@
+import numpy as np
+
+from batch_simulation import BatchSimulation
+from generate import generate_game_layout
+from simulation import MOVE_INTERVAL, SHOOT_INTERVAL, Simulation
+
+WIN_REWARD = 1.0
+HIT_REWARD = -1.0
+# 100 s of game time at 30 FPS
+MAX_STEPS = 3000
+
+
+def _read_only(array):
+    # a view the caller can't write through, the owner still updates it in place
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+class MazeEnv:
+    """
+    Gym-style environment of one game, simulation.Simulation behind reset and step.
+
+    Observations are a dict of arrays owned by the environment and updated
+    in place by every step, so reading one costs nothing and keeping one
+    across steps needs a copy:
+        grid: (h, w) int8 cell codes of the layout.
+        player: (2,) int64 (x, y) cell of the player.
+        bullets: (h, w) int32 number of bullets on every cell.
+        checkpoint: (1,) int32 index into the layout's checkpoints of the
+            active checkpoint, -1 before the first one.
+    grid and bullets are replaced when reset loads another layout, player
+    and checkpoint never are. Actions index distance_field.MOVES or are
+    NO_MOVE, a step is one frame of the game loop.
+    """
+
+    def __init__(self, layouts=None, size=25, max_steps=MAX_STEPS, **options):
+        """
+        Args:
+            layouts (list): optional grids for reset to pick from, by default
+                it plays a freshly generated size x size layout.
+            size (int): side length of generated layouts.
+            max_steps (int): steps after which an episode is truncated.
+            **options: passed on to Simulation.
+        """
+        self.layouts = layouts
+        self.size = size
+        self.max_steps = max_steps
+        self.options = options
+        self.rng = np.random.default_rng()
+        self.sim = None
+        self.observation = None
+        # the dtypes of VectorMazeEnv's observations, a game of the batch reads the same
+        self._player = np.zeros(2, dtype=np.int64)
+        self._checkpoint = np.full(1, -1, dtype=np.int32)
+
+    def _pick_layout(self):
+        if self.layouts:
+            return self.layouts[self.rng.integers(len(self.layouts))]
+        return generate_game_layout(self.size, seed=int(self.rng.integers(2 ** 31)))
+
+    def reset(self, seed=None, layout=None):
+        """
+        Start an episode.
+
+        Args:
+            seed (int): reseeds the choice of layouts, equal seeds give
+                equal sequences of episodes.
+            layout (np.ndarray): grid to play, by default one of layouts or
+                a generated one. Playing the current grid again restarts it
+                without compiling it.
+
+        Returns:
+            tuple: (observation, info), info holds the tick and the player's
+                cell.
+        """
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        if layout is None:
+            layout = self._pick_layout()
+
+        if self.sim is not None and layout is self.sim.grid:
+            self.sim.restart()
+        else:
+            if self.sim is None:
+                self.sim = Simulation(layout, **self.options)
+            else:
+                self.sim.load(layout)
+            # a new layout comes with new grid and bullet arrays
+            self.observation = {
+                "grid": _read_only(np.asarray(self.sim.grid, dtype=np.int8)),
+                "player": _read_only(self._player),
+                "bullets": _read_only(self.sim.bullets.occupancy().grid),
+                "checkpoint": _read_only(self._checkpoint),
+            }
+        self.sim.bullets.occupancy()
+        self._player[:] = self.sim.x, self.sim.y
+        self._checkpoint[0] = -1
+        return self.observation, {"tick": 0, "player": (self.sim.x, self.sim.y)}
+
+    def step(self, action):
+        """
+        Advance one tick.
+
+        Args:
+            action (int): index into distance_field.MOVES or NO_MOVE.
+
+        Returns:
+            tuple: (observation, reward, terminated, truncated, info).
+                reward is WIN_REWARD on the goal, HIT_REWARD when a bullet
+                sent the player back, 0 otherwise. terminated is True once
+                the player is on the goal, truncated after max_steps. info
+                is the Simulation.step state.
+        """
+        sim = self.sim
+        state = sim.step(action)
+        self._player[0] = sim.x
+        self._player[1] = sim.y
+        # rebuilt only on the ticks bullets moved or fired
+        sim.bullets.occupancy()
+        if state["checkpoint"] is not None:
+            self._checkpoint[0] = state["checkpoint"]
+
+        reward = 0.0
+        if state["won"]:
+            reward = WIN_REWARD
+        elif state["hit"]:
+            reward = HIT_REWARD
+        return self.observation, reward, state["won"], sim.tick >= self.max_steps, state
+
+
+class VectorMazeEnv:
+    """
+    num_envs games of the same layout size stepped together by a BatchSimulation.
+
+    Observations are the MazeEnv ones with a leading game axis, views of
+    the batch's own arrays or buffers filled in place:
+        grid: (n, h, w) int8 cell codes.
+        player: (n, 2) int64 (x, y) cells.
+        bullets: (n, h, w) bool, whether a bullet is on the cell, refreshed
+            on the ticks bullets move or fire. Skipped with bullets=False,
+            which saves a pass over every cell of every game.
+        checkpoint: (n,) int32 active checkpoints, -1 before the first one.
+    Games share the bullet clock, so a game restarted by autoreset joins
+    the volleys already in flight. reset with layouts of the same size
+    loads them into the existing batch, the observation arrays stay the
+    same objects.
+    """
+
+    def __init__(self, num_envs, layouts=None, size=25, max_steps=MAX_STEPS, autoreset=True, bullets=True,
+                 **options):
+        """
+        Args:
+            num_envs (int): number of games.
+            layouts (list): optional equal shape grids for reset to pick
+                from, by default it generates size x size layouts.
+            size (int): side length of generated layouts.
+            max_steps (int): steps after which an episode is truncated.
+            autoreset (bool): games that terminate or are truncated restart
+                in place within the same step, whose observation is then
+                the first one of the new episode.
+            bullets (bool): keep the bullets observation up to date.
+            **options: passed on to BatchSimulation.
+        """
+        self.num_envs = num_envs
+        self.layouts = layouts
+        self.size = size
+        self.max_steps = max_steps
+        self.autoreset = autoreset
+        self.observe_bullets = bullets
+        self.options = options
+        self.move_interval = options.get("move_interval", MOVE_INTERVAL)
+        self.shoot_interval = options.get("shoot_interval", SHOOT_INTERVAL)
+        self.rng = np.random.default_rng()
+        self.sim = None
+        self.observation = None
+        self.steps = np.zeros(num_envs, dtype=np.int64)
+
+    def reset(self, seed=None, layouts=None):
+        """
+        Start an episode in every game.
+
+        Args:
+            seed (int): reseeds the choice of layouts.
+            layouts: (num_envs, h, w) grids to play, by default picked from
+                layouts or generated.
+
+        Returns:
+            tuple: (observation, info), info is empty.
+
+        Raises:
+            RuntimeError: if layouts doesn't hold num_envs grids.
+        """
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        if layouts is None:
+            if self.layouts:
+                picks = self.rng.integers(len(self.layouts), size=self.num_envs)
+                layouts = [self.layouts[i] for i in picks]
+            else:
+                seeds = self.rng.integers(2 ** 31, size=self.num_envs)
+                layouts = [generate_game_layout(self.size, seed=int(s)) for s in seeds]
+        if len(layouts) != self.num_envs:
+            raise RuntimeError(f"expected {self.num_envs} layouts, got {len(layouts)}")
+
+        self.steps[:] = 0
+        if self.sim is not None and {np.shape(layout) for layout in layouts} == {self.sim.grids.shape[1:]}:
+            # same layout size, the batch and the observation arrays are reused
+            self.sim.load(layouts)
+            self._bullets[:] = False
+            return self.observation, {}
+
+        self.sim = sim = BatchSimulation(layouts, **self.options)
+        self._bullets = np.zeros((sim.n, sim.height, sim.width), dtype=bool)
+        self.observation = {
+            "grid": _read_only(sim.grids),
+            "player": _read_only(sim.position),
+            "bullets": _read_only(self._bullets),
+            "checkpoint": _read_only(sim.active_checkpoint),
+        }
+        return self.observation, {}
+
+    def step(self, actions):
+        """
+        Advance every game one tick.
+
+        Args:
+            actions (np.ndarray): (num_envs,) indices into
+                distance_field.MOVES or NO_MOVE.
+
+        Returns:
+            tuple: (observation, reward, terminated, truncated, info) with
+                (num_envs,) reward, terminated and truncated arrays as in
+                MazeEnv.step, info is the BatchSimulation.step state.
+        """
+        sim = self.sim
+        state = sim.step(actions)
+        self.steps += 1
+        terminated = state["won"]
+        truncated = (self.steps >= self.max_steps) & ~terminated
+        reward = np.where(terminated, WIN_REWARD, np.where(state["hit"], HIT_REWARD, 0.0))
+
+        if self.autoreset:
+            done = terminated | truncated
+            if done.any():
+                sim.reset(done)
+                self.steps[done] = 0
+        if self.observe_bullets and (sim.tick % self.move_interval == 0 or sim.tick % self.shoot_interval == 0):
+            sim.occupancy(self._bullets)
+        return self.observation, reward, terminated, truncated, state
@@ -0,0 +1,171 @@
+import numpy as np
+
+from loader import get_maze_array, save_maze_image
+
+MAGIC = b"MAZE"
+FORMAT_VERSION = 1
+
+# what the cell codes in the payload mean
+PALETTE_BINARY = 1  # generate.py mazes: 1 is a path, 0 is a wall
+PALETTE_GAME = 2  # loader.PALETTE codes: 0 path, 1 wall, 2 turret, ...
+
+HEADER = np.dtype([
+    ("magic", "S4"),
+    ("format_version", "<u2"),
+    ("palette_version", "<u2"),
+    ("height", "<u8"),
+    ("width", "<u8"),
+    ("dtype", "S8"),
+])
+
+
+def read_header(path):
+    """
+    Read the header of a binary maze file.
+
+    Returns:
+        dict: height, width, dtype (np.dtype) and palette_version.
+    """
+    header = np.fromfile(path, dtype=HEADER, count=1)
+    if len(header) == 0 or header[0]["magic"] != MAGIC:
+        raise RuntimeError(f"not a binary maze file: {path}")
+    header = header[0]
+    if header["format_version"] != FORMAT_VERSION:
+        raise RuntimeError(f"unsupported maze format version {header['format_version']}: {path}")
+    return {
+        "height": int(header["height"]),
+        "width": int(header["width"]),
+        "dtype": np.dtype(header["dtype"].decode()),
+        "palette_version": int(header["palette_version"]),
+    }
+
+
+def is_maze_file(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _write_header(f, shape, dtype, palette_version):
+    height, width = shape
+    header = np.array([(MAGIC, FORMAT_VERSION, palette_version, height, width, np.dtype(dtype).str.encode())],
+                      dtype=HEADER)
+    f.write(header.tobytes())
+
+
+def write_maze(path, grid, palette_version=PALETTE_GAME):
+    """
+    Write a 2D grid of cell codes as a header followed by the raw cells.
+
+    Args:
+        path (str): output file.
+        grid (np.ndarray): 2D array of cell codes, stored with its own dtype.
+        palette_version (int): PALETTE_BINARY or PALETTE_GAME.
+    """
+    grid = np.ascontiguousarray(grid)
+    with open(path, "wb") as f:
+        _write_header(f, grid.shape, grid.dtype, palette_version)
+        grid.tofile(f)
+
+
+def create_maze(path, shape, dtype=np.int8, palette_version=PALETTE_GAME):
+    """Create a maze file of the given shape and return it as a writable memmap."""
+    with open(path, "wb") as f:
+        _write_header(f, shape, dtype, palette_version)
+    return np.memmap(path, dtype=dtype, mode="r+", offset=HEADER.itemsize, shape=tuple(shape))
+
+
+class MazeWriter:
+    """
+    Append rows to a maze file whose height is not known up front.
+
+    The header is written with height 0 and patched with the final row
+    count on close, so only one row has to be in memory at a time.
+
+        with MazeWriter(path, width) as writer:
+            for row in rows:
+                writer.write_row(row)
+    """
+
+    def __init__(self, path, width, dtype=np.uint8, palette_version=PALETTE_BINARY):
+        self.width = width
+        self.dtype = np.dtype(dtype)
+        self.palette_version = palette_version
+        self.height = 0
+        self._file = open(path, "wb")
+        _write_header(self._file, (0, width), self.dtype, palette_version)
+
+    def write_row(self, row):
+        row = np.asarray(row, dtype=self.dtype)
+        if row.shape != (self.width,):
+            raise RuntimeError(f"row has shape {row.shape}, expected ({self.width},)")
+        self._file.write(row.tobytes())
+        self.height += 1
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.seek(0)
+        _write_header(self._file, (self.height, self.width), self.dtype, self.palette_version)
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_maze(path, mode="r"):
+    """
+    Memory-map the cells of a binary maze file.
+
+    Nothing but the header is read up front, rows are paged in as they are
+    touched.
+
+    Returns:
+        tuple: (np.memmap of shape (height, width), palette_version)
+    """
+    header = read_header(path)
+    grid = np.memmap(path, dtype=header["dtype"], mode=mode, offset=HEADER.itemsize,
+                     shape=(header["height"], header["width"]))
+    return grid, header["palette_version"]
+
+
+def to_game_codes(grid, palette_version):
+    """Convert a grid to loader.PALETTE codes."""
+    if palette_version == PALETTE_GAME:
+        return np.asarray(grid, dtype=np.int8)
+    if palette_version == PALETTE_BINARY:
+        return np.where(np.asarray(grid) == 1, 0, 1).astype(np.int8)
+    raise RuntimeError(f"unknown palette version {palette_version}")
+
+
+def load_text_maze(path):
+    """Load a whitespace separated text maze. A single line is read as a square grid."""
+    grid = np.loadtxt(path, dtype=int, ndmin=1)
+    if grid.ndim == 1:
+        side = int(np.sqrt(grid.size))
+        if side * side != grid.size:
+            raise RuntimeError(f"{path}: {grid.size} cells do not form a square maze")
+        grid = grid.reshape((side, side))
+    return grid
+
+
+def text_to_maze(text_path, maze_path, palette_version=PALETTE_BINARY):
+    grid = load_text_maze(text_path)
+    write_maze(maze_path, grid.astype(np.int8), palette_version)
+
+
+def maze_to_text(maze_path, text_path):
+    grid, _ = open_maze(maze_path)
+    np.savetxt(text_path, grid, fmt="%d")
+
+
+def png_to_maze(png_path, maze_path):
+    write_maze(maze_path, get_maze_array(png_path), PALETTE_GAME)
+
+
+def maze_to_png(maze_path, png_path):
+    """Save a maze file as a layout image that loader.get_maze reads back."""
+    grid, palette_version = open_maze(maze_path)
+    save_maze_image(to_game_codes(grid, palette_version), png_path)
@@ -0,0 +1,196 @@
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from collections import deque
+
+import numpy as np
+
+from generate import generate_solvable_binary_maze
+from loader import save_maze_image
+from maze_format import PALETTE_BINARY, to_game_codes
+from maze_verify import path_connected
+
+MAGIC = b"MZPK"
+PACK_VERSION = 1
+
+HEADER = np.dtype([
+    ("magic", "S4"),
+    ("version", "<u2"),
+    ("palette_version", "<u2"),
+    ("count", "<u8"),
+    ("index_offset", "<u8"),
+])
+# seeds are stored unsigned, build_pack rejects the ones that don't fit
+INDEX_ENTRY = np.dtype([
+    ("seed", "<u8"),
+    ("offset", "<u8"),
+    ("height", "<u4"),
+    ("width", "<u4"),
+])
+
+
+def validate_maze(maze, size):
+    """Raise RuntimeError if a generated maze is malformed or not solvable."""
+    if maze.shape != (size, size):
+        raise RuntimeError(f"maze has shape {maze.shape}, expected {(size, size)}")
+    if maze.max(initial=0) > 1:
+        raise RuntimeError("maze has cells other than 0 and 1")
+    if not (maze[0, 0] and maze[-1, -1]):
+        raise RuntimeError("maze start or end is a wall")
+    if not path_connected(maze == 1, (0, 0), (size - 1, size - 1)):
+        raise RuntimeError("maze end is not reachable from the start")
+
+
+def _generate_chunk(seeds, size):
+    mazes = []
+    for seed in seeds:
+        maze = generate_solvable_binary_maze(size, seed)
+        validate_maze(maze, size)
+        mazes.append(maze)
+    return mazes
+
+
+def build_pack(path, seeds, size, workers=None, chunksize=1, in_flight=None):
+    """
+    Generate one maze per seed on a process pool and stream them into a pack.
+
+    Mazes are written as soon as they come back, in seed order, so the pack
+    is byte for byte the same for any number of workers. At most in_flight
+    chunks are queued or done but not yet written, so memory stays bounded
+    however many seeds there are. The pack is written to a temporary file
+    next to path and renamed once complete, a failed build leaves no pack.
+
+    Args:
+        path (str): output pack file.
+        seeds (list): one generator seed per maze, in [0, 2 ** 64).
+        size (int): side length of every maze.
+        workers (int): pool size, defaults to os.cpu_count().
+        chunksize (int): seeds handed to a worker at a time.
+        in_flight (int): chunks submitted ahead of the one being written,
+            defaults to twice the pool size.
+
+    Returns:
+        int: number of mazes written.
+    """
+    seeds = list(seeds)
+    for seed in seeds:
+        if not 0 <= seed < 2 ** 64:
+            raise RuntimeError(f"seed {seed} does not fit the pack's unsigned 64 bit seed field")
+    index = np.zeros(len(seeds), dtype=INDEX_ENTRY)
+    chunks = [seeds[i:i + chunksize] for i in range(0, len(seeds), chunksize)]
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(bytes(HEADER.itemsize))
+            with multiprocessing.Pool(workers) as pool:
+                window = in_flight or 2 * (workers or os.cpu_count())
+                pending = deque()
+                i = 0
+                for chunk in chunks:
+                    if len(pending) == window:
+                        i = _write_chunk(f, index, i, pending.popleft())
+                    pending.append((chunk, pool.apply_async(_generate_chunk, (chunk, size))))
+                while pending:
+                    i = _write_chunk(f, index, i, pending.popleft())
+
+            index_offset = f.tell()
+            f.write(index.tobytes())
+            f.seek(0)
+            header = np.array([(MAGIC, PACK_VERSION, PALETTE_BINARY, len(seeds), index_offset)], dtype=HEADER)
+            f.write(header.tobytes())
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+    return len(seeds)
+
+
+def _write_chunk(f, index, i, job):
+    """Wait for a chunk of mazes, write them from index entry i on and return the next entry."""
+    chunk, result = job
+    for seed, maze in zip(chunk, result.get()):
+        index[i] = (seed, f.tell(), maze.shape[0], maze.shape[1])
+        f.write(maze.tobytes())
+        i += 1
+    return i
+
+
+class MazePack:
+    """Read-only view of a pack file, mazes are memory-mapped on access."""
+
+    def __init__(self, path):
+        self.path = path
+        header = np.fromfile(path, dtype=HEADER, count=1)
+        if len(header) == 0 or header[0]["magic"] != MAGIC:
+            raise RuntimeError(f"not a maze pack: {path}")
+        header = header[0]
+        self.palette_version = int(header["palette_version"])
+        self.index = np.fromfile(path, dtype=INDEX_ENTRY, count=int(header["count"]),
+                                 offset=int(header["index_offset"]))
+        self._data = np.memmap(path, dtype=np.uint8, mode="r")
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i):
+        entry = self.index[i]
+        start = int(entry["offset"])
+        height, width = int(entry["height"]), int(entry["width"])
+        return self._data[start:start + height * width].reshape(height, width)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    @property
+    def seeds(self):
+        return self.index["seed"]
+
+
+def export_pack_images(pack_path, output_dir):
+    """
+    Save every maze of a pack as an indexed PNG in the game palette.
+
+    Mazes are read and encoded one at a time. Files are named by seed.
+
+    Returns:
+        list: paths of the written images.
+    """
+    pack = MazePack(pack_path)
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for seed, maze in zip(pack.seeds, pack):
+        path = os.path.join(output_dir, f"maze_{int(seed)}.png")
+        save_maze_image(to_game_codes(maze, pack.palette_version), path)
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a pack of seeded mazes.")
+    parser.add_argument("output", help="pack file to write")
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--size", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first maze, the rest count up")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--images", help="also export every maze as a PNG into this directory")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    count = build_pack(args.output, range(args.seed, args.seed + args.count), args.size, args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"{count} mazes of {args.size}x{args.size} written to {args.output} "
+          f"in {elapsed:.2f} s ({count / elapsed:.1f} mazes/s, {os.path.getsize(args.output)} bytes)")
+
+    if args.images:
+        start = time.perf_counter()
+        paths = export_pack_images(args.output, args.images)
+        size = sum(os.path.getsize(path) for path in paths)
+        print(f"{len(paths)} images written to {args.images} in {time.perf_counter() - start:.2f} s ({size} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import argparse
+import struct
+import time
+import zlib
+
+import numpy as np
+
+from loader import CODE_COLORS
+from maze_format import PALETTE_BINARY, MazeWriter
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+IDAT_SIZE = 1 << 16
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def eller_rows(width, height=None, seed=None):
+    """
+    Generate a perfect maze one row at a time with Eller's algorithm.
+
+    Only the set labels of the current lattice row are kept, so memory is
+    O(width) whatever the height. Paths run between the even coordinates
+    like generate_solvable_binary_maze, (0, 0) is the start and
+    (height - 1, width - 1) the end.
+
+    Args:
+        width (int): number of cells per row.
+        height (int): number of rows, None for an endless maze whose every
+            prefix can be extended downwards.
+        seed (int): seed for np.random.default_rng, equal seeds give equal mazes.
+
+    Yields:
+        np.ndarray: (width,) uint8 rows, 1 is a path and 0 is a wall.
+    """
+    cols = (width + 1) // 2
+    rows = None if height is None else (height + 1) // 2
+    rng = np.random.default_rng(seed)
+    labels = np.arange(cols)
+
+    r = 0
+    while rows is None or r < rows:
+        last = rows is not None and r == rows - 1
+
+        # join neighbours in different sets, the last row joins all of them
+        join = np.ones(cols - 1, dtype=bool) if last else rng.random(cols - 1) < 0.5
+        parent = list(range(cols))
+        current = labels.tolist()
+        carved = np.zeros(max(cols - 1, 0), dtype=bool)
+        for j in np.flatnonzero(join).tolist():
+            a = _find(parent, current[j])
+            b = _find(parent, current[j + 1])
+            if a != b:
+                parent[b] = a
+                carved[j] = True
+        labels = np.array([_find(parent, label) for label in current])
+
+        row = np.zeros(width, dtype=np.uint8)
+        row[0:2 * cols:2] = 1
+        row[1:2 * cols - 1:2][carved] = 1
+        if last and width % 2 == 0:
+            row[width - 1] = 1
+        yield row
+        if last:
+            break
+
+        # every set goes down at least once so nothing is cut off
+        down = rng.random(cols) < 0.5
+        has_down = np.zeros(cols, dtype=bool)
+        has_down[labels[down]] = True
+        if not has_down[labels].all():
+            order = rng.permutation(cols)
+            missing = order[~has_down[labels[order]]]
+            _, first = np.unique(labels[missing], return_index=True)
+            down[missing[first]] = True
+
+        row = np.zeros(width, dtype=np.uint8)
+        row[0:2 * cols:2][down] = 1
+        yield row
+
+        # cells that were not entered from above start a set of their own
+        _, labels = np.unique(np.where(down, labels, cols + np.arange(cols)), return_inverse=True)
+        r += 1
+
+    if height is not None and height % 2 == 0:
+        row = np.zeros(width, dtype=np.uint8)
+        row[width - 1] = 1
+        yield row
+
+
+def _png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+class PngRowWriter:
+    """
+    Write a palette PNG row by row, in the loader.PALETTE colors.
+
+    Rows are compressed as they arrive and flushed in IDAT chunks, so the
+    image never has to be in memory. PNG needs the height up front.
+    """
+
+    def __init__(self, path, width, height):
+        self.width = width
+        self.height = height
+        self.rows = 0
+        self._file = open(path, "wb")
+        self._compressor = zlib.compressobj()
+        self._pending = b""
+
+        self._file.write(PNG_SIGNATURE)
+        self._file.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0)))
+        self._file.write(_png_chunk(b"PLTE", CODE_COLORS[:, :3].tobytes()))
+        self._file.write(_png_chunk(b"tRNS", CODE_COLORS[:, 3].tobytes()))
+
+    def write_row(self, codes):
+        """Write one row of loader.PALETTE cell codes."""
+        indices = (np.asarray(codes, dtype=np.int16) + 2).astype(np.uint8)
+        self._pending += self._compressor.compress(b"\0" + indices.tobytes())
+        if len(self._pending) >= IDAT_SIZE:
+            self._file.write(_png_chunk(b"IDAT", self._pending))
+            self._pending = b""
+        self.rows += 1
+
+    def close(self):
+        if self._file.closed:
+            return
+        if self.rows != self.height:
+            self._file.close()
+            raise RuntimeError(f"wrote {self.rows} rows to a PNG of height {self.height}")
+        self._file.write(_png_chunk(b"IDAT", self._pending + self._compressor.flush()))
+        self._file.write(_png_chunk(b"IEND", b""))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def stream_maze(path, width, height, seed=None):
+    """
+    Generate a width x height maze straight into a file, one row at a time.
+
+    A .png path gets a layout image in the game palette that get_maze
+    reads, anything else a binary maze file (see maze_format).
+
+    Returns:
+        int: number of rows written.
+    """
+    rows = eller_rows(width, height, seed)
+    if path.lower().endswith(".png"):
+        with PngRowWriter(path, width, height) as writer:
+            for row in rows:
+                # game codes: a path is 0, a wall is 1
+                writer.write_row(1 - row)
+        return writer.rows
+
+    with MazeWriter(path, width, np.uint8, PALETTE_BINARY) as writer:
+        for row in rows:
+            writer.write_row(row)
+    return writer.height
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream a tall maze into a maze file or PNG.")
+    parser.add_argument("output", help="output file, .png for a layout image")
+    parser.add_argument("--width", type=int, default=25)
+    parser.add_argument("--height", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    rows = stream_maze(args.output, args.width, args.height, args.seed)
+    elapsed = time.perf_counter() - start
+    print(f"{rows} rows of {args.width} cells written to {args.output} in {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+
+from loader import BLOCKING_CODES, get_maze_array
+
+SPAWN = -2
+GOAL = -1
+# entities checked for reachability from the spawn, by cell code
+ENTITY_NAMES = {-2: "spawn", -1: "goal", 6: "checkpoint", 4: "gate", 5: "gate"}
+
+
+def label_components(passable):
+    """
+    Label the 4-connected components of a boolean grid.
+
+    Every passable cell is labelled with the smallest flat index in its
+    component, blocked cells get -1. Each round hooks the larger root of
+    every edge under the smaller one and then pointer-jumps until every
+    cell points at a root, so the work is a handful of array operations
+    per round and the round count grows with log of the component size.
+
+    Args:
+        passable (np.ndarray): 2D bool array.
+
+    Returns:
+        np.ndarray: int64 labels with the shape of passable.
+    """
+    passable = np.asarray(passable, dtype=bool)
+    height, width = passable.shape
+    cells = np.arange(height * width).reshape(height, width)
+
+    right = passable[:, :-1] & passable[:, 1:]
+    down = passable[:-1] & passable[1:]
+    a = np.concatenate([cells[:, :-1][right], cells[:-1][down]])
+    b = np.concatenate([cells[:, 1:][right], cells[1:][down]])
+
+    parent = cells.ravel().copy()
+    while True:
+        pa = parent[a]
+        pb = parent[b]
+        split = pa != pb
+        if not split.any():
+            break
+        a, b, pa, pb = a[split], b[split], pa[split], pb[split]
+        np.minimum.at(parent, np.maximum(pa, pb), np.minimum(pa, pb))
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+
+    return np.where(passable.ravel(), parent, -1).reshape(height, width)
+
+
+def connectivity_report(grid):
+    """
+    Check which spawns, checkpoints, gates and goals the spawn can reach.
+
+    Walls (1) and turrets (2) block, every other cell is walkable, the same
+    rule Simulation.step moves by. The spawn and the goal are the ones the game
+    plays, the last of each in row-major order as in Simulation.restart.
+
+    Args:
+        grid (np.ndarray): 2D grid of loader.PALETTE cell codes.
+
+    Returns:
+        dict:
+            solvable (bool): the goal is reachable from the spawn.
+            components (int): number of walkable components.
+            entities (list): (name, (row, col), reachable) for every spawn,
+                goal, checkpoint and gate, reachable meaning connected to
+                the spawn.
+    """
+    grid = np.asarray(grid)
+    labels = label_components(~np.isin(grid, BLOCKING_CODES))
+
+    cells = np.argwhere(np.isin(grid, list(ENTITY_NAMES)))
+    codes = grid[cells[:, 0], cells[:, 1]]
+    entity_labels = labels[cells[:, 0], cells[:, 1]]
+
+    spawn_labels = entity_labels[codes == SPAWN]
+    goal_labels = entity_labels[codes == GOAL]
+    start = spawn_labels[-1] if len(spawn_labels) else -2
+    reachable = entity_labels == start
+
+    return {
+        "solvable": bool(len(goal_labels) and goal_labels[-1] == start),
+        "components": int(np.count_nonzero(np.unique(labels) >= 0)),
+        "entities": [(ENTITY_NAMES[int(code)], (int(r), int(c)), bool(ok))
+                     for code, (r, c), ok in zip(codes, cells, reachable)],
+    }
+
+
+def verify_maze(grid):
+    """Raise RuntimeError if the spawn can't reach the goal, naming every unreachable entity."""
+    report = connectivity_report(grid)
+    if not report["solvable"]:
+        missing = ", ".join(f"{name} {pos}" for name, pos, ok in report["entities"] if not ok)
+        raise RuntimeError(f"maze is not solvable, unreachable from the spawn: {missing or 'no spawn or goal'}")
+    return report
+
+
+def path_connected(passable, start, end):
+    """True if the start and end cells of a boolean grid are in the same component."""
+    labels = label_components(passable)
+    return labels[start] >= 0 and labels[start] == labels[end]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify that maze layouts are solvable.")
+    parser.add_argument("paths", nargs="+", help="layout images or directories of them")
+    args = parser.parse_args(argv)
+
+    paths = []
+    for path in args.paths:
+        paths += sorted(glob.glob(os.path.join(path, "*.png"))) if os.path.isdir(path) else [path]
+
+    failed = 0
+    for path in paths:
+        grid = get_maze_array(path)
+        start = time.perf_counter()
+        report = connectivity_report(grid)
+        elapsed = time.perf_counter() - start
+
+        status = "ok" if report["solvable"] else "UNSOLVABLE"
+        failed += not report["solvable"]
+        print(f"{path}: {status}, {report['components']} component(s), {elapsed * 1000:.2f} ms")
+        for name, pos, ok in report["entities"]:
+            if not ok:
+                print(f"    {name} at {pos} is unreachable from the spawn")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
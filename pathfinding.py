@@ -0,0 +1,352 @@
+import heapq
+from collections import defaultdict
+
+import numpy as np
+
+from distance_field import MOVES, NO_MOVE, DistanceField
+from loader import BLOCKING_CODES
+from turret_hazard import HazardMap
+
+
+class GridGraph:
+    """
+    A layout padded with a blocked border and flattened, shared by the searches.
+
+    Cells are flat indices into the padded grid, neighbours are cell +/- 1
+    and cell +/- pitch, so no search needs bounds checks. Coordinates in
+    the public functions are game (x, y) cells, x the column and y the row.
+    """
+
+    def __init__(self, grid, weights=None):
+        grid = np.asarray(grid)
+        self.height, self.width = grid.shape
+        self.pitch = self.width + 2
+        self.open = bytearray(np.pad(~np.isin(grid, BLOCKING_CODES), 1).astype(np.uint8).tobytes())
+        self.cost = None if weights is None else np.pad(weights, 1).ravel().tolist()
+        self._jump_tables = None
+
+    def index(self, cell):
+        x, y = int(cell[0]), int(cell[1])
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        return (y + 1) * self.pitch + x + 1
+
+    def cell(self, index):
+        y, x = divmod(index, self.pitch)
+        return (x - 1, y - 1)
+
+    def walkable(self, cell):
+        index = self.index(cell)
+        return index is not None and bool(self.open[index])
+
+    def jump_tables(self):
+        if self._jump_tables is None:
+            self._jump_tables = JumpTables(np.frombuffer(self.open, dtype=bool).reshape(self.height + 2, self.pitch))
+        return self._jump_tables
+
+
+class JumpTables:
+    """
+    Where a straight jump from any cell stops, for 4-connected jump point search.
+
+    A jump stops on a wall or on a jump point: a cell with a forced
+    neighbour (an open side cell whose counterpart one step back is
+    blocked) or, when moving vertically, a cell that a horizontal jump
+    leaves from. Stops are flagged in bytearrays, row-major for horizontal
+    and column-major for vertical jumps, so a jump is one find/rfind call.
+    """
+
+    def __init__(self, open_cells):
+        p = open_cells
+        shut = ~p
+        up, down = np.roll(p, 1, axis=0), np.roll(p, -1, axis=0)
+        left, right = np.roll(p, 1, axis=1), np.roll(p, -1, axis=1)
+
+        # forced neighbours when arriving with a step right / left / down / up
+        forced_right = p & ((up & ~np.roll(up, 1, axis=1)) | (down & ~np.roll(down, 1, axis=1)))
+        forced_left = p & ((up & ~np.roll(up, -1, axis=1)) | (down & ~np.roll(down, -1, axis=1)))
+        forced_down = p & ((left & ~np.roll(left, 1, axis=0)) | (right & ~np.roll(right, 1, axis=0)))
+        forced_up = p & ((left & ~np.roll(left, -1, axis=0)) | (right & ~np.roll(right, -1, axis=0)))
+
+        stop_right = shut | forced_right
+        stop_left = shut | forced_left
+        self.stop_right = bytearray(stop_right.astype(np.uint8).tobytes())
+        self.stop_left = bytearray(stop_left.astype(np.uint8).tobytes())
+
+        # does a horizontal jump from the cell find a jump point before a wall
+        cols = np.arange(p.shape[1])
+        next_right = np.minimum.accumulate(np.where(stop_right, cols, p.shape[1] - 1)[:, ::-1], axis=1)[:, ::-1]
+        next_right = np.concatenate([next_right[:, 1:], next_right[:, -1:]], axis=1)
+        last_left = np.maximum.accumulate(np.where(stop_left, cols, 0), axis=1)
+        last_left = np.concatenate([last_left[:, :1], last_left[:, :-1]], axis=1)
+        rows = np.arange(p.shape[0])[:, None]
+        branches = p & (p[rows, next_right] | p[rows, last_left])
+
+        self.stop_down = bytearray((shut | forced_down | branches).T.astype(np.uint8).tobytes())
+        self.stop_up = bytearray((shut | forced_up | branches).T.astype(np.uint8).tobytes())
+
+        # cells share a run when no wall lies between them in their row
+        self.run = np.maximum.accumulate(np.where(shut, cols, 0), axis=1).ravel().tolist()
+
+
+def turret_coverage(grid):
+    """
+    Count the turret firing lines over every cell, see turret_hazard.HazardMap.
+
+    Returns:
+        np.ndarray: int32 array with the shape of grid.
+    """
+    return HazardMap(grid).coverage
+
+
+def turret_weights(grid, penalty=10):
+    """Move costs of 1 per cell plus penalty for every firing line over the cell."""
+    return 1 + penalty * turret_coverage(grid)
+
+
+def _path_from(graph, came_from, end):
+    path = [end]
+    while came_from[path[-1]] >= 0:
+        path.append(came_from[path[-1]])
+    path.reverse()
+    return [graph.cell(i) for i in path]
+
+
+def astar(grid, start, goal, weights=None):
+    """
+    Shortest 4-connected path between two cells with A*.
+
+    Args:
+        grid: 2D grid of cell codes, walls and turrets block.
+        start (tuple): (x, y) start cell.
+        goal (tuple): (x, y) goal cell.
+        weights (np.ndarray): optional per-cell cost of stepping onto a cell,
+            at least 1, e.g. turret_weights(grid). Defaults to 1 everywhere.
+            A GridGraph carries its own weights, see GridGraph(grid, weights).
+
+    Returns:
+        list: (x, y) cells from start to goal, None if there is no path.
+
+    The search costs what the cells it expands cost, on a 2048x2048
+    perfect maze that is around 600k cells for a 200k cell path and more
+    than a second; answer many queries to one goal with find_paths.
+    """
+    if isinstance(grid, GridGraph):
+        if weights is not None:
+            raise RuntimeError("a GridGraph has its own weights, build it with GridGraph(grid, weights)")
+        return _astar(grid, start, goal)
+    return _astar(GridGraph(grid, weights), start, goal)
+
+
+def _astar(graph, start, goal):
+    source, target = graph.index(start), graph.index(goal)
+    if source is None or target is None or not (graph.open[source] and graph.open[target]):
+        return None
+
+    pitch, open_cells, cost = graph.pitch, graph.open, graph.cost
+    gy, gx = divmod(target, pitch)
+    best = {source: 0}
+    came_from = {source: -1}
+    # ties on f go to the node closest to the goal
+    heap = [(0, 0, 0, source)]
+    offsets = (1, -1, pitch, -pitch)
+
+    while heap:
+        _, _, g, node = heapq.heappop(heap)
+        if node == target:
+            break
+        if g > best[node]:
+            continue
+        for offset in offsets:
+            nxt = node + offset
+            if not open_cells[nxt]:
+                continue
+            ng = g + (1 if cost is None else cost[nxt])
+            if ng < best.get(nxt, ng + 1):
+                best[nxt] = ng
+                came_from[nxt] = node
+                y, x = divmod(nxt, pitch)
+                h = abs(y - gy) + abs(x - gx)
+                heapq.heappush(heap, (ng + h, h, ng, nxt))
+    else:
+        return None
+
+    return _path_from(graph, came_from, target)
+
+
+def _jump(graph, node, step, target):
+    """Jump from node in step to the next jump point, None if a wall comes first."""
+    tables = graph.jump_tables()
+    pitch = graph.pitch
+
+    if step == 1:
+        stop = tables.stop_right.find(1, node + 1)
+        if node < target <= stop:
+            return target
+    elif step == -1:
+        stop = tables.stop_left.rfind(1, 0, node)
+        if stop <= target < node:
+            return target
+    else:
+        # vertical runs are searched in the column-major tables
+        rows = graph.height + 2
+        y, x = divmod(node, pitch)
+        ty, tx = divmod(target, pitch)
+        if step > 0:
+            stop_y = tables.stop_down.find(1, x * rows + y + 1) - x * rows
+            crossed = y < ty < stop_y
+        else:
+            stop_y = tables.stop_up.rfind(1, 0, x * rows + y) - x * rows
+            crossed = stop_y < ty < y
+        # passing the goal's row in the goal's run, turning here reaches it
+        if crossed and tables.run[ty * pitch + x] == tables.run[target] and graph.open[ty * pitch + x]:
+            return ty * pitch + x
+        stop = stop_y * pitch + x
+
+    return stop if graph.open[stop] else None
+
+
+def jump_point_search(grid, start, goal):
+    """
+    Shortest 4-connected path with jump point search, for uniform move costs.
+
+    Straight runs through open areas are skipped over in one jump, only
+    cells where the path may have to turn are pushed on the heap. Jumps
+    look up the next stop in tables precomputed for the layout, see
+    GridGraph.jump_tables.
+
+    Returns:
+        list: (x, y) cells from start to goal, None if there is no path.
+    """
+    graph = grid if isinstance(grid, GridGraph) else GridGraph(grid)
+    source, target = graph.index(start), graph.index(goal)
+    if source is None or target is None or not (graph.open[source] and graph.open[target]):
+        return None
+
+    pitch = graph.pitch
+    gy, gx = divmod(target, pitch)
+    best = {source: 0}
+    came_from = {source: -1}
+    heap = [(0, 0, 0, source)]
+
+    while heap:
+        _, _, g, node = heapq.heappop(heap)
+        if node == target:
+            break
+        if g > best[node]:
+            continue
+
+        parent = came_from[node]
+        if parent < 0:
+            steps = (1, -1, pitch, -pitch)
+        elif abs(node - parent) < pitch:
+            # moving horizontally: keep going or turn off the run
+            step = 1 if node > parent else -1
+            steps = (step, pitch, -pitch)
+        else:
+            step = pitch if node > parent else -pitch
+            steps = (step, 1, -1)
+
+        for step in steps:
+            jump = _jump(graph, node, step, target)
+            if jump is None:
+                continue
+            jy, jx = divmod(jump, pitch)
+            ny, nx = divmod(node, pitch)
+            ng = g + abs(jy - ny) + abs(jx - nx)
+            if ng < best.get(jump, ng + 1):
+                best[jump] = ng
+                came_from[jump] = node
+                h = abs(jy - gy) + abs(jx - gx)
+                heapq.heappush(heap, (ng + h, h, ng, jump))
+    else:
+        return None
+
+    # fill in the straight runs between jump points
+    points = _path_from(graph, came_from, target)
+    path = points[:1]
+    for x, y in points[1:]:
+        px, py = path[-1]
+        dx, dy = (x > px) - (x < px), (y > py) - (y < py)
+        path.extend((px + dx * k, py + dy * k) for k in range(1, abs(x - px) + abs(y - py) + 1))
+    return path
+
+
+def _weighted_field(graph, target):
+    """Dijkstra out from the target, returns the flat list of next cells towards it."""
+    pitch, open_cells, cost = graph.pitch, graph.open, graph.cost
+    best = [float("inf")] * len(open_cells)
+    towards = [-1] * len(open_cells)
+    best[target] = 0
+    heap = [(0, target)]
+    while heap:
+        g, node = heapq.heappop(heap)
+        if g > best[node]:
+            continue
+        for offset in (1, -1, pitch, -pitch):
+            nxt = node + offset
+            if open_cells[nxt]:
+                # stepping from nxt onto node costs node's weight
+                ng = g + cost[node]
+                if ng < best[nxt]:
+                    best[nxt] = ng
+                    towards[nxt] = node
+                    heapq.heappush(heap, (ng, nxt))
+    return towards
+
+
+def find_paths(grid, pairs, weights=None):
+    """
+    Answer many (start, goal) path queries against one layout.
+
+    Queries are grouped by goal. A goal asked about once is answered with
+    A*, a goal shared by several starts gets one search outwards from the
+    goal (a DistanceField, or Dijkstra when weighted) that every start then
+    walks down.
+
+    Args:
+        grid: 2D grid of cell codes.
+        pairs (list): ((x, y) start, (x, y) goal) tuples.
+        weights (np.ndarray): optional per-cell costs, see astar.
+
+    Returns:
+        list: one path (list of (x, y) cells) or None per pair, in order.
+    """
+    graph = GridGraph(grid, weights)
+    by_goal = defaultdict(list)
+    for i, (start, goal) in enumerate(pairs):
+        by_goal[tuple(goal)].append(i)
+
+    paths = [None] * len(pairs)
+    for goal, queries in by_goal.items():
+        if len(queries) == 1 or not graph.walkable(goal):
+            for i in queries:
+                paths[i] = _astar(graph, pairs[i][0], goal)
+            continue
+
+        if weights is None:
+            field = DistanceField(grid, goal)
+            for i in queries:
+                x, y = pairs[i][0]
+                if field.distance_from(x, y) < 0:
+                    continue
+                path = [(x, y)]
+                move = field.step[y, x]
+                while move != NO_MOVE:
+                    dx, dy = MOVES[move]
+                    x, y = x + dx, y + dy
+                    path.append((x, y))
+                    move = field.step[y, x]
+                paths[i] = path
+        else:
+            target = graph.index(goal)
+            towards = _weighted_field(graph, target)
+            for i in queries:
+                node = graph.index(pairs[i][0])
+                if node is None or not graph.open[node] or (towards[node] < 0 and node != target):
+                    continue
+                path = [node]
+                while path[-1] != target:
+                    path.append(towards[path[-1]])
+                paths[i] = [graph.cell(n) for n in path]
+    return paths
@@ -0,0 +1,264 @@
+import argparse
+import hashlib
+import time
+import zlib
+
+import numpy as np
+
+from distance_field import NO_MOVE
+from layout_cache import LayoutRegistry
+from simulation import MOVE_INTERVAL, SHOOT_INTERVAL, Simulation
+
+MAGIC = b"MZRP"
+FORMAT_VERSION = 3
+# a state hash per minute of play at 30 FPS
+HASH_INTERVAL = 1800
+
+BULLET_MODES = ("analytic", "pool")
+
+HEADER = np.dtype([
+    ("magic", "S4"),
+    ("format_version", "<u2"),
+    ("bullet_mode", "u1"),
+    ("checkpoint_goal", "u1"),
+    # raw bytes, an S16 field would drop trailing zero bytes
+    ("layout_hash", "u1", 16),
+    ("move_interval", "<u4"),
+    ("shoot_interval", "<u4"),
+    ("ticks", "<u8"),
+    ("n_inputs", "<u4"),
+    ("n_hashes", "<u4"),
+    # turrets with their own fire period and phase, 0 for global volleys
+    ("n_fire", "<u4"),
+])
+
+
+def layout_hash(grid):
+    """16 byte digest of a grid's shape and cell codes, what a recording was played on."""
+    grid = np.ascontiguousarray(grid, dtype=np.int8)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.array(grid.shape, dtype="<u8").tobytes())
+    digest.update(grid.tobytes())
+    return digest.digest()
+
+
+def state_hash(sim):
+    """
+    64 bit digest of what a Simulation's future depends on: tick, player,
+    respawn point, goal, checkpoint, turret clock and the cell of every bullet.
+    """
+    checkpoint = -1 if sim.active_checkpoint is None else sim.active_checkpoint
+    goal = (-1, -1) if sim.goal is None else sim.goal
+    clock = -1 if sim.cadence is None else sim.cadence.tick
+    state = np.array([sim.tick, sim.x, sim.y, *sim.spawn, *goal, checkpoint, clock], dtype="<i8")
+    # the bullet models keep bullets in different orders, hash them sorted by cell
+    bullets = sim.bullet_positions()
+    bullets = bullets[np.lexsort((bullets[:, 1], bullets[:, 0]))].astype("<i8")
+    return int.from_bytes(hashlib.blake2b(state.tobytes() + bullets.tobytes(), digest_size=8).digest(), "little")
+
+
+class Recording:
+    """
+    The inputs of one session on one layout, with state hashes to check a replay against.
+
+    Only the ticks with an input are stored, a player idles most of the
+    time. The rules have no random choices, the layout and the inputs
+    fully determine a session, so there is no seed to keep. Attributes
+    are the HEADER fields plus:
+        input_ticks (np.ndarray): uint64 ticks of the inputs, increasing.
+        actions (np.ndarray): int8 indices into distance_field.MOVES.
+        hash_ticks (np.ndarray): uint64 ticks of the state hashes.
+        hashes (np.ndarray): uint64 state_hash values after those ticks.
+        fire_periods (np.ndarray): uint32 fire period of every turret when
+            the session ran with a Simulation fire_cadence, empty when the
+            turrets fired global volleys.
+        fire_phases (np.ndarray): uint32 fire phase of every turret.
+    """
+
+    def __init__(self, layout_hash, bullet_mode="analytic", move_interval=MOVE_INTERVAL,
+                 shoot_interval=SHOOT_INTERVAL, checkpoint_goal=False, ticks=0, input_ticks=(), actions=(),
+                 hash_ticks=(), hashes=(), fire_periods=(), fire_phases=()):
+        self.layout_hash = layout_hash
+        self.bullet_mode = bullet_mode
+        self.move_interval = move_interval
+        self.shoot_interval = shoot_interval
+        self.checkpoint_goal = checkpoint_goal
+        self.ticks = ticks
+        self.input_ticks = np.asarray(input_ticks, dtype=np.uint64)
+        self.actions = np.asarray(actions, dtype=np.int8)
+        self.hash_ticks = np.asarray(hash_ticks, dtype=np.uint64)
+        self.hashes = np.asarray(hashes, dtype=np.uint64)
+        self.fire_periods = np.asarray(fire_periods, dtype=np.uint32)
+        self.fire_phases = np.asarray(fire_phases, dtype=np.uint32)
+
+    def save(self, path):
+        """
+        Write the recording: a HEADER, then the zlib compressed input tick
+        deltas, actions, hash ticks, hashes, fire periods and fire phases.
+        """
+        header = np.array([(MAGIC, FORMAT_VERSION, BULLET_MODES.index(self.bullet_mode), self.checkpoint_goal,
+                            np.frombuffer(self.layout_hash, dtype=np.uint8), self.move_interval, self.shoot_interval, self.ticks,
+                            len(self.actions), len(self.hashes), len(self.fire_periods))], dtype=HEADER)
+        # tick deltas are small and repetitive, they compress far better than the ticks
+        deltas = np.diff(self.input_ticks, prepend=np.uint64(0)).astype("<u4")
+        payload = b"".join([deltas.tobytes(), self.actions.tobytes(),
+                            self.hash_ticks.astype("<u8").tobytes(), self.hashes.astype("<u8").tobytes(),
+                            self.fire_periods.astype("<u4").tobytes(), self.fire_phases.astype("<u4").tobytes()])
+        with open(path, "wb") as f:
+            f.write(header.tobytes())
+            f.write(zlib.compress(payload, 9))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a recording written by save.
+
+        Raises:
+            RuntimeError: if the file is not a recording of this format version.
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        header = np.frombuffer(data, dtype=HEADER, count=1) if len(data) >= HEADER.itemsize else ()
+        if len(header) == 0 or header[0]["magic"] != MAGIC:
+            raise RuntimeError(f"not a recording: {path}")
+        header = header[0]
+        if header["format_version"] != FORMAT_VERSION:
+            raise RuntimeError(f"unsupported recording version {header['format_version']}: {path}")
+
+        payload = zlib.decompress(data[HEADER.itemsize:])
+        n_inputs, n_hashes, n_fire = int(header["n_inputs"]), int(header["n_hashes"]), int(header["n_fire"])
+        deltas = np.frombuffer(payload, dtype="<u4", count=n_inputs)
+        offset = deltas.nbytes
+        actions = np.frombuffer(payload, dtype=np.int8, count=n_inputs, offset=offset)
+        offset += actions.nbytes
+        hash_ticks = np.frombuffer(payload, dtype="<u8", count=n_hashes, offset=offset)
+        offset += hash_ticks.nbytes
+        hashes = np.frombuffer(payload, dtype="<u8", count=n_hashes, offset=offset)
+        offset += hashes.nbytes
+        fire_periods = np.frombuffer(payload, dtype="<u4", count=n_fire, offset=offset)
+        fire_phases = np.frombuffer(payload, dtype="<u4", count=n_fire, offset=offset + fire_periods.nbytes)
+        return cls(header["layout_hash"].tobytes(), BULLET_MODES[header["bullet_mode"]],
+                   int(header["move_interval"]), int(header["shoot_interval"]), bool(header["checkpoint_goal"]),
+                   int(header["ticks"]), np.cumsum(deltas, dtype=np.uint64), actions, hash_ticks, hashes,
+                   fire_periods, fire_phases)
+
+
+class SessionRecorder:
+    """
+    Step a Simulation and record its inputs.
+
+    Drop-in for the Simulation.step calls of a game loop: the inputs are
+    kept as (tick, action) pairs and every hash_interval ticks a
+    state_hash is taken, for replay to check it reproduces the session.
+    """
+
+    def __init__(self, sim, hash_interval=HASH_INTERVAL):
+        """
+        Args:
+            sim (Simulation): a simulation at tick 0 of its layout.
+            hash_interval (int): ticks between state hashes.
+        """
+        self.sim = sim
+        self.hash_interval = hash_interval
+        self.input_ticks = []
+        self.actions = []
+        self.hash_ticks = []
+        self.hashes = []
+
+    def step(self, action=NO_MOVE):
+        """Simulation.step, recording the action."""
+        state = self.sim.step(action)
+        if action != NO_MOVE:
+            self.input_ticks.append(self.sim.tick)
+            self.actions.append(action)
+        if self.sim.tick % self.hash_interval == 0:
+            self._hash()
+        return state
+
+    def _hash(self):
+        self.hash_ticks.append(self.sim.tick)
+        self.hashes.append(state_hash(self.sim))
+
+    def recording(self):
+        """The Recording of the session so far, ending with the hash of the current state."""
+        if not self.hash_ticks or self.hash_ticks[-1] != self.sim.tick:
+            self._hash()
+        sim = self.sim
+        periods = phases = ()
+        if sim.fire_cadence is not None:
+            # what TurretCadence is built from, phases only matter modulo the period
+            periods, phases = sim.fire_cadence(sim.layout.turrets)
+            periods = np.atleast_1d(np.asarray(periods))
+            phases = np.broadcast_to(phases, periods.shape) % periods
+        return Recording(layout_hash(sim.grid), sim.bullet_mode, sim.move_interval, sim.shoot_interval,
+                         sim.checkpoint_goal, sim.tick, self.input_ticks, self.actions, self.hash_ticks, self.hashes,
+                         periods, phases)
+
+    def save(self, path):
+        self.recording().save(path)
+
+
+def replay(recording, grid):
+    """
+    Re-run a recorded session as fast as possible and check it against the recording.
+
+    Ticks without an input or a state hash are fast forwarded with
+    Simulation.idle, so the cost follows the inputs and bullet events
+    rather than the length of the session. A session played with a
+    Simulation fire_cadence replays with the recorded turret periods and
+    phases.
+
+    Args:
+        recording (Recording): the session.
+        grid (np.ndarray): the layout it was played on.
+
+    Returns:
+        Simulation: the simulation at the last recorded tick.
+
+    Raises:
+        RuntimeError: if grid is not the recorded layout, or a state hash
+            differs, which names the first tick that did.
+    """
+    if layout_hash(grid) != recording.layout_hash:
+        raise RuntimeError("the layout differs from the one the session was recorded on")
+    fire_cadence = None
+    if len(recording.fire_periods):
+        def fire_cadence(turrets):
+            return recording.fire_periods.astype(np.int64), recording.fire_phases.astype(np.int64)
+    sim = Simulation(grid, recording.bullet_mode, recording.move_interval, recording.shoot_interval,
+                     recording.checkpoint_goal, fire_cadence)
+    actions = dict(zip(recording.input_ticks.tolist(), recording.actions.tolist()))
+    hashes = dict(zip(recording.hash_ticks.tolist(), recording.hashes.tolist()))
+
+    for tick in sorted(actions.keys() | hashes.keys()):
+        sim.idle(tick - 1 - sim.tick)
+        sim.step(actions.get(tick, NO_MOVE))
+        if tick in hashes and state_hash(sim) != hashes[tick]:
+            raise RuntimeError(f"replay diverged from the recording at tick {tick}")
+    sim.idle(recording.ticks - sim.tick)
+    return sim
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded session headless and check it.")
+    parser.add_argument("recording")
+    parser.add_argument("layouts", nargs="*", default=["maze_hard_v1.png"],
+                        help="layout images the session may have been played on, plain or reflected")
+    args = parser.parse_args()
+
+    recording = Recording.load(args.recording)
+    for entry in LayoutRegistry(args.layouts):
+        for reflect in (False, True):
+            grid = entry.load(reflect=reflect)
+            if layout_hash(grid) == recording.layout_hash:
+                start = time.perf_counter()
+                sim = replay(recording, grid)
+                elapsed = time.perf_counter() - start
+                print(f"{recording.ticks} ticks, {len(recording.actions)} inputs replayed in {elapsed:.3f} s, "
+                      f"{len(recording.hashes)} state hashes match, player at {(sim.x, sim.y)}")
+                return
+    raise RuntimeError("none of the layouts is the one the session was recorded on")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import sys
+from collections import deque
+
+import numpy as np
+import pygame
+
+from distance_field import NO_MOVE
+from layout_cache import LayoutRegistry
+from replay import SessionRecorder
+from simulation import Simulation
+from tick_scheduler import TICK_RATE, FixedTimestep
+
+FPS = 30
+SCREEN_WIDTH = 800
+SCREEN_HEIGHT = 800
+
+PATH_COLOR = (255, 255, 255)
+WALL_COLOR = (0, 0, 0)
+TURRET_COLOR = (128, 0, 128)
+GATE_COLOR = (200, 200, 200)
+CHECKPOINT_COLOR = (255, 165, 0)
+ACTIVE_CHECKPOINT_COLOR = (0, 200, 0)
+END_POINT_COLOR = (255, 0, 0)
+PLAYER_COLOR = (0, 0, 255)
+BULLET_COLOR = (204, 204, 0)
+
+# cell code + 2 -> background color
+CELL_COLORS = np.array([
+    PATH_COLOR,        # -2 spawn
+    END_POINT_COLOR,   # -1 goal
+    PATH_COLOR,        # 0 path
+    WALL_COLOR,        # 1 wall
+    TURRET_COLOR,      # 2 turret
+    PATH_COLOR,        # 3 unused
+    GATE_COLOR,        # 4 gate
+    GATE_COLOR,        # 5 gate
+    CHECKPOINT_COLOR,  # 6 checkpoint
+], dtype=np.uint8)
+
+# WASD -> index into distance_field.MOVES (down, up, right, left)
+KEY_ACTIONS = {pygame.K_s: 0, pygame.K_w: 1, pygame.K_d: 2, pygame.K_a: 3}
+
+LAYOUTS = LayoutRegistry(['maze_hard_v1.png'])
+
+
+def cell_size_for(grid):
+    # layouts wider than the screen get one pixel per cell, the rest is clipped
+    return max(1, SCREEN_WIDTH // grid.shape[1])
+
+
+def layout_surface(grid, cell_size):
+    """Render the static cells of a layout once, as a surface to blit every frame."""
+    colors = CELL_COLORS[np.asarray(grid, dtype=np.intp) + 2]
+    surface = pygame.surfarray.make_surface(np.ascontiguousarray(colors.transpose(1, 0, 2)))
+    return pygame.transform.scale(surface, (grid.shape[1] * cell_size, grid.shape[0] * cell_size))
+
+
+def draw(screen, sim, background, cell_size, previous=None, alpha=1.0):
+    """
+    Draw a Simulation: the layout, the active checkpoint, the goal, bullets and the player.
+
+    The player is drawn alpha of the way from previous, its cell on the
+    tick before, to its current cell, so moves look smooth at any frame
+    rate. Jumps of more than one cell, respawns, are not interpolated.
+    """
+    screen.blit(background, (0, 0))
+    if sim.active_checkpoint is not None:
+        y, x = sim.layout.checkpoints[sim.active_checkpoint].tolist()
+        pygame.draw.rect(screen, ACTIVE_CHECKPOINT_COLOR, (x * cell_size, y * cell_size, cell_size, cell_size))
+    if sim.goal is not None:
+        x, y = sim.goal
+        pygame.draw.rect(screen, END_POINT_COLOR, (x * cell_size, y * cell_size, cell_size, cell_size))
+    for x, y in sim.bullet_positions().tolist():
+        pygame.draw.rect(screen, BULLET_COLOR, (x * cell_size, y * cell_size, cell_size - 10, cell_size - 10))
+
+    x, y = sim.x, sim.y
+    if previous is not None and abs(x - previous[0]) + abs(y - previous[1]) == 1:
+        x = previous[0] + (x - previous[0]) * alpha
+        y = previous[1] + (y - previous[1]) * alpha
+    pygame.draw.rect(screen, PLAYER_COLOR, (round(x * cell_size), round(y * cell_size), cell_size - 2, cell_size - 2))
+
+
+def main(record=None, fps=FPS):
+    """
+    Play the layouts in turn.
+
+    The simulation runs at TICK_RATE ticks per second whatever fps the
+    screen is drawn at, key presses are queued and applied one per tick,
+    so a sequence of inputs gives the same game at any frame rate.
+
+    Args:
+        record (str): optional path prefix, each round's inputs are saved
+            to <record>-<round>.mzr for replay.py.
+        fps (int): frame rate of the rendering.
+    """
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption('Maze')
+    clock = pygame.time.Clock()
+    timestep = FixedTimestep(TICK_RATE)
+
+    layouts = [LAYOUTS[0].compiled(), LAYOUTS[0].compiled(reflect=True)]
+    round_ = 0
+    sim = Simulation(layouts[0], checkpoint_goal=True)
+    recorder = SessionRecorder(sim) if record else None
+    cell_size = cell_size_for(sim.grid)
+    background = layout_surface(sim.grid, cell_size)
+    actions = deque()
+    previous = (sim.x, sim.y)
+
+    clock.tick()
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                if recorder:
+                    recorder.save(f"{record}-{round_}.mzr")
+                pygame.quit()
+                sys.exit()
+            if event.type == pygame.KEYDOWN and event.key in KEY_ACTIONS:
+                actions.append(KEY_ACTIONS[event.key])
+
+        for _ in range(timestep.advance(clock.tick(fps))):
+            previous = (sim.x, sim.y)
+            action = actions.popleft() if actions else NO_MOVE
+            state = recorder.step(action) if recorder else sim.step(action)
+            if state["won"]:
+                if recorder:
+                    recorder.save(f"{record}-{round_}.mzr")
+                round_ += 1
+                sim.load(layouts[round_ % len(layouts)])
+                if recorder:
+                    recorder = SessionRecorder(sim)
+                cell_size = cell_size_for(sim.grid)
+                background = layout_surface(sim.grid, cell_size)
+                previous = (sim.x, sim.y)
+
+        draw(screen, sim, background, cell_size, previous, timestep.alpha)
+        pygame.display.flip()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else None, int(sys.argv[2]) if len(sys.argv) > 2 else FPS)
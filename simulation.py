@@ -0,0 +1,235 @@
+import numpy as np
+
+from bullet_model import BulletPool, VolleyBullets
+from distance_field import MOVES, NO_MOVE
+from layout_cache import CompiledLayout
+from loader import BLOCKS_PLAYER
+from tick_scheduler import TickScheduler, TurretCadence
+from turret_hazard import HazardMap
+
+# the game's pygame timers at 30 FPS: bullets move every 500 ms, turrets fire every 5000 ms
+MOVE_INTERVAL = 15
+SHOOT_INTERVAL = 150
+
+
+def volley_fire(turrets, period=SHOOT_INTERVAL):
+    """
+    A fire_cadence for Simulation that fires every turret together every
+    period ticks, the same ticks as a global volley every shoot_interval.
+    """
+    return np.full(len(turrets), period), np.zeros(len(turrets), dtype=np.int64)
+
+
+def staggered_fire(turrets, period=SHOOT_INTERVAL):
+    """
+    A fire_cadence for Simulation: every turret fires every period ticks,
+    with phases spread evenly over the period in row-major order, so each
+    tick fires a share of the turrets instead of all of them at once.
+    """
+    return np.full(len(turrets), period), np.arange(len(turrets)) * period // max(len(turrets), 1)
+
+
+class Simulation:
+    """
+    The rules of the maze game on integer grid cells, with no pygame.
+
+    One step is one frame of the game loop: the player makes at most one
+    move, checkpoints are updated, every move_interval ticks the bullets
+    move and every shoot_interval ticks the turrets fire, and a player
+    on a bullet goes back to the spawn. Bullet movement and turret fire
+    are systems on a tick_scheduler.TickScheduler, whose clock is the
+    simulation's tick. Cells are (x, y), x the column and y the row,
+    actions index distance_field.MOVES or are NO_MOVE.
+    """
+
+    def __init__(self, grid, bullet_mode="analytic", move_interval=MOVE_INTERVAL,
+                 shoot_interval=SHOOT_INTERVAL, checkpoint_goal=False, fire_cadence=None):
+        """
+        Args:
+            grid (np.ndarray): 2D grid of loader.PALETTE cell codes with a
+                spawn (-2), the goal (-1) is optional.
+            bullet_mode (str): "analytic" for bullet_model.VolleyBullets or
+                "pool" for bullet_model.BulletPool.
+            move_interval (int): ticks between bullet moves.
+            shoot_interval (int): ticks between volleys.
+            checkpoint_goal (bool): a reached checkpoint also becomes the
+                goal, as in maze_processing.
+            fire_cadence: optional function of the (n, 2) turret (row, col)
+                positions of a layout returning (periods, phases), each turret
+                then fires on its own ticks through a tick_scheduler.TurretCadence
+                instead of all of them every shoot_interval ticks.
+        """
+        if bullet_mode not in ("analytic", "pool"):
+            raise RuntimeError(f"unknown bullet mode {bullet_mode!r}")
+        self.bullet_mode = bullet_mode
+        self.move_interval = move_interval
+        self.shoot_interval = shoot_interval
+        self.checkpoint_goal = checkpoint_goal
+        self.fire_cadence = fire_cadence
+        self.load(grid)
+
+    def load(self, grid):
+        """
+        Start over on a new layout, alongside Maze.swap_maze. A layout_cache.CompiledLayout
+        is used as it is, a grid of cell codes is compiled first.
+        """
+        layout = CompiledLayout.of(grid)
+        grid = layout.grid
+        if not len(layout.spawns):
+            raise RuntimeError("layout has no spawn")
+
+        self.grid = grid
+        self.layout = layout
+        self.height, self.width = grid.shape
+        self.blocked = layout.blocked.tobytes()
+        self.pitch = self.width + 2
+        # (x, y) cell -> index into layout.checkpoints
+        self.checkpoints = {(x, y): i for i, (y, x) in enumerate(layout.checkpoints.tolist())}
+
+        if self.bullet_mode == "analytic":
+            self.bullets = VolleyBullets(HazardMap(grid))
+        else:
+            self.bullets = BulletPool(grid)
+        self.restart()
+
+    def restart(self):
+        """Start the current layout over from tick 0, without compiling it again."""
+        # the last spawn and goal in row-major order win, as in Maze
+        y, x = self.layout.spawns[-1].tolist()
+        self.spawn = (x, y)
+        self.goal = None
+        if len(self.layout.end_points):
+            y, x = self.layout.end_points[-1].tolist()
+            self.goal = (x, y)
+        # the bullets keep their occupancy arrays, views of them stay valid
+        self.bullets.clear()
+        self.cadence = None
+        if self.fire_cadence is not None:
+            self.cadence = TurretCadence(*self.fire_cadence(self.layout.turrets))
+
+        # the rules that run on their own ticks, in the order they run within a tick
+        self.scheduler = TickScheduler()
+        self.scheduler.every(self.move_interval, self._move_bullets)
+        if self.cadence is not None:
+            self.scheduler.every(1, self._fire_due)
+        else:
+            self.scheduler.every(self.shoot_interval, self._fire_volley)
+        self._bullets_changed = False
+
+        self.x, self.y = self.spawn
+        self.active_checkpoint = None
+
+    @property
+    def tick(self):
+        """Ticks since the layout was loaded, the clock of the scheduler."""
+        return self.scheduler.tick
+
+    def _move_bullets(self):
+        self.bullets.step()
+        self._bullets_changed = True
+
+    def _fire_volley(self):
+        self.bullets.shoot()
+        self._bullets_changed = True
+
+    def _fire_due(self):
+        due = self.cadence.advance()
+        if len(due):
+            self.bullets.shoot(due)
+            self._bullets_changed = True
+
+    def _run_tick(self):
+        # the scheduled systems of the next tick, True if the bullets changed on it
+        self._bullets_changed = False
+        self.scheduler.run(1)
+        return self._bullets_changed
+
+    def step(self, action=NO_MOVE):
+        """
+        Advance one tick.
+
+        Args:
+            action (int): index into MOVES of the player's move, NO_MOVE to
+                stand still. Moves into walls, turrets or off the grid are
+                ignored.
+
+        Returns:
+            dict:
+                tick (int): ticks since the layout was loaded.
+                player (tuple): (x, y) cell of the player.
+                hit (bool): a bullet sent the player back to the spawn.
+                checkpoint (int): index of the checkpoint reached this
+                    tick, None if none was.
+                won (bool): the player is on the goal.
+        """
+        x, y = self.x, self.y
+        moved = False
+        if action != NO_MOVE:
+            dx, dy = MOVES[action]
+            if not self.blocked[(y + dy + 1) * self.pitch + x + dx + 1] & BLOCKS_PLAYER:
+                x += dx
+                y += dy
+                moved = True
+
+        checkpoint = None
+        if moved:
+            checkpoint = self.checkpoints.get((x, y))
+            if checkpoint is not None:
+                self.spawn = (x, y)
+                self.active_checkpoint = checkpoint
+                if self.checkpoint_goal:
+                    self.goal = (x, y)
+
+        # bullets only change on their own ticks, so a player who stands
+        # still on a tick without bullet events can't be hit
+        changed = self._run_tick()
+
+        hit = False
+        if (moved or changed) and self.bullets.bullet_at(x, y):
+            x, y = self.spawn
+            hit = True
+        self.x, self.y = x, y
+
+        return {
+            "tick": self.tick,
+            "player": (x, y),
+            "hit": hit,
+            "checkpoint": checkpoint,
+            "won": (x, y) == self.goal,
+        }
+
+    def idle(self, ticks):
+        """
+        Advance ticks ticks with the player standing still, as that many
+        step(NO_MOVE) calls would.
+
+        Only the ticks a scheduled system is due on can change anything,
+        so the others are skipped and the cost is per bullet event.
+
+        Returns:
+            int: number of times a bullet sent the player back.
+        """
+        end = self.tick + ticks
+        hits = 0
+        # with a fire_cadence the turrets' own timers are due every tick
+        while True:
+            due = self.scheduler.next_due()
+            if due is None or due > end:
+                break
+            self.scheduler.skip_to(due - 1)
+            if self._run_tick() and self.bullets.bullet_at(self.x, self.y):
+                self.x, self.y = self.spawn
+                hits += 1
+        self.scheduler.skip_to(end)
+        return hits
+
+    def run(self, actions):
+        """Step through a sequence of actions and return the last state."""
+        state = None
+        for action in actions:
+            state = self.step(action)
+        return state
+
+    def bullet_positions(self):
+        """(n, 2) int array of the (x, y) cell of every bullet."""
+        return self.bullets.positions()
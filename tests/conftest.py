@@ -0,0 +1,36 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# the modules live at the top of the repository, the game ones import pygame
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+# paths, walls, turrets, gates and checkpoints
+LAYOUT_CODES = (0, 1, 2, 4, 5, 6)
+LAYOUT_WEIGHTS = (.55, .15, .15, .05, .05, .05)
+
+
+@pytest.fixture
+def random_layouts():
+    """
+    Factory of random layouts for lockstep tests.
+
+    make(rng, count=1) returns (count, h, w) int8 grids of one random
+    shape, LAYOUT_CODES cells with a spawn each and a goal in most.
+    """
+    def make(rng, count=1, min_size=3, max_size=24):
+        height, width = rng.integers(min_size, max_size, 2)
+        grids = rng.choice(LAYOUT_CODES, size=(count, height, width), p=LAYOUT_WEIGHTS).astype(np.int8)
+        for grid in grids:
+            spawn = rng.integers(height), rng.integers(width)
+            goal = rng.integers(height), rng.integers(width)
+            grid[spawn] = -2
+            if rng.random() < 0.8 and goal != spawn:
+                grid[goal] = -1
+        return grids
+
+    return make
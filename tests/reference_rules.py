@@ -0,0 +1,132 @@
+"""
+The game's rules as the Turret, Bullet and Player classes of the game
+modules ran them before simulation.Simulation, on grid cells and without
+pygame, for lockstep tests of Simulation and bullet_model.
+
+Every turret keeps its own bullets and fires one into each neighbour a
+player could stand on, a bullet moves one cell per move and is dropped on
+a wall or off the grid, and the player can't step onto walls, turrets or
+off the grid. The checks read the grid cell by cell, no mask is shared
+with the code under test.
+"""
+from distance_field import MOVES, NO_MOVE
+from simulation import MOVE_INTERVAL, SHOOT_INTERVAL
+
+
+class Turret:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        # [x, y, dx, dy] per bullet
+        self.bullets = []
+
+    def shoot(self, grid):
+        height, width = len(grid), len(grid[0])
+        for dx, dy in MOVES:
+            x, y = self.x + dx, self.y + dy
+            if 0 <= x < width and 0 <= y < height and grid[y][x] not in (1, 2):
+                self.bullets.append([x, y, dx, dy])
+
+    def update_bullets(self, grid):
+        height, width = len(grid), len(grid[0])
+        for bullet in self.bullets[:]:
+            bullet[0] += bullet[2]
+            bullet[1] += bullet[3]
+            x, y = bullet[0], bullet[1]
+            if not (0 <= x < width and 0 <= y < height) or grid[y][x] == 1:
+                self.bullets.remove(bullet)
+
+
+class ReferenceRules:
+    """
+    Simulation.step's tick order on per-turret bullet lists: the move,
+    the checkpoint, every move_interval ticks the bullets, then the
+    turrets due, every shoot_interval ticks or on their fire_cadence
+    ticks, and last the hit check when the player moved or a bullet did.
+    """
+
+    def __init__(self, grid, move_interval=MOVE_INTERVAL, shoot_interval=SHOOT_INTERVAL,
+                 checkpoint_goal=False, fire_cadence=None):
+        self.grid = grid.tolist()
+        self.move_interval = move_interval
+        self.shoot_interval = shoot_interval
+        self.checkpoint_goal = checkpoint_goal
+        self.turrets = []
+        self.checkpoints = {}
+        self.spawn = self.goal = None
+        # row-major, so the last spawn and goal win
+        for y, row in enumerate(self.grid):
+            for x, cell in enumerate(row):
+                if cell == 2:
+                    self.turrets.append(Turret(x, y))
+                elif cell == 6:
+                    self.checkpoints[(x, y)] = len(self.checkpoints)
+                elif cell == -2:
+                    self.spawn = (x, y)
+                elif cell == -1:
+                    self.goal = (x, y)
+        self.periods = self.phases = None
+        if fire_cadence is not None:
+            cells = [(t.y, t.x) for t in self.turrets]
+            self.periods, self.phases = (list(map(int, a)) for a in fire_cadence(cells))
+        self.x, self.y = self.spawn
+        self.tick = 0
+
+    def shoot(self, turrets=None):
+        for i in range(len(self.turrets)) if turrets is None else turrets:
+            self.turrets[i].shoot(self.grid)
+
+    def move_bullets(self):
+        for turret in self.turrets:
+            turret.update_bullets(self.grid)
+
+    def bullet_cells(self):
+        """Sorted (x, y) cells of every bullet, one per bullet."""
+        return sorted((x, y) for turret in self.turrets for x, y, _, _ in turret.bullets)
+
+    def movable(self, dx, dy):
+        x, y = self.x + dx, self.y + dy
+        return 0 <= x < len(self.grid[0]) and 0 <= y < len(self.grid) and self.grid[y][x] not in (1, 2)
+
+    def step(self, action=NO_MOVE):
+        """One tick, returning the same dict as Simulation.step."""
+        self.tick += 1
+        moved = False
+        if action != NO_MOVE and self.movable(*MOVES[action]):
+            dx, dy = MOVES[action]
+            self.x += dx
+            self.y += dy
+            moved = True
+
+        checkpoint = None
+        if moved and (self.x, self.y) in self.checkpoints:
+            checkpoint = self.checkpoints[(self.x, self.y)]
+            self.spawn = (self.x, self.y)
+            if self.checkpoint_goal:
+                self.goal = self.spawn
+
+        changed = False
+        if self.tick % self.move_interval == 0:
+            self.move_bullets()
+            changed = True
+        if self.periods is None:
+            if self.tick % self.shoot_interval == 0:
+                self.shoot()
+                changed = True
+        else:
+            due = [i for i, (period, phase) in enumerate(zip(self.periods, self.phases))
+                   if self.tick % period == phase % period]
+            self.shoot(due)
+            changed = changed or bool(due)
+
+        hit = (moved or changed) and (self.x, self.y) in self.bullet_cells()
+        if hit:
+            self.x, self.y = self.spawn
+
+        return {
+            "tick": self.tick,
+            "player": (self.x, self.y),
+            "hit": hit,
+            "checkpoint": checkpoint,
+            "won": (self.x, self.y) == self.goal,
+        }
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from batch_simulation import BatchSimulation, simulate
+from distance_field import NO_MOVE
+from simulation import Simulation
+
+GAMES = 24
+TICKS = 300
+OPTIONS = {"move_interval": 2, "shoot_interval": 7}
+
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("checkpoint_goal", [False, True])
+def test_batch_matches_simulation(seed, checkpoint_goal, random_layouts):
+    """Every game of a BatchSimulation steps as its own Simulation does."""
+    rng = np.random.default_rng(seed)
+    grids = random_layouts(rng, GAMES)
+    batch = BatchSimulation(grids, checkpoint_goal=checkpoint_goal, **OPTIONS)
+    sims = [Simulation(grid, checkpoint_goal=checkpoint_goal, **OPTIONS) for grid in grids]
+
+    for tick in range(TICKS):
+        # a won game is done in the batch and ignores its actions
+        actions = np.where(batch.done, NO_MOVE, rng.integers(-1, 4, GAMES))
+        state = batch.step(actions)
+        occupancy = batch.occupancy()
+        for game, sim in enumerate(sims):
+            expected = sim.step(int(actions[game]))
+            assert expected["player"] == (state["x"][game], state["y"][game]), (tick, game)
+            assert expected["hit"] == state["hit"][game], (tick, game)
+            assert expected["won"] == state["won"][game], (tick, game)
+            checkpoint = -1 if expected["checkpoint"] is None else expected["checkpoint"]
+            assert checkpoint == state["checkpoint"][game], (tick, game)
+            assert (sorted(map(tuple, sim.bullet_positions().tolist()))
+                    == sorted(map(tuple, batch.bullet_positions(game).tolist()))), (tick, game)
+            np.testing.assert_array_equal(occupancy[game], sim.bullets.occupancy().grid > 0,
+                                          err_msg=f"tick {tick}, game {game}")
+
+
+def test_simulate_workers_match_serial(random_layouts):
+    """Splitting a batch across worker processes gives the serial results."""
+    rng = np.random.default_rng(0)
+    grids = random_layouts(rng, GAMES)
+    actions = rng.integers(-1, 4, (TICKS, GAMES))
+    serial = simulate(grids, actions, workers=1, **OPTIONS)
+    parallel = simulate(grids, actions, workers=2, **OPTIONS)
+    for key in serial:
+        np.testing.assert_array_equal(serial[key], parallel[key], err_msg=key)
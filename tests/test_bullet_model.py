@@ -0,0 +1,91 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from bullet_model import DENSE_CELLS, BulletPool, OccupancyGrid, VolleyBullets
+from reference_rules import ReferenceRules
+from turret_hazard import HazardMap
+
+TICKS = 300
+
+
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize("model", [lambda grid: VolleyBullets(HazardMap(grid)), BulletPool], ids=["analytic", "pool"])
+def test_models_match_turret_objects(model, seed, random_layouts):
+    """VolleyBullets and BulletPool move, stop and count bullets as the per-turret bullets of the reference do."""
+    rng = np.random.default_rng(seed)
+    grid = random_layouts(rng)[0]
+    reference = ReferenceRules(grid)
+    bullets = model(grid)
+    turrets = len(reference.turrets)
+
+    for tick in range(TICKS):
+        # global volleys and volleys of a few turrets, as a TurretCadence fires them
+        if tick % 20 == 0:
+            reference.shoot()
+            bullets.shoot()
+        elif turrets and rng.random() < 0.1:
+            some = np.flatnonzero(rng.random(turrets) < 0.3)
+            reference.shoot(some)
+            bullets.shoot(some)
+        reference.move_bullets()
+        bullets.step()
+
+        expected = reference.bullet_cells()
+        assert sorted(map(tuple, bullets.positions().tolist())) == expected, tick
+        counts = np.zeros(grid.shape, dtype=np.int32)
+        for x, y in expected:
+            counts[y, x] += 1
+        np.testing.assert_array_equal(bullets.occupancy().grid, counts, err_msg=f"tick {tick}")
+
+
+def test_pool_steps_after_bullets_die():
+    """Compaction keeps every field of the survivors, alive included, and later steps move them on."""
+    grid = np.zeros((5, 7), dtype=np.int8)
+    grid[2, 3] = 2
+    grid[2, 1] = 1
+    pool = BulletPool(grid)
+    pool.shoot()
+    assert len(pool) == 4
+
+    # the bullet fired left hits the wall, the ones fired up and down leave the grid a step later
+    pool.step()
+    assert len(pool) == 3
+    assert pool.alive[:len(pool)].all()
+    assert sorted(pool.positions().tolist()) == [[3, 0], [3, 4], [5, 2]]
+    pool.step()
+    assert len(pool) == 1
+    assert pool.alive[:len(pool)].all()
+    assert (pool.x[0], pool.y[0], pool.dx[0], pool.dy[0], pool.owner[0]) == (6, 2, 1, 0, 0)
+    pool.step()
+    assert len(pool) == 0
+
+
+@pytest.mark.parametrize("shape", [(7, 9), (300, 400)], ids=["dense", "sparse"])
+def test_occupancy_matches_counting(shape):
+    """Counts, hit tests and collisions are those of counting the bullets cell by cell, update after update."""
+    rng = np.random.default_rng(0)
+    height, width = shape
+    # past DENSE_CELLS only the occupied cells are cleared and recounted
+    assert (height * width > DENSE_CELLS) == (shape == (300, 400))
+    occupancy = OccupancyGrid(height, width)
+    for _ in range(20):
+        n = int(rng.integers(0, 60))
+        x, y = rng.integers(0, width, n), rng.integers(0, height, n)
+        occupancy.update(x, y)
+        counts = Counter(zip(x.tolist(), y.tolist()))
+
+        expected = np.zeros(shape, dtype=np.int32)
+        for (cx, cy), count in counts.items():
+            expected[cy, cx] = count
+        np.testing.assert_array_equal(occupancy.grid, expected)
+        assert sorted(map(tuple, occupancy.collisions().tolist())) == sorted(c for c, k in counts.items() if k > 1)
+
+        qx = np.append(rng.integers(-1, width + 1, 50), x[:5])
+        qy = np.append(rng.integers(-1, height + 1, 50), y[:5])
+        hits = [counts.get((cx, cy), 0) > 0 for cx, cy in zip(qx.tolist(), qy.tolist())]
+        assert occupancy.hits(qx, qy).tolist() == hits
+        assert [occupancy.hit(cx, cy) for cx, cy in zip(qx.tolist(), qy.tolist())] == hits
+        assert [occupancy.count(cx, cy) for cx, cy in zip(qx.tolist(), qy.tolist())] == [
+            counts.get((cx, cy), 0) for cx, cy in zip(qx.tolist(), qy.tolist())]
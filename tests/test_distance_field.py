@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+import maze_processing
+from distance_field import MOVES, NO_MOVE, DistanceField
+
+# 3 rows, 6 columns, the goal is reached over the top row and (3, 2) is walled in
+GRID = np.array([
+    [0, 0, 0, 0, 0, 0],
+    [0, 1, 1, 1, 1, 0],
+    [0, 0, 1, 0, 1, -1],
+])
+
+
+def naive_distances(grid, goal):
+    # breadth-first search on (x, y) tuples
+    height, width = grid.shape
+    distances = {goal: 0}
+    frontier = [goal]
+    while frontier:
+        x, y = frontier.pop(0)
+        for dx, dy in MOVES:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height and grid[ny, nx] not in (1, 2) and (nx, ny) not in distances:
+                distances[nx, ny] = distances[x, y] + 1
+                frontier.append((nx, ny))
+    return distances
+
+
+@pytest.mark.parametrize("goal", [(5, 2), (2, 0), (0, 2)])
+def test_goal_and_queries_are_x_y(goal):
+    field = DistanceField(GRID, goal)
+    expected = naive_distances(GRID, goal)
+    height, width = GRID.shape
+
+    assert field.distance_from(*goal) == 0
+    assert field.next_move(*goal) is None
+    for y in range(height):
+        for x in range(width):
+            assert field.distance_from(x, y) == expected.get((x, y), -1)
+            move = field.next_move(x, y)
+            if (x, y) in expected and (x, y) != goal:
+                dx, dy = move
+                assert expected[x + dx, y + dy] == expected[x, y] - 1
+            else:
+                assert move is None
+
+
+def test_unreachable_and_outside():
+    field = DistanceField(GRID, (5, 2))
+    assert field.distance_from(3, 2) == -1
+    assert field.step[2, 3] == NO_MOVE
+    assert field.distance_from(6, 0) == field.distance_from(0, 3) == -1
+    assert field.next_move(-1, 0) is None
+
+
+def test_maze_distance_field_targets_end_point():
+    cell_size = maze_processing.cell_size_for(GRID)
+    player = maze_processing.Player((0, 0), None, None, cell_size)
+    grid = GRID.copy()
+    grid[0, 0] = -2
+    maze = maze_processing.Maze(grid, player)
+
+    assert maze.get_distance_field().goal == (5, 2)
+    assert maze.get_distance(5, 2) == 0
+    assert maze.get_distance(0, 0) == 7
+    assert maze.get_next_move(0, 0) == (1, 0)
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from generate import (LATTICE_STEPS, binary_maze_to_image, carve_lattice, generate_game_layout,
+                      generate_solvable_binary_maze)
+from loader import PATH_COLOR, WALL_COLOR, get_maze_array
+from maze_format import PALETTE_BINARY, to_game_codes
+from maze_verify import connectivity_report, label_components
+
+
+def assert_perfect(maze):
+    """Every path cell of a binary maze is reachable from (0, 0) along exactly one route."""
+    passable = np.asarray(maze) == 1
+    labels = label_components(passable)
+    assert (labels[passable] == 0).all()
+    # a connected graph is a tree when it has one edge less than it has cells
+    edges = np.count_nonzero(passable[:, 1:] & passable[:, :-1]) + np.count_nonzero(passable[1:] & passable[:-1])
+    assert edges == np.count_nonzero(passable) - 1
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 8, 25, 64, 101])
+def test_maze_is_perfect(size):
+    maze = generate_solvable_binary_maze(size, seed=size)
+    assert maze.shape == (size, size) and maze.dtype == np.uint8
+    assert maze[0, 0] == maze[-1, -1] == 1
+    # paths run between the even coordinates, odd ones are always walls
+    assert (maze[::2, ::2] == 1).all()
+    assert (maze[1:size - 1:2, 1:size - 1:2] == 0).all()
+    assert_perfect(maze)
+
+
+def test_equal_seeds_give_equal_mazes():
+    first = generate_solvable_binary_maze(99, seed=7)
+    np.testing.assert_array_equal(first, generate_solvable_binary_maze(99, seed=7))
+    assert not np.array_equal(first, generate_solvable_binary_maze(99, seed=8))
+
+
+def test_lattice_is_a_spanning_tree():
+    """Every node but the root was entered from an in-bounds node, and the parents lead back to the root."""
+    rows, cols = 17, 23
+    entered = carve_lattice(rows, cols, seed=3)
+    assert entered[0, 0] == 255
+    assert (entered.ravel()[1:] < 4).all()
+
+    for r in range(rows):
+        for c in range(cols):
+            seen = 0
+            while (r, c) != (0, 0):
+                dy, dx = LATTICE_STEPS[entered[r, c]]
+                r, c = r - dy, c - dx
+                assert 0 <= r < rows and 0 <= c < cols
+                seen += 1
+                assert seen < rows * cols
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_game_layout_is_solvable(seed):
+    grid = generate_game_layout(31, seed=seed)
+    assert grid[0, 0] == -2 and grid[-1, -1] == -1
+    assert np.count_nonzero(grid == 2) == -(-np.count_nonzero(generate_solvable_binary_maze(31, seed) == 0) // 6)
+    assert connectivity_report(grid)["solvable"]
+
+
+@pytest.mark.parametrize("mode", ["RGBA", "P"])
+def test_exported_image_reads_back(mode, tmp_path, capsys):
+    """Both export modes in the loader's colors load back through get_maze as the game codes of the maze."""
+    maze = generate_solvable_binary_maze(33, seed=1)
+    path = tmp_path / f"{mode}.png"
+    binary_maze_to_image(maze, PATH_COLOR, WALL_COLOR, path, mode=mode)
+
+    np.testing.assert_array_equal(get_maze_array(path), to_game_codes(maze, PALETTE_BINARY))
+    with Image.open(path) as image:
+        assert image.mode == mode
+    if mode == "P":
+        # the bit depth in the IHDR chunk
+        assert path.read_bytes()[24] == 1
+    assert str(path) in capsys.readouterr().out
+
+
+def test_palette_export_is_smaller(tmp_path):
+    maze = generate_solvable_binary_maze(255, seed=0)
+    for mode in ("RGBA", "P"):
+        binary_maze_to_image(maze, PATH_COLOR, WALL_COLOR, tmp_path / f"{mode}.png", mode=mode)
+    assert (tmp_path / "P.png").stat().st_size < (tmp_path / "RGBA.png").stat().st_size
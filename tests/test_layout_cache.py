@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+import layout_cache
+from layout_cache import CompiledLayout, LayoutEntry, read_compiled, write_compiled
+from loader import get_maze, passability_mask, save_maze_image
+from simulation import Simulation
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(layout_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    layout_cache.clear_cache()
+    yield tmp_path / "cache"
+    layout_cache.clear_cache()
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_compiled_round_trip(seed, tmp_path, random_layouts):
+    """A compiled file maps back the grid, the padded blocking flags and the entity table."""
+    grid = random_layouts(np.random.default_rng(seed))[0]
+    path = tmp_path / "layout.mzc"
+    write_compiled(path, grid)
+    layout = read_compiled(path)
+    compiled = CompiledLayout.of(grid)
+
+    np.testing.assert_array_equal(layout.grid, grid)
+    np.testing.assert_array_equal(layout.blocked, passability_mask(grid))
+    np.testing.assert_array_equal(layout.entities, compiled.entities)
+    np.testing.assert_array_equal(layout.passable, ~np.isin(grid, (1, 2)))
+
+
+def test_other_format_version_raises(tmp_path, random_layouts):
+    path = tmp_path / "layout.mzc"
+    write_compiled(path, random_layouts(np.random.default_rng(0))[0])
+    raw = np.fromfile(path, dtype=np.uint8)
+    header = raw[:layout_cache.HEADER.itemsize].view(layout_cache.HEADER)
+    header["version"] = layout_cache.FORMAT_VERSION - 1
+    raw.tofile(path)
+
+    with pytest.raises(RuntimeError, match="format version"):
+        read_compiled(path)
+
+
+def test_key_depends_on_schema(tmp_path, monkeypatch, random_layouts):
+    path = tmp_path / "layout.png"
+    save_maze_image(random_layouts(np.random.default_rng(0))[0], path)
+    key = layout_cache.layout_key(path)
+    monkeypatch.setattr(layout_cache, "SCHEMA", layout_cache.SCHEMA + ":changed")
+    assert layout_cache.layout_key(path) != key
+
+
+@pytest.mark.parametrize("reflect", (False, True))
+def test_entry_compiled_matches_image(reflect, tmp_path, cache_dir, random_layouts):
+    """The cached tables are the ones a Simulation would compile from the decoded grid."""
+    path = tmp_path / "layout.png"
+    save_maze_image(random_layouts(np.random.default_rng(1))[0], path)
+    layout = LayoutEntry(str(path)).compiled(reflect)
+    grid = get_maze(path, reflect=reflect)
+
+    np.testing.assert_array_equal(layout.grid, grid)
+    # the cached tables are used as they are
+    sim = Simulation(layout)
+    assert sim.layout is layout
+    assert sim.blocked == passability_mask(grid).tobytes()
+    assert list(cache_dir.glob("*.mzc"))
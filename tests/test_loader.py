@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from loader import (BLOCKS_BULLET, BLOCKS_PLAYER, PALETTE, encode_maze, get_maze, get_maze_array, get_maze_pixelwise,
+                    passability_mask, save_maze_image)
+from simulation import Simulation
+
+CODES = sorted(PALETTE.values())
+
+
+def save_rgba(grid, path):
+    Image.fromarray(encode_maze(grid), mode="RGBA").save(path)
+    return path
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_get_maze_matches_pixelwise(seed, tmp_path):
+    """The vectorized decoder returns what the per-pixel one does, plain and reflected."""
+    rng = np.random.default_rng(seed)
+    grid = rng.choice(CODES, size=tuple(rng.integers(1, 40, 2)))
+    path = save_rgba(grid, tmp_path / "layout.png")
+
+    assert get_maze(path) == get_maze_pixelwise(path) == grid.tolist()
+    reflected, expected = get_maze(path, reflect=True), get_maze_pixelwise(path, reflect=True)
+    assert reflected.dtype == expected.dtype
+    np.testing.assert_array_equal(reflected, expected)
+
+
+def test_unknown_color_raises(tmp_path):
+    rgba = encode_maze(np.zeros((3, 4), dtype=np.int8))
+    rgba[1, 2] = (1, 2, 3, 255)
+    path = tmp_path / "bad.png"
+    Image.fromarray(rgba, mode="RGBA").save(path)
+
+    with pytest.raises(RuntimeError, match=r"\(2, 1\)"):
+        get_maze(path)
+    with pytest.raises(RuntimeError):
+        get_maze_pixelwise(path)
+
+
+def test_indexed_png_round_trip(tmp_path):
+    """save_maze_image's palette PNGs, which the per-pixel decoder can't read, load back exactly."""
+    grid = np.random.default_rng(0).choice(CODES, size=(17, 23)).astype(np.int8)
+    save_maze_image(grid, tmp_path / "layout.png")
+    np.testing.assert_array_equal(get_maze_array(tmp_path / "layout.png"), grid)
+
+
+def test_passability_mask_matches_cell_rules():
+    """Walls block players and bullets, turrets only players, and the wall border blocks both."""
+    grids = np.random.default_rng(1).choice(CODES, size=(3, 6, 8)).astype(np.int8)
+    masks = passability_mask(grids)
+    assert masks.shape == (3, 8, 10) and masks.dtype == np.uint8
+
+    for grid, mask in zip(grids, masks):
+        np.testing.assert_array_equal(passability_mask(grid), mask)
+        for i in range(-1, 7):
+            for j in range(-1, 9):
+                if not (0 <= i < 6 and 0 <= j < 8) or grid[i, j] == 1:
+                    flags = BLOCKS_PLAYER | BLOCKS_BULLET
+                else:
+                    flags = BLOCKS_PLAYER if grid[i, j] == 2 else 0
+                assert mask[i + 1, j + 1] == flags, (i, j)
+
+
+def test_moves_off_the_grid_are_blocked():
+    """A player on an edge stays there instead of wrapping to the other side or leaving the grid."""
+    grid = np.zeros((3, 4), dtype=np.int8)
+    grid[0, 0] = -2
+    sim = Simulation(grid)
+    # up and left from (0, 0), then down and right from the far corner
+    for action in (1, 3):
+        assert sim.step(action)["player"] == (0, 0)
+    for action in (2, 2, 2, 0, 0):
+        sim.step(action)
+    assert (sim.x, sim.y) == (3, 2)
+    for action in (0, 2):
+        assert sim.step(action)["player"] == (3, 2)
@@ -0,0 +1,101 @@
+import numpy as np
+import pygame
+import pytest
+
+import maze_2player
+import maze_2player2
+import maze_processing
+from layout_cache import ENTITY_CODES, CompiledLayout, compile_layout
+
+
+def scan_entities(grid):
+    """The (code, row, col) of every entity cell, in the row-major order of a per-cell loop."""
+    return [(int(grid[i, j]), i, j) for i in range(grid.shape[0]) for j in range(grid.shape[1])
+            if grid[i, j] in ENTITY_CODES]
+
+
+def new_maze(module, grid):
+    cell_size = module.cell_size_for(grid)
+    return module.Maze(grid, module.Player((0, 0), module.PLAYER1_COLOR, None, cell_size))
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_entity_table_matches_scan(seed, random_layouts):
+    grid = random_layouts(np.random.default_rng(seed))[0]
+    _, entities = compile_layout(grid)
+    assert [tuple(row) for row in entities.tolist()] == scan_entities(grid)
+
+    layout = CompiledLayout.of(grid)
+    for code in ENTITY_CODES:
+        assert layout.positions(code).tolist() == [[i, j] for c, i, j in scan_entities(grid) if c == code]
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_maze_entities_match_scan(seed, random_layouts):
+    """The Maze's turrets, checkpoints, goal and spawn are those of the per-cell loop, the last goal and spawn win."""
+    grid = random_layouts(np.random.default_rng(seed))[0]
+    maze = new_maze(maze_processing, grid)
+    cs = maze.get_cell_size()
+    found = scan_entities(grid)
+
+    assert maze.turret_cells.tolist() == [[i, j] for c, i, j in found if c == 2]
+    assert [(c.x, c.y, c.w, c.h) for c in maze.checkpoints] == [(j * cs, i * cs, cs, cs) for c, i, j in found if c == 6]
+    spawn = [(j * cs, i * cs) for c, i, j in found if c == -2][-1]
+    assert maze.get_p1_spawn() == spawn == (maze.get_pos_x(), maze.get_pos_y())
+    goals = [(j * cs, i * cs) for c, i, j in found if c == -1]
+    if goals:
+        assert (maze.get_end_point().x, maze.get_end_point().y) == goals[-1]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_swap_maze_matches_new_maze(seed, random_layouts):
+    rng = np.random.default_rng(seed)
+    first, second = random_layouts(rng)[0], random_layouts(rng)[0]
+    maze = new_maze(maze_processing, first)
+    if len(maze.checkpoints):
+        maze.show_player((0, 0), 0)
+    maze.swap_maze(second)
+    fresh = new_maze(maze_processing, second)
+
+    assert maze.get_cell_size() == fresh.get_cell_size()
+    np.testing.assert_array_equal(maze.maze, fresh.maze)
+    np.testing.assert_array_equal(maze.turret_cells, fresh.turret_cells)
+    assert maze.checkpoints == fresh.checkpoints
+    assert maze.last_check_point is None
+    assert maze.get_p1_spawn() == fresh.get_p1_spawn()
+    assert maze.get_p1().rect == fresh.get_p1().rect
+    if (second == -1).any():
+        assert maze.get_end_point() == fresh.get_end_point()
+
+
+def test_two_player_swap_only_moves_the_end_point(random_layouts):
+    grid = random_layouts(np.random.default_rng(0))[0]
+    maze = new_maze(maze_2player, grid)
+    turrets = maze.turret_cells.copy()
+    maze.swap_maze(grid[::-1])
+
+    cs = maze.get_cell_size()
+    assert (maze.get_end_point().x, maze.get_end_point().y) == (cs * cs, cs * cs)
+    np.testing.assert_array_equal(maze.turret_cells, turrets)
+
+
+@pytest.mark.parametrize("module", [maze_processing, maze_2player, maze_2player2])
+@pytest.mark.parametrize("first", [-2, -1, 2, 4, 5, 6])
+def test_draw_starts_on_any_cell(first, module, capsys):
+    """Maze.draw colours every cell, walls black and the rest as floor, whatever the first cell is."""
+    grid = np.zeros((4, 5), dtype=np.int8)
+    grid[2, 1:4] = 1
+    grid[3, 4] = -2
+    grid[1, 4] = -1
+    grid[0, 0] = first
+    maze = new_maze(module, grid)
+    screen = pygame.Surface((module.SCREEN_WIDTH, module.SCREEN_HEIGHT))
+    maze.draw(screen)
+    capsys.readouterr()
+
+    cs = maze.get_cell_size()
+    assert screen.get_at((2 * cs + 1, 2 * cs + 1))[:3] == module.WALL_COLOR
+    assert screen.get_at((cs + 1, cs + 1))[:3] == module.PATH_COLOR
+    # the goal drawn is the last one, at (4, 1)
+    assert screen.get_at((1, 1))[:3] == (module.TURRET_COLOR if first == 2 else module.PATH_COLOR)
+    assert screen.get_at((4 * cs + 1, cs + 1))[:3] == module.END_POINT_COLOR
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from maze_env import MazeEnv, VectorMazeEnv
+from simulation import Simulation
+
+OPTIONS = {"move_interval": 2, "shoot_interval": 7}
+
+
+def test_observation_dtypes_match():
+    env = MazeEnv(size=9, **OPTIONS)
+    vector = VectorMazeEnv(3, size=9, **OPTIONS)
+    observation, _ = env.reset(seed=0)
+    batch, _ = vector.reset(seed=0)
+    # bullets are counts in MazeEnv and flags in VectorMazeEnv
+    for key in ("grid", "player", "checkpoint"):
+        assert observation[key].dtype == batch[key].dtype, key
+
+
+def test_env_follows_simulation(random_layouts):
+    grid = random_layouts(np.random.default_rng(0), min_size=6)[0]
+    env = MazeEnv(**OPTIONS)
+    sim = Simulation(grid, **OPTIONS)
+    observation, _ = env.reset(layout=grid)
+    rng = np.random.default_rng(1)
+    for action in rng.integers(-1, 4, size=200):
+        observation, reward, terminated, _, state = env.step(int(action))
+        expected = sim.step(int(action))
+        assert state == expected
+        assert observation["player"].tolist() == [sim.x, sim.y]
+        assert observation["bullets"].sum() == len(sim.bullet_positions())
+        assert reward == (1.0 if expected["won"] else -1.0 if expected["hit"] else 0.0)
+        if terminated:
+            break
+
+
+def test_vector_reset_reuses_the_batch(random_layouts):
+    rng = np.random.default_rng(2)
+    first, second = random_layouts(rng, 4, min_size=8, max_size=9), random_layouts(rng, 4, min_size=8, max_size=9)
+    env = VectorMazeEnv(4, **OPTIONS)
+    observation, _ = env.reset(layouts=first)
+    sim = env.sim
+    env.step(np.zeros(4, dtype=np.int64))
+
+    again, _ = env.reset(layouts=second)
+    assert env.sim is sim
+    assert all(again[key] is observation[key] for key in observation)
+    np.testing.assert_array_equal(again["grid"], second)
+    assert sim.tick == 0 and not env.steps.any() and not again["bullets"].any()
+    for game, grid in enumerate(second):
+        y, x = np.argwhere(grid == -2)[-1]
+        assert again["player"][game].tolist() == [x, y]
+    assert (again["checkpoint"] == -1).all()
+
+    # another layout size needs another batch
+    env.reset(layouts=random_layouts(rng, 4, min_size=9, max_size=10))
+    assert env.sim is not sim
+
+
+def test_vector_reset_rejects_a_grid_without_spawn(random_layouts):
+    layouts = random_layouts(np.random.default_rng(3), 2, min_size=5, max_size=6)
+    env = VectorMazeEnv(2, **OPTIONS)
+    env.reset(layouts=layouts)
+    broken = layouts.copy()
+    broken[1][broken[1] == -2] = 0
+    with pytest.raises(RuntimeError, match="spawn"):
+        env.reset(layouts=broken)
+    # a rejected load leaves the batch as it was
+    np.testing.assert_array_equal(env.observation["grid"], layouts)
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from generate import binary_maze_to_file, generate_solvable_binary_maze, load_binary_maze
+from loader import PALETTE, get_maze_array
+from maze_format import (HEADER, PALETTE_BINARY, PALETTE_GAME, MazeWriter, create_maze, load_text_maze, maze_to_png,
+                         maze_to_text, open_maze, png_to_maze, read_header, text_to_maze, to_game_codes, write_maze)
+
+CODES = sorted(PALETTE.values())
+
+
+@pytest.mark.parametrize("dtype", [np.int8, np.uint8, np.int16, np.int32])
+def test_write_open_round_trip(dtype, tmp_path):
+    """The cells map back with their shape, dtype and palette, past the header."""
+    grid = np.random.default_rng(0).choice(CODES, size=(13, 29)).astype(dtype)
+    path = tmp_path / "layout.maze"
+    write_maze(path, grid, PALETTE_GAME)
+
+    mapped, palette_version = open_maze(path)
+    assert isinstance(mapped, np.memmap)
+    assert mapped.dtype == grid.dtype and palette_version == PALETTE_GAME
+    np.testing.assert_array_equal(mapped, grid)
+    assert read_header(path) == {"height": 13, "width": 29, "dtype": np.dtype(dtype),
+                                 "palette_version": PALETTE_GAME}
+    assert path.stat().st_size == HEADER.itemsize + grid.nbytes
+
+
+def test_create_maze_writes_through(tmp_path):
+    path = tmp_path / "big.maze"
+    grid = create_maze(path, (40, 7))
+    grid[::3] = 1
+    grid.flush()
+    del grid
+
+    mapped, _ = open_maze(path)
+    assert mapped.shape == (40, 7)
+    np.testing.assert_array_equal(mapped[::3], 1)
+    assert mapped.sum() == 14 * 7
+
+
+def test_writer_patches_height(tmp_path):
+    """Rows appended one at a time read back as one grid, the header counts them on close."""
+    rows = np.random.default_rng(1).integers(0, 2, (11, 6), dtype=np.uint8)
+    path = tmp_path / "tall.maze"
+    with MazeWriter(path, 6) as writer:
+        for row in rows:
+            writer.write_row(row)
+    mapped, palette_version = open_maze(path)
+    np.testing.assert_array_equal(mapped, rows)
+    assert palette_version == PALETTE_BINARY
+
+    with MazeWriter(tmp_path / "bad.maze", 6) as writer, pytest.raises(RuntimeError, match="shape"):
+        writer.write_row(np.zeros(5))
+
+
+def test_bad_header_raises(tmp_path):
+    path = tmp_path / "not.maze"
+    path.write_bytes(b"PNG?" + bytes(HEADER.itemsize))
+    with pytest.raises(RuntimeError, match="not a binary maze"):
+        read_header(path)
+
+    write_maze(path, np.zeros((2, 2), dtype=np.int8))
+    raw = bytearray(path.read_bytes())
+    raw[4] += 1
+    path.write_bytes(bytes(raw))
+    with pytest.raises(RuntimeError, match="format version"):
+        open_maze(path)
+
+
+@pytest.mark.parametrize("size", [5, 25, 34])
+def test_text_round_trip(size, tmp_path):
+    """Text mazes of any size, one line or one row per line, convert to maze files and back."""
+    maze = generate_solvable_binary_maze(size, seed=size)
+    one_line = tmp_path / "maze.txt"
+    one_line.write_text(" ".join(map(str, maze.ravel().tolist())))
+    np.testing.assert_array_equal(load_text_maze(one_line), maze)
+
+    text_to_maze(one_line, tmp_path / "maze.maze")
+    np.testing.assert_array_equal(load_binary_maze(tmp_path / "maze.maze"), maze)
+    maze_to_text(tmp_path / "maze.maze", tmp_path / "rows.txt")
+    np.testing.assert_array_equal(load_binary_maze(tmp_path / "rows.txt"), maze)
+
+
+def test_text_that_is_not_square_raises(tmp_path):
+    path = tmp_path / "maze.txt"
+    path.write_text("1 0 1 0 1")
+    with pytest.raises(RuntimeError, match="square"):
+        load_text_maze(path)
+
+
+def test_png_round_trip(tmp_path):
+    """Game layouts and binary mazes go through maze files to images that get_maze reads."""
+    grid = np.random.default_rng(2).choice(CODES, size=(9, 15)).astype(np.int8)
+    write_maze(tmp_path / "layout.maze", grid)
+    maze_to_png(tmp_path / "layout.maze", tmp_path / "layout.png")
+    png_to_maze(tmp_path / "layout.png", tmp_path / "again.maze")
+    np.testing.assert_array_equal(open_maze(tmp_path / "again.maze")[0], grid)
+
+    maze = generate_solvable_binary_maze(21, seed=0)
+    binary_maze_to_file(maze, tmp_path / "binary.maze")
+    maze_to_png(tmp_path / "binary.maze", tmp_path / "binary.png")
+    np.testing.assert_array_equal(get_maze_array(tmp_path / "binary.png"), to_game_codes(maze, PALETTE_BINARY))
+    np.testing.assert_array_equal(to_game_codes(maze, PALETTE_BINARY), np.where(maze == 1, 0, 1))
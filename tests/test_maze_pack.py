@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+import pytest
+
+from generate import generate_solvable_binary_maze
+from loader import get_maze_array
+from maze_format import PALETTE_BINARY, to_game_codes
+from maze_pack import MazePack, build_pack, export_pack_images
+
+
+@pytest.mark.parametrize("chunksize, in_flight", [(1, 1), (3, 2), (4, None)])
+def test_pack_round_trip(chunksize, in_flight, tmp_path):
+    """Every maze comes back in seed order, whatever the chunks and the window."""
+    path = tmp_path / "mazes.pack"
+    seeds = [5, 0, 2 ** 63, 7, 1, 9, 3]
+    assert build_pack(path, seeds, 9, workers=2, chunksize=chunksize, in_flight=in_flight) == len(seeds)
+
+    pack = MazePack(path)
+    assert pack.seeds.tolist() == seeds
+    for seed, maze in zip(seeds, pack):
+        np.testing.assert_array_equal(maze, generate_solvable_binary_maze(9, seed))
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_pack_is_the_same_for_any_worker_count(tmp_path):
+    build_pack(tmp_path / "one.pack", range(6), 7, workers=1)
+    build_pack(tmp_path / "two.pack", range(6), 7, workers=2, chunksize=2)
+    assert (tmp_path / "one.pack").read_bytes() == (tmp_path / "two.pack").read_bytes()
+
+
+@pytest.mark.parametrize("seed", [-1, 2 ** 64])
+def test_out_of_range_seed_raises(seed, tmp_path):
+    path = tmp_path / "mazes.pack"
+    path.write_bytes(b"old")
+    with pytest.raises(RuntimeError, match="seed"):
+        build_pack(path, [0, seed], 7, workers=1)
+    # the previous file is left as it was and no temporary file is left behind
+    assert path.read_bytes() == b"old"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_exported_images_read_back(tmp_path):
+    """Every maze of a pack is saved under its seed as an image get_maze reads back."""
+    pack = tmp_path / "mazes.pack"
+    build_pack(pack, [4, 11, 2], 15, workers=1)
+    paths = export_pack_images(pack, tmp_path / "images")
+
+    assert [os.path.basename(path) for path in paths] == ["maze_4.png", "maze_11.png", "maze_2.png"]
+    for seed, path in zip((4, 11, 2), paths):
+        expected = to_game_codes(generate_solvable_binary_maze(15, seed), PALETTE_BINARY)
+        np.testing.assert_array_equal(get_maze_array(path), expected)
@@ -0,0 +1,51 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from loader import get_maze_array
+from maze_format import PALETTE_BINARY, open_maze, to_game_codes
+from maze_stream import eller_rows, stream_maze
+from maze_verify import label_components
+from test_generate import assert_perfect
+
+
+@pytest.mark.parametrize("width, height", [(1, 1), (2, 2), (5, 9), (24, 7), (31, 100)])
+def test_rows_form_a_perfect_maze(width, height):
+    maze = np.array(list(eller_rows(width, height, seed=width)))
+    assert maze.shape == (height, width)
+    assert maze[0, 0] == maze[-1, -1] == 1
+    assert (maze[::2, ::2] == 1).all()
+    assert_perfect(maze)
+
+
+def test_equal_seeds_give_equal_rows():
+    first = np.array(list(eller_rows(15, 41, seed=3)))
+    np.testing.assert_array_equal(first, np.array(list(eller_rows(15, 41, seed=3))))
+    assert not np.array_equal(first, np.array(list(eller_rows(15, 41, seed=4))))
+
+
+def test_endless_prefix_connects_every_set_downwards():
+    """Any prefix of an endless maze ends with each set going down, so every cell reaches the next row."""
+    # 60 rows end on a row of ways down
+    rows = np.array(list(itertools.islice(eller_rows(21, seed=1), 60)))
+    passable = rows == 1
+    # a maze that continues below: the cells with a way down stand in for the rest of it
+    passable = np.vstack([passable, np.ones((1, 21), dtype=bool)])
+    labels = label_components(passable)
+    assert (labels[passable] == labels[0, 0]).all()
+
+
+@pytest.mark.parametrize("name", ["tall.mzb", "tall.png"])
+def test_stream_writes_the_rows(name, tmp_path):
+    """The maze file and the layout image hold the rows eller_rows yields for the seed."""
+    path = str(tmp_path / name)
+    assert stream_maze(path, 13, 57, seed=2) == 57
+    expected = np.array(list(eller_rows(13, 57, seed=2)))
+
+    if name.endswith(".png"):
+        np.testing.assert_array_equal(get_maze_array(path), to_game_codes(expected, PALETTE_BINARY))
+    else:
+        maze, palette_version = open_maze(path)
+        assert palette_version == PALETTE_BINARY
+        np.testing.assert_array_equal(maze, expected)
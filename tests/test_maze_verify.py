@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from generate import generate_game_layout
+from maze_verify import connectivity_report, label_components, verify_maze
+
+
+def naive_labels(passable):
+    # flood fill from every unlabelled cell, labelled by the smallest flat index like label_components
+    height, width = passable.shape
+    labels = np.full(passable.shape, -1)
+    for start in range(passable.size):
+        y, x = divmod(start, width)
+        if not passable[y, x] or labels[y, x] >= 0:
+            continue
+        labels[y, x] = start
+        stack = [(y, x)]
+        while stack:
+            cy, cx = stack.pop()
+            for ny, nx in ((cy + 1, cx), (cy - 1, cx), (cy, cx + 1), (cy, cx - 1)):
+                if 0 <= ny < height and 0 <= nx < width and passable[ny, nx] and labels[ny, nx] < 0:
+                    labels[ny, nx] = start
+                    stack.append((ny, nx))
+    return labels
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_labels_match_flood_fill(seed, random_layouts):
+    grid = random_layouts(np.random.default_rng(seed))[0]
+    passable = ~np.isin(grid, (1, 2))
+    np.testing.assert_array_equal(label_components(passable), naive_labels(passable))
+
+
+def test_spawn_is_the_one_the_game_plays():
+    # the first spawn is walled off with the goal, the last one, which the game uses, is not
+    grid = np.array([
+        [-2, 0, 1, -2],
+        [0, -1, 1, 0],
+    ])
+    report = connectivity_report(grid)
+    assert not report["solvable"]
+    assert [ok for name, pos, ok in report["entities"]] == [False, True, False]
+    with pytest.raises(RuntimeError, match=r"goal \(1, 1\)"):
+        verify_maze(grid)
+
+    # reachability and solvability agree once the goal is on the last spawn's side
+    grid[1, 1], grid[1, 3] = 0, -1
+    report = connectivity_report(grid)
+    assert report["solvable"]
+    assert all(ok for name, pos, ok in report["entities"] if name == "goal")
+
+
+def test_missing_goal_is_not_solvable():
+    with pytest.raises(RuntimeError, match="not solvable"):
+        verify_maze(np.array([[-2, 0, 0]]))
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_generated_layouts_verify(seed):
+    assert connectivity_report(generate_game_layout(15, seed=seed))["solvable"]
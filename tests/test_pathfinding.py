@@ -0,0 +1,78 @@
+import heapq
+
+import numpy as np
+import pytest
+
+from distance_field import DistanceField
+from pathfinding import GridGraph, astar, find_paths, jump_point_search, turret_weights
+
+
+def is_path(grid, path, start, goal):
+    cells = np.asarray(path)
+    steps = np.abs(np.diff(cells, axis=0)).sum(axis=1)
+    return (path[0] == start and path[-1] == goal and (steps == 1).all()
+            and not np.isin(grid[cells[:, 1], cells[:, 0]], (1, 2)).any())
+
+
+def naive_cost(grid, weights, start, goal):
+    # Dijkstra on (x, y) tuples, stepping onto a cell costs its weight
+    height, width = grid.shape
+    best = {start: 0}
+    heap = [(0, start)]
+    while heap:
+        g, (x, y) = heapq.heappop(heap)
+        if (x, y) == goal:
+            return g
+        if g > best[x, y]:
+            continue
+        for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if 0 <= nx < width and 0 <= ny < height and grid[ny, nx] not in (1, 2):
+                ng = g + weights[ny, nx]
+                if ng < best.get((nx, ny), ng + 1):
+                    best[nx, ny] = ng
+                    heapq.heappush(heap, (ng, (nx, ny)))
+    return None
+
+
+def open_cells(grid, rng, count):
+    free = np.argwhere(~np.isin(grid, (1, 2)))
+    return [tuple(free[i][::-1].tolist()) for i in rng.integers(len(free), size=count)]
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_searches_find_shortest_paths(seed, random_layouts):
+    rng = np.random.default_rng(seed)
+    grid = random_layouts(rng, min_size=8)[0]
+    graph = GridGraph(grid)
+    for start, goal in zip(open_cells(grid, rng, 8), open_cells(grid, rng, 8)):
+        distance = DistanceField(grid, goal).distance_from(*start)
+        for search in (astar, jump_point_search):
+            path = search(graph, start, goal)
+            if distance < 0:
+                assert path is None
+            else:
+                assert is_path(grid, path, start, goal)
+                assert len(path) == distance + 1
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_weighted_paths_cost_the_least(seed, random_layouts):
+    rng = np.random.default_rng(seed)
+    grid = random_layouts(rng, min_size=8)[0]
+    weights = turret_weights(grid)
+    pairs = list(zip(open_cells(grid, rng, 6), [open_cells(grid, rng, 1)[0]] * 6))
+
+    for (start, goal), batched in zip(pairs, find_paths(grid, pairs, weights)):
+        cost = naive_cost(grid, weights, start, goal)
+        for path in (astar(grid, start, goal, weights), astar(GridGraph(grid, weights), start, goal), batched):
+            if cost is None:
+                assert path is None
+            else:
+                assert is_path(grid, path, start, goal)
+                assert sum(weights[y, x] for x, y in path[1:]) == cost
+
+
+def test_astar_rejects_weights_for_a_graph():
+    grid = np.zeros((4, 4), dtype=np.int8)
+    with pytest.raises(RuntimeError):
+        astar(GridGraph(grid), (0, 0), (3, 3), weights=np.ones((4, 4)))
@@ -0,0 +1,101 @@
+from functools import partial
+
+import numpy as np
+import pytest
+
+from replay import Recording, SessionRecorder, replay, state_hash
+from simulation import Simulation, staggered_fire, volley_fire
+
+OPTIONS = {"move_interval": 2, "shoot_interval": 7, "checkpoint_goal": True}
+
+
+def play(sim, rng, ticks, hash_interval=25):
+    recorder = SessionRecorder(sim, hash_interval)
+    for action in np.where(rng.random(ticks) < 0.3, rng.integers(0, 4, ticks), -1).tolist():
+        recorder.step(action)
+    return recorder
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("bullet_mode", ["analytic", "pool"])
+def test_saved_session_replays(bullet_mode, seed, tmp_path, random_layouts):
+    rng = np.random.default_rng(seed)
+    grid = random_layouts(rng, min_size=6)[0]
+    recorder = play(Simulation(grid, bullet_mode, **OPTIONS), rng, 400)
+    path = tmp_path / "session.mzr"
+    recorder.save(path)
+
+    sim = replay(Recording.load(path), grid)
+    assert (sim.tick, sim.x, sim.y) == (recorder.sim.tick, recorder.sim.x, recorder.sim.y)
+    assert state_hash(sim) == state_hash(recorder.sim)
+
+
+def test_state_hash_covers_bullets_and_turret_clock():
+    grid = np.zeros((5, 7), dtype=np.int8)
+    grid[0, 0] = -2
+    grid[2, 3] = 2
+    sim = Simulation(grid, **OPTIONS)
+    sim.idle(7)
+    fired = state_hash(sim)
+    # the bullet models keep different orders of the same bullets
+    pool = Simulation(grid, "pool", **OPTIONS)
+    pool.idle(7)
+    assert state_hash(pool) == fired
+
+    # same tick, player and bullet count, bullets on other cells
+    moved = Simulation(grid, **OPTIONS)
+    moved.idle(7)
+    moved.bullets.clear()
+    moved.bullets.shoot()
+    moved.bullets.step()
+    assert len(moved.bullet_positions()) == len(sim.bullet_positions())
+    assert state_hash(moved) != fired
+
+    # same state, turret clocks that disagree
+    timed = Simulation(grid, fire_cadence=lambda turrets: (np.full(len(turrets), 7), np.zeros(len(turrets))), **OPTIONS)
+    timed.idle(7)
+    late = Simulation(grid, fire_cadence=lambda turrets: (np.full(len(turrets), 7), np.zeros(len(turrets))), **OPTIONS)
+    late.idle(7)
+    late.cadence.wheel.now += 1
+    assert state_hash(timed) != state_hash(late)
+
+
+def test_replay_names_the_diverging_tick(random_layouts):
+    rng = np.random.default_rng(5)
+    grid = random_layouts(rng, min_size=6)[0]
+    recording = play(Simulation(grid, **OPTIONS), rng, 200).recording()
+    recording.hashes = recording.hashes.copy()
+    recording.hashes[2] ^= 1
+    with pytest.raises(RuntimeError, match=f"tick {recording.hash_ticks[2]}"):
+        replay(recording, grid)
+
+
+
+def mixed_fire(turrets):
+    # periods of 4 to 8 ticks with phases past the period, stored modulo it
+    return np.arange(len(turrets)) % 5 + 4, np.arange(len(turrets)) * 3
+
+
+@pytest.mark.parametrize("fire_cadence", [partial(volley_fire, period=9), partial(staggered_fire, period=9), mixed_fire],
+                         ids=["volley", "staggered", "mixed"])
+def test_fire_cadence_round_trip(fire_cadence, tmp_path, random_layouts):
+    """A session played with a fire_cadence replays with the recorded periods and phases."""
+    rng = np.random.default_rng(6)
+    grid = random_layouts(rng, min_size=10)[0]
+    grid[grid == 1] = 2
+    recorder = play(Simulation(grid, fire_cadence=fire_cadence, **OPTIONS), rng, 300)
+    path = tmp_path / "session.mzr"
+    recorder.save(path)
+
+    recording = Recording.load(path)
+    periods, phases = fire_cadence(recorder.sim.layout.turrets)
+    assert recording.fire_periods.tolist() == np.broadcast_to(periods, recording.fire_periods.shape).tolist()
+    assert recording.fire_phases.tolist() == (np.asarray(phases) % periods).tolist()
+    sim = replay(recording, grid)
+    assert state_hash(sim) == state_hash(recorder.sim)
+
+    # the same inputs under global volleys are another session
+    recording.fire_periods = recording.fire_periods[:0]
+    recording.fire_phases = recording.fire_phases[:0]
+    with pytest.raises(RuntimeError, match="diverged"):
+        replay(recording, grid)
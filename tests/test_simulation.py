@@ -0,0 +1,101 @@
+import queue
+from functools import partial
+
+import numpy as np
+import pygame
+import pytest
+
+import maze_processing
+from reference_rules import ReferenceRules
+from simulation import Simulation, staggered_fire, volley_fire
+
+TICKS = 400
+OPTIONS = {"move_interval": 2, "shoot_interval": 7}
+
+
+def mixed_fire(turrets):
+    # every turret on its own period and phase
+    index = np.arange(len(turrets))
+    return 3 + index % 5, index % 4
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("checkpoint_goal", [False, True])
+@pytest.mark.parametrize("bullet_mode", ["analytic", "pool"])
+@pytest.mark.parametrize("fire_cadence", [None, partial(volley_fire, period=7), partial(staggered_fire, period=7), mixed_fire],
+                         ids=["interval", "volley", "staggered", "mixed"])
+def test_simulation_matches_reference(fire_cadence, bullet_mode, checkpoint_goal, seed, random_layouts):
+    """Simulation moves, fires, hits and reaches checkpoints as the per-object rules did."""
+    rng = np.random.default_rng(seed)
+    grid = random_layouts(rng)[0]
+    sim = Simulation(grid, bullet_mode, checkpoint_goal=checkpoint_goal, fire_cadence=fire_cadence, **OPTIONS)
+    reference = ReferenceRules(grid, checkpoint_goal=checkpoint_goal, fire_cadence=fire_cadence, **OPTIONS)
+
+    for tick in range(TICKS):
+        action = int(rng.integers(-1, 4))
+        assert sim.step(action) == reference.step(action), tick
+        assert sorted(map(tuple, sim.bullet_positions().tolist())) == reference.bullet_cells(), tick
+        assert sim.spawn == reference.spawn and sim.goal == reference.goal, tick
+
+
+def test_run_returns_last_step(random_layouts):
+    rng = np.random.default_rng(0)
+    grid = random_layouts(rng)[0]
+    actions = rng.integers(-1, 4, 200).tolist()
+    stepped = Simulation(grid, **OPTIONS)
+    states = [stepped.step(action) for action in actions]
+
+    assert Simulation(grid, **OPTIONS).run(actions) == states[-1]
+    assert Simulation(grid, **OPTIONS).run([]) is None
+
+
+def test_maze_shows_reached_checkpoints():
+    """The Maze mirrors the Simulation's player and passes its checkpoints on to the views."""
+    grid = np.zeros((3, 5), dtype=np.int8)
+    grid[1, 0] = -2
+    grid[1, 4] = -1
+    grid[1, 2] = grid[0, 4] = 6
+    cell_size = maze_processing.cell_size_for(grid)
+    maze = maze_processing.Maze(grid, maze_processing.Player((0, 0), None, None, cell_size))
+    events = queue.Queue()
+    maze.subscribe_checkpoints(events)
+    sim = Simulation(grid, checkpoint_goal=True)
+
+    for _ in range(2):
+        state = sim.step(2)
+        maze.show_player((sim.x * cell_size, sim.y * cell_size), state["checkpoint"])
+
+    assert (maze.get_pos_x(), maze.get_pos_y()) == (2 * cell_size, cell_size)
+    assert maze.get_p1_spawn() == (2 * cell_size, cell_size)
+    assert maze.get_end_point() == maze.checkpoints[1] == maze.last_check_point
+    assert events.get_nowait() == (1, 2 * cell_size, cell_size)
+    assert events.empty()
+
+
+def test_checkpoints_match_rect_scan():
+    """On a layout with thousands of checkpoints each move reports the checkpoint a scan of the Maze's rects finds."""
+    rng = np.random.default_rng(0)
+    grid = np.where(rng.random((60, 80)) < 0.6, 6, 0).astype(np.int8)
+    grid[0, 0] = -2
+    cell_size = maze_processing.cell_size_for(grid)
+    maze = maze_processing.Maze(grid, maze_processing.Player((0, 0), None, None, cell_size))
+    events = queue.Queue()
+    maze.subscribe_checkpoints(events)
+    sim = Simulation(grid)
+    assert len(maze.checkpoints) > 2000
+
+    reached = []
+    for action in rng.integers(-1, 4, 3000).tolist():
+        before = (sim.x, sim.y)
+        state = sim.step(action)
+        player = pygame.Rect(sim.x * cell_size, sim.y * cell_size, cell_size, cell_size)
+        hits = [i for i, c in enumerate(maze.checkpoints) if c.colliderect(player)]
+        # only a move onto another cell reaches a checkpoint
+        assert state["checkpoint"] == (hits[0] if hits and (sim.x, sim.y) != before else None)
+        maze.show_player((player.x, player.y), state["checkpoint"])
+        if state["checkpoint"] is not None:
+            reached.append((state["checkpoint"], player.x, player.y))
+            assert sim.spawn == (sim.x, sim.y)
+
+    assert reached
+    assert [events.get_nowait() for _ in range(events.qsize())] == reached
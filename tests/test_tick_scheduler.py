@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from simulation import Simulation, staggered_fire
+from tick_scheduler import TICK_RATE, FixedTimestep, TickScheduler, TimerWheel, TurretCadence
+
+OPTIONS = {"move_interval": 3, "shoot_interval": 11, "checkpoint_goal": True}
+
+
+def game(grid, actions, fire_cadence=None):
+    """A game loop as the mains run it: one input per tick, a slower system on its own period and phase."""
+    sim = Simulation(grid, fire_cadence=fire_cadence, **OPTIONS)
+    scheduler = TickScheduler()
+    states, slow = [], []
+
+    def tick():
+        states.append(sim.step(actions[sim.tick]))
+        if sim.tick == len(actions):
+            scheduler.stop()
+
+    scheduler.every(1, tick)
+    scheduler.every(7, lambda: slow.append((scheduler.tick, sim.x, sim.y)), phase=3)
+    return scheduler, states, slow
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("fire_cadence", [None, staggered_fire], ids=["volleys", "staggered"])
+def test_frame_rate_does_not_change_the_game(fire_cadence, seed, random_layouts):
+    rng = np.random.default_rng(seed)
+    grid = random_layouts(rng, min_size=6)[0]
+    actions = np.where(rng.random(600) < 0.4, rng.integers(0, 4, 600), -1).tolist()
+
+    fixed, expected, expected_slow = game(grid, actions, fire_cadence)
+    fixed.run(len(actions))
+
+    varying, states, slow = game(grid, actions, fire_cadence)
+    timestep = FixedTimestep(TICK_RATE)
+    frames = 0
+    while not varying.stopped:
+        # frames from 250 fps down to stalls that hit the catch up limit
+        varying.run(timestep.advance(int(rng.choice([4, 16, 33, 50, 120, 400]))))
+        frames += 1
+
+    assert states == expected
+    assert slow == expected_slow
+    assert timestep.dropped > 0 and frames != len(actions)
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("fire_cadence", [None, staggered_fire], ids=["volleys", "staggered"])
+def test_idle_matches_steps(fire_cadence, seed, random_layouts):
+    rng = np.random.default_rng(seed)
+    grid = random_layouts(rng, min_size=6)[0]
+    stepped = Simulation(grid, fire_cadence=fire_cadence, **OPTIONS)
+    idled = Simulation(grid, fire_cadence=fire_cadence, **OPTIONS)
+    for _ in range(20):
+        action, wait = int(rng.integers(-1, 4)), int(rng.integers(0, 30))
+        stepped.step(action)
+        idled.step(action)
+        hits = sum(stepped.step()["hit"] for _ in range(wait))
+        assert idled.idle(wait) == hits
+        assert (idled.tick, idled.x, idled.y) == (stepped.tick, stepped.x, stepped.y)
+        assert sorted(idled.bullet_positions().tolist()) == sorted(stepped.bullet_positions().tolist())
+
+
+def test_systems_run_on_their_period_and_phase():
+    scheduler = TickScheduler()
+    runs = []
+    scheduler.every(4, lambda: runs.append(("a", scheduler.tick)), phase=1)
+    scheduler.every(6, lambda: runs.append(("b", scheduler.tick)))
+    scheduler.run(12)
+    assert runs == [("a", 1), ("a", 5), ("b", 6), ("a", 9), ("b", 12)]
+    assert scheduler.next_due() == 13
+    scheduler.skip_to(13)
+    assert scheduler.next_due() == 17
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_timer_wheel_matches_naive_loop(seed):
+    """Timers due anywhere from the next tick to past the top level come back on their tick."""
+    rng = np.random.default_rng(seed)
+    wheel = TimerWheel(bits=3, levels=2)
+    pending = {}
+    next_id = 0
+    for _ in range(1500):
+        if rng.random() < 0.3:
+            count = int(rng.integers(1, 6))
+            ids = np.arange(next_id, next_id + count)
+            at = wheel.now + rng.integers(1, 200, count)
+            wheel.schedule(ids, at)
+            pending.update(zip(ids.tolist(), at.tolist()))
+            next_id += count
+        due = wheel.advance()
+        expected = sorted(i for i, at in pending.items() if at == wheel.now)
+        assert sorted(due.tolist()) == expected
+        for i in expected:
+            del pending[i]
+        assert len(wheel) == len(pending)
+
+
+def test_timer_wheel_rejects_past_timers():
+    wheel = TimerWheel()
+    wheel.advance()
+    with pytest.raises(RuntimeError):
+        wheel.schedule([0], [1])
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_turret_cadence_matches_scan(seed):
+    rng = np.random.default_rng(seed)
+    periods = rng.integers(1, 90, 300)
+    phases = rng.integers(-50, 200, 300)
+    cadence = TurretCadence(periods, phases)
+    for tick in range(1, 400):
+        assert sorted(cadence.advance().tolist()) == np.flatnonzero(tick % periods == phases % periods).tolist()
@@ -0,0 +1,79 @@
+from collections import defaultdict
+
+import numpy as np
+import pytest
+
+from distance_field import MOVES
+from turret_hazard import DIRECTION_NAMES, HazardMap
+
+
+def scan_rays(grid):
+    """
+    Walk every turret's rays cell by cell.
+
+    Returns:
+        dict: (x, y) -> sorted list of (turret index, direction, tick).
+    """
+    height, width = grid.shape
+    records = defaultdict(list)
+    turrets = [(x, y) for y in range(height) for x in range(width) if grid[y, x] == 2]
+    for t, (tx, ty) in enumerate(turrets):
+        for d, (dx, dy) in enumerate(MOVES):
+            x, y, tick = tx + dx, ty + dy, 0
+            if not (0 <= x < width and 0 <= y < height) or grid[y, x] in (1, 2):
+                continue
+            while 0 <= x < width and 0 <= y < height and grid[y, x] != 1:
+                records[(x, y)].append((t, d, tick))
+                x, y, tick = x + dx, y + dy, tick + 1
+    return {cell: sorted(found) for cell, found in records.items()}
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_hazard_map_matches_ray_walk(seed, random_layouts):
+    """Every record, coverage count and first tick is the one of walking the bullets' rays."""
+    rng = np.random.default_rng(seed)
+    grid = random_layouts(rng, min_size=1, max_size=30)[0]
+    hazards = HazardMap(grid)
+    expected = scan_rays(grid)
+    height, width = grid.shape
+
+    for y in range(height):
+        for x in range(width):
+            found = expected.get((x, y), [])
+            turret, tick = hazards.records(x, y)
+            assert sorted(zip(turret.tolist(), tick.tolist())) == sorted((t, k) for t, _, k in found)
+            named = [((int(hazards.turrets[t, 1]), int(hazards.turrets[t, 0])), DIRECTION_NAMES[d], k)
+                     for t, d, k in found]
+            assert sorted(hazards.hazards_at(x, y)) == sorted(named)
+            assert hazards.coverage[y, x] == len(found)
+            assert hazards.first_tick[y, x] == min((k for _, _, k in found), default=-1)
+
+    assert hazards.records(-1, 0)[0].size == hazards.records(width, height - 1)[0].size == 0
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_volley_cells_match_ray_walk(seed, random_layouts):
+    """bullet_cells, bullet_at and danger_mask put a volley's bullets where the walk does, for any turrets."""
+    rng = np.random.default_rng(seed)
+    grid = random_layouts(rng, min_size=1, max_size=30)[0]
+    hazards = HazardMap(grid)
+    width = grid.shape[1]
+    expected = scan_rays(grid)
+    some = np.flatnonzero(rng.random(len(hazards.turrets)) < 0.5)
+    mask = np.zeros(len(hazards.turrets), dtype=bool)
+    mask[some] = True
+
+    for tick in range(max(grid.shape) + 1):
+        every = sorted(y * width + x for (x, y), found in expected.items() for _, _, k in found if k == tick)
+        fired = sorted(y * width + x for (x, y), found in expected.items() for t, _, k in found
+                       if k == tick and mask[t])
+        assert sorted(hazards.bullet_cells(tick).tolist()) == every
+        assert sorted(hazards.bullet_cells(tick, some).tolist()) == fired
+        assert sorted(hazards.bullet_cells(tick, mask).tolist()) == fired
+
+        danger = np.zeros(grid.shape, dtype=bool)
+        for cell in every:
+            danger[divmod(cell, width)] = True
+        np.testing.assert_array_equal(hazards.danger_mask(tick), danger)
+        for y, x in np.argwhere(danger | (rng.random(grid.shape) < 0.1)).tolist():
+            assert hazards.bullet_at(x, y, tick) == danger[y, x]
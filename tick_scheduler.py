@@ -0,0 +1,232 @@
+import numpy as np
+
+TICK_RATE = 30
+# ticks a frame may run to catch up, past that the game slows down instead
+MAX_CATCH_UP = 5
+
+
+class FixedTimestep:
+    """
+    Turns wall clock frame times into a whole number of fixed ticks.
+
+    Elapsed time accumulates and every full tick of it is run as one tick,
+    so the game advances tick_rate ticks per second however fast frames
+    come, and a tick always means the same amount of game time. Time is
+    kept in integer units of 1 / (1000 * tick_rate) s, the accumulator
+    never drifts. A frame runs at most max_catch_up ticks: after a stall
+    the rest is dropped, the game slows down rather than spending ever
+    longer frames catching up.
+    """
+
+    def __init__(self, tick_rate=TICK_RATE, max_catch_up=MAX_CATCH_UP):
+        self.tick_rate = tick_rate
+        self.max_catch_up = max_catch_up
+        # elapsed ms * tick_rate, a tick is 1000 units
+        self.accumulator = 0
+        self.dropped = 0
+
+    def advance(self, elapsed_ms):
+        """
+        Add the time of a frame.
+
+        Args:
+            elapsed_ms (int): milliseconds since the last frame, what
+                pygame.time.Clock.tick returns.
+
+        Returns:
+            int: number of ticks to run for this frame.
+        """
+        self.accumulator += elapsed_ms * self.tick_rate
+        ticks = self.accumulator // 1000
+        if ticks > self.max_catch_up:
+            self.dropped += ticks - self.max_catch_up
+            ticks = self.max_catch_up
+            self.accumulator = ticks * 1000
+        self.accumulator -= ticks * 1000
+        return ticks
+
+    @property
+    def alpha(self):
+        """How far into the next tick the frame is, 0 to 1, to interpolate what is drawn."""
+        return self.accumulator / 1000
+
+
+class TickScheduler:
+    """
+    Game systems run on integer ticks.
+
+    A system is a callable run every period ticks, on the ticks where
+    tick % period == phase. Systems due on the same tick run in the order
+    they were added, so a run of ticks gives the same results however it
+    is split into frames.
+    """
+
+    def __init__(self):
+        self.tick = 0
+        self.systems = []
+        self.stopped = False
+
+    def every(self, period, system, phase=0):
+        """Run system() every period ticks, starting at tick phase."""
+        self.systems.append((period, phase % period, system))
+
+    def stop(self):
+        """End the current run after this tick, for a system that finishes the game."""
+        self.stopped = True
+
+    def next_due(self):
+        """The next tick any system is due on, None without systems."""
+        tick = self.tick + 1
+        return min((tick + (phase - tick) % period for period, phase, _ in self.systems), default=None)
+
+    def skip_to(self, tick):
+        """Move the clock to tick without running anything, for ticks no system is due on."""
+        self.tick = tick
+
+    def run(self, ticks=1):
+        """Run ticks ticks, or fewer if a system stops the scheduler."""
+        for _ in range(ticks):
+            if self.stopped:
+                return
+            self.tick += 1
+            for period, phase, system in self.systems:
+                if self.tick % period == phase:
+                    system()
+
+
+class TimerWheel:
+    """
+    Hierarchical timing wheel of integer tick timers.
+
+    Level L has 2 ** bits slots of 2 ** (bits * L) ticks each. A timer
+    sits on the lowest level whose current block of slots also holds its
+    expiry, and drops a level each time the clock enters its slot, so it
+    is touched at most levels times before it is due. Timers too far out
+    for the top level wait in an overflow list. Scheduling and advancing
+    are per batch of timers, each tick costs the number of timers that
+    are due or cascade, not the number that are waiting.
+    """
+
+    def __init__(self, bits=6, levels=4):
+        self.bits = bits
+        self.levels = levels
+        self.mask = (1 << bits) - 1
+        self.now = 0
+        self.count = 0
+        # slots[level][slot] is a list of (ids, expiries) array pairs
+        self.slots = [[[] for _ in range(1 << bits)] for _ in range(levels)]
+        self.overflow = []
+
+    def __len__(self):
+        return self.count
+
+    def schedule(self, ids, at):
+        """
+        Add timers.
+
+        Args:
+            ids (np.ndarray): int ids, returned by advance when due.
+            at (np.ndarray): ticks the timers are due on, after now.
+
+        Raises:
+            RuntimeError: if a timer is not in the future.
+        """
+        ids = np.asarray(ids, dtype=np.intp)
+        at = np.broadcast_to(np.asarray(at, dtype=np.int64), ids.shape)
+        if not len(ids):
+            return
+        if (at <= self.now).any():
+            raise RuntimeError(f"timers must be due after tick {self.now}")
+        self.count += len(ids)
+        self._insert(ids, at)
+
+    def _insert(self, ids, at):
+        # the highest bit where the expiry differs from now picks the level,
+        # frexp's exponent is the bit length below 2 ** 53
+        highest = np.frexp((at ^ self.now).astype(np.float64))[1] - 1
+        level = np.clip(highest // self.bits, 0, self.levels)
+        slot = (at >> (self.bits * np.minimum(level, self.levels - 1))) & self.mask
+        key = level << self.bits | slot
+        if (key == key[0]).all():
+            groups = [(int(key[0]), slice(None))]
+        else:
+            order = np.argsort(key, kind="stable")
+            ids, at, key = ids[order], at[order], key[order]
+            bounds = np.flatnonzero(key[1:] != key[:-1]) + 1
+            starts = [0] + bounds.tolist()
+            stops = bounds.tolist() + [len(key)]
+            groups = [(int(key[start]), slice(start, stop)) for start, stop in zip(starts, stops)]
+        for key, group in groups:
+            level, slot = key >> self.bits, key & self.mask
+            if level == self.levels:
+                self.overflow.append((ids[group], at[group]))
+            else:
+                self.slots[level][slot].append((ids[group], at[group]))
+
+    def _cascade(self, entries):
+        # one insert for the whole slot
+        if len(entries) == 1:
+            self._insert(*entries[0])
+        elif entries:
+            self._insert(np.concatenate([ids for ids, _ in entries]), np.concatenate([at for _, at in entries]))
+
+    def advance(self):
+        """Move the clock one tick and return the ids of the timers due on it, an int array."""
+        self.now += 1
+        now = self.now
+        # blocks that start on this tick hand their timers down, top level first
+        if now & ((1 << (self.bits * self.levels)) - 1) == 0:
+            overflow, self.overflow = self.overflow, []
+            self._cascade(overflow)
+        for level in range(self.levels - 1, 0, -1):
+            if now & ((1 << (self.bits * level)) - 1) == 0:
+                slot = (now >> (self.bits * level)) & self.mask
+                entries, self.slots[level][slot] = self.slots[level][slot], []
+                self._cascade(entries)
+
+        due, self.slots[0][now & self.mask] = self.slots[0][now & self.mask], []
+        if not due:
+            return np.zeros(0, dtype=np.intp)
+        ids = due[0][0] if len(due) == 1 else np.concatenate([ids for ids, _ in due])
+        self.count -= len(ids)
+        return ids
+
+
+class TurretCadence:
+    """
+    Per-turret fire periods and phases on a TimerWheel.
+
+    Turret i fires on the ticks where tick % periods[i] == phases[i], the
+    rule of TickScheduler.every, and advance only touches the turrets due
+    on the new tick, so thousands of independently timed turrets cost
+    what the ones that fire cost.
+    """
+
+    def __init__(self, periods, phases=0):
+        """
+        Args:
+            periods: int or (n,) ints, ticks between shots of each turret.
+            phases: int or (n,) ints, tick offset of each turret's shots.
+
+        Raises:
+            RuntimeError: if a period is below 1.
+        """
+        self.periods = np.atleast_1d(np.asarray(periods, dtype=np.int64))
+        phases = np.broadcast_to(np.asarray(phases, dtype=np.int64), self.periods.shape)
+        if (self.periods < 1).any():
+            raise RuntimeError("fire periods must be at least one tick")
+        self.wheel = TimerWheel()
+        first = phases % self.periods
+        first[first == 0] = self.periods[first == 0]
+        self.wheel.schedule(np.arange(len(self.periods)), first)
+
+    @property
+    def tick(self):
+        return self.wheel.now
+
+    def advance(self):
+        """Move one tick, return the int array of the turrets that fire on it."""
+        due = self.wheel.advance()
+        if len(due):
+            self.wheel.schedule(due, self.wheel.now + self.periods[due])
+        return due
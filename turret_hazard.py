@@ -0,0 +1,181 @@
+import numpy as np
+
+from distance_field import MOVES
+from loader import BLOCKING_CODES
+
+TURRET = 2
+WALL = 1
+# names of MOVES, in the same order
+DIRECTION_NAMES = ("down", "up", "right", "left")
+
+
+def _wall_keys(wall):
+    # sorted flat indices of the walls of each row, padded with a wall at both ends
+    return np.flatnonzero(np.pad(wall, ((0, 0), (1, 1)), constant_values=True)), wall.shape[1] + 2
+
+
+def _run_lengths(walls, rows, cols, step):
+    # cells from (row, col) up to the next wall or grid edge in the +1/-1 step direction along the rows
+    keys, pitch = walls
+    query = rows * pitch + cols + 1
+    if step > 0:
+        return keys[np.searchsorted(keys, query)] - query
+    return query - keys[np.searchsorted(keys, query, side="right") - 1]
+
+
+def concat_ranges(start, stop):
+    """Concatenation of range(start[i], stop[i]) for equal length int arrays, in one pass."""
+    count = stop - start
+    ends = np.cumsum(count)
+    return np.repeat(start - ends + count, count) + np.arange(ends[-1] if len(ends) else 0)
+
+
+def ray_lengths(grid):
+    """
+    Cells each turret's volley bullets cross before they hit a wall.
+
+    A turret fires into every neighbouring cell that is inside the grid and
+    neither a wall nor a turret. A bullet appears on that cell and moves
+    one cell per move tick until it enters a wall or leaves the grid, it
+    flies through other turrets. Those are the game's bullet rules,
+    tests/reference_rules.py runs them bullet by bullet.
+
+    Args:
+        grid (np.ndarray): 2D grid of loader.PALETTE cell codes.
+
+    Returns:
+        tuple: (turrets, lengths). turrets is an (n, 2) array of turret
+            (row, col), lengths an (n, 4) int32 array of ray lengths in
+            MOVES order, 0 where the turret doesn't fire.
+    """
+    grid = np.asarray(grid)
+    height, width = grid.shape
+    turrets = np.argwhere(grid == TURRET)
+    lengths = np.zeros((len(turrets), len(MOVES)), dtype=np.int32)
+    if not len(turrets):
+        return turrets, lengths
+
+    # only the cells next to a turret need a run length, so the walls of
+    # every row and column are searched rather than scanning the grid
+    wall = grid == WALL
+    row_walls, col_walls = _wall_keys(wall), _wall_keys(wall.T)
+    for d, (dx, dy) in enumerate(MOVES):
+        rows, cols = turrets[:, 0] + dy, turrets[:, 1] + dx
+        fires = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+        fires[fires] = ~np.isin(grid[rows[fires], cols[fires]], BLOCKING_CODES)
+        rows, cols = rows[fires], cols[fires]
+        if dx:
+            lengths[fires, d] = _run_lengths(row_walls, rows, cols, dx)
+        else:
+            lengths[fires, d] = _run_lengths(col_walls, cols, rows, dy)
+    return turrets, lengths
+
+
+class HazardMap:
+    """
+    Which turrets threaten each cell of a layout, from where and when.
+
+    Built once per layout from vectorized scans, every bullet of a volley
+    is a record (cell, turret, direction, tick) where tick is the number of
+    move ticks after the volley at which the bullet sits on the cell, 0 for
+    the cell it is fired into. Records are sorted by cell so the records of
+    one cell are a slice. Coordinates follow the game, x is the column and
+    y the row.
+    """
+
+    def __init__(self, grid):
+        grid = np.asarray(grid)
+        self.height, self.width = grid.shape
+        self.turrets, self.lengths = ray_lengths(grid)
+
+        # one record per cell of every ray
+        rays = np.flatnonzero(self.lengths)
+        ray_turret, ray_direction = np.divmod(rays, len(MOVES))
+        ray_length = self.lengths.ravel()[rays]
+        # flat cell of the turret and flat step of every ray, for bullet_cells
+        ray_steps = np.array(MOVES)[ray_direction]
+        self._ray_turret = ray_turret
+        self._ray_length = ray_length
+        self._ray_cell = self.turrets[ray_turret, 0] * self.width + self.turrets[ray_turret, 1]
+        self._ray_step = ray_steps[:, 1] * self.width + ray_steps[:, 0]
+        # rays are in turret order, those of turret t are _turret_rays[t]:_turret_rays[t + 1]
+        self._turret_rays = np.searchsorted(ray_turret, np.arange(len(self.turrets) + 1))
+        first = np.cumsum(ray_length) - ray_length
+        turret = np.repeat(ray_turret, ray_length)
+        direction = np.repeat(ray_direction, ray_length)
+        tick = np.arange(ray_length.sum()) - np.repeat(first, ray_length)
+
+        steps = np.array(MOVES)[direction]
+        rows = self.turrets[turret, 0] + steps[:, 1] * (tick + 1)
+        cols = self.turrets[turret, 1] + steps[:, 0] * (tick + 1)
+        cells = rows * self.width + cols
+
+        order = np.argsort(cells, kind="stable")
+        self.turret = turret[order].astype(np.int32)
+        self.direction = direction[order].astype(np.int8)
+        self.tick = tick[order].astype(np.int32)
+        counts = np.bincount(cells, minlength=self.height * self.width)
+        self._start = np.concatenate(([0], np.cumsum(counts)))
+
+        self.coverage = counts.reshape(self.height, self.width).astype(np.int32)
+        first_tick = np.full(self.height * self.width, np.iinfo(np.int32).max, dtype=np.int32)
+        np.minimum.at(first_tick, cells, tick.astype(np.int32))
+        first_tick[counts == 0] = -1
+        self.first_tick = first_tick.reshape(self.height, self.width)
+
+    def _slice(self, x, y):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return slice(0, 0)
+        cell = y * self.width + x
+        return slice(self._start[cell], self._start[cell + 1])
+
+    def records(self, x, y):
+        """(turret, tick) arrays of the volley bullets that cross (x, y), turret indexes self.turrets."""
+        records = self._slice(x, y)
+        return self.turret[records], self.tick[records]
+
+    def hazards_at(self, x, y):
+        """(turret (x, y), direction name, tick) of every volley bullet that crosses (x, y)."""
+        records = self._slice(x, y)
+        return [((int(self.turrets[t, 1]), int(self.turrets[t, 0])), DIRECTION_NAMES[d], int(k))
+                for t, d, k in zip(self.turret[records], self.direction[records], self.tick[records])]
+
+    def bullet_at(self, x, y, tick):
+        """True if a bullet of a volley sits on (x, y) tick move ticks after the volley."""
+        return bool((self.tick[self._slice(x, y)] == tick).any())
+
+    def bullet_cells(self, tick, turrets=None):
+        """
+        Flat cells, y * width + x, of the bullets of a volley tick move
+        ticks after it was fired.
+
+        Works on the rays, not the records, so the cost only depends on the
+        number of turrets that fired.
+
+        Args:
+            tick (int): move ticks since the volley.
+            turrets (np.ndarray): optional bool mask over self.turrets or
+                int indices into it of the turrets that fired, all of them
+                by default.
+
+        Returns:
+            np.ndarray: int array, one entry per bullet.
+        """
+        if turrets is None or turrets.dtype == bool:
+            live = self._ray_length > tick
+            if turrets is not None:
+                live &= turrets[self._ray_turret]
+            return self._ray_cell[live] + self._ray_step[live] * (tick + 1)
+        rays = concat_ranges(self._turret_rays[turrets], self._turret_rays[turrets + 1])
+        rays = rays[self._ray_length[rays] > tick]
+        return self._ray_cell[rays] + self._ray_step[rays] * (tick + 1)
+
+    def bullets(self, tick, turrets=None):
+        """Cells of the bullets of a volley as bullet_cells, as (rows, cols) int arrays."""
+        return np.divmod(self.bullet_cells(tick, turrets), self.width)
+
+    def danger_mask(self, tick):
+        """Bool array of the cells holding a bullet tick move ticks after a volley."""
+        mask = np.zeros((self.height, self.width), dtype=bool)
+        mask[self.bullets(tick)] = True
+        return mask